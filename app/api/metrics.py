@@ -0,0 +1,27 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from app.services.execution_pool import execution_pool
+from app.services.metrics import CONTENT_TYPE, metrics
+
+router = APIRouter()
+
+
+@router.get(
+    "/metrics",
+    summary="Prometheus metrics",
+    description=(
+        "Job, stage, transfer, pool and cache metrics in the Prometheus text format"
+    ),
+    response_class=Response,
+)
+async def prometheus_metrics() -> Response:
+    """
+    Expose the metrics of the service for Prometheus to scrape.
+    
+    Returns:
+        The metrics in the Prometheus text exposition format
+    """
+    # The result cache statistics may query its SQLite backend
+    body = await execution_pool.run_io(metrics.render)
+    return Response(content=body, media_type=CONTENT_TYPE)
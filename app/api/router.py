@@ -1,7 +1,10 @@
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import process
+from app.api.v1.endpoints import batch, cache, jobs, process
 
 router = APIRouter()
 
-router.include_router(process.router, prefix="/v1", tags=["process"]) 
\ No newline at end of file
+router.include_router(process.router, prefix="/v1", tags=["process"])
+router.include_router(batch.router, prefix="/v1", tags=["batch"])
+router.include_router(jobs.router, prefix="/v1", tags=["jobs"])
+router.include_router(cache.router, prefix="/v1", tags=["cache"])
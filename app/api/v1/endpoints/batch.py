@@ -0,0 +1,46 @@
+from fastapi import APIRouter, HTTPException
+
+from app.schemas.batch import BatchRequest, BatchResponse
+from app.schemas.process import ErrorResponse
+from app.services.batch import batch_service
+from app.services.processing import ProcessingError
+
+router = APIRouter()
+
+
+@router.post(
+    "/batch",
+    response_model=BatchResponse,
+    responses={
+        400: {"model": ErrorResponse},
+        404: {"model": ErrorResponse},
+        503: {"model": ErrorResponse},
+    },
+    summary="Process many datasets with the same code",
+    description=(
+        "Run custom Python code over a list of datasets or all datasets matching "
+        "a glob, saving the results under a partitioned output prefix"
+    ),
+)
+async def process_batch(request: BatchRequest):
+    """
+    Process many datasets with the same custom Python code.
+    
+    The code is validated once, and the datasets are processed concurrently, up to
+    the concurrency of the request. Datasets that fail are reported in their item
+    and do not stop the others.
+    
+    Args:
+        request: The batch request containing the dataset paths or pattern and the code
+        
+    Returns:
+        The outcome and timings of each dataset, and the aggregated timings
+    """
+    try:
+        return await batch_service.run(request)
+    except ProcessingError as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+            headers=e.headers
+        ) from e
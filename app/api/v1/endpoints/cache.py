@@ -0,0 +1,32 @@
+from typing import Any, Dict
+
+from fastapi import APIRouter
+
+from app.services.code_validator import code_validator
+from app.services.dataset_cache import dataset_cache
+from app.services.execution_pool import execution_pool
+from app.services.result_cache import result_cache
+
+router = APIRouter()
+
+
+@router.get(
+    "/cache/stats",
+    summary="Result cache statistics",
+    description=(
+        "Hit and miss counters and size of the result, dataset and validation caches"
+    ),
+)
+async def cache_stats() -> Dict[str, Any]:
+    """
+    Report the cache counters.
+    
+    Returns:
+        The statistics of the result cache, the decoded dataset cache and the
+        code validation cache
+    """
+    return {
+        "results": await execution_pool.run_io(result_cache.stats),
+        "datasets": dataset_cache.stats(),
+        "validation": code_validator.cache_stats()
+    }
@@ -0,0 +1,174 @@
+import os
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.core.config import settings
+from app.schemas.jobs import JobResponse
+from app.schemas.process import ErrorResponse, ProcessRequest
+from app.services.async_minio_client import async_minio_client
+from app.services.execution_pool import PoolSaturatedError
+from app.services.job_manager import JobNotFoundError, JobStateError, job_manager
+from app.services.processing import processing_service
+
+router = APIRouter()
+
+
+@router.post(
+    "/jobs",
+    response_model=JobResponse,
+    status_code=202,
+    responses={
+        400: {"model": ErrorResponse},
+        503: {"model": ErrorResponse},
+    },
+    summary="Submit a processing job",
+    description=(
+        "Start processing a dataset in the background and return the job ID "
+        "immediately"
+    ),
+)
+async def submit_job(request: ProcessRequest):
+    """
+    Submit a job that processes a dataset with custom Python code.
+    
+    The job runs exactly like a call to the process endpoint, but the response is
+    returned as soon as the job is recorded. Its progress and result are polled with
+    GET /jobs/{job_id}.
+    
+    Args:
+        request: The process request containing the dataset path and code
+        
+    Returns:
+        The queued job
+    """
+    is_valid, validation_result = processing_service.validate(request)
+    if not is_valid:
+        raise HTTPException(
+            status_code=400,
+            detail=validation_result
+        )
+    
+    try:
+        return await job_manager.submit(request)
+    except PoolSaturatedError as e:
+        raise HTTPException(
+            status_code=503,
+            detail={"error": str(e)},
+            headers={"Retry-After": str(settings.QUEUE_FULL_RETRY_AFTER)}
+        ) from e
+
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=JobResponse,
+    responses={404: {"model": ErrorResponse}},
+    summary="Get the status of a job",
+    description=(
+        "Return the status, current stage, stage timings and, once finished, the "
+        "result or error of a job"
+    ),
+)
+async def get_job(job_id: str):
+    """
+    Poll a job.
+    
+    Args:
+        job_id: Identifier of the job
+        
+    Returns:
+        The job, with its result once it has succeeded
+    """
+    try:
+        return await job_manager.get(job_id)
+    except JobNotFoundError as e:
+        raise HTTPException(
+            status_code=404,
+            detail={"error": str(e)}
+        ) from e
+
+
+@router.delete(
+    "/jobs/{job_id}",
+    response_model=JobResponse,
+    responses={
+        404: {"model": ErrorResponse},
+        409: {"model": ErrorResponse},
+    },
+    summary="Cancel a job",
+    description=(
+        "Cancel a queued or running job, killing its sandbox worker if it is executing"
+    ),
+)
+async def cancel_job(job_id: str):
+    """
+    Cancel a job.
+    
+    Args:
+        job_id: Identifier of the job
+        
+    Returns:
+        The cancelled job
+    """
+    try:
+        return await job_manager.cancel(job_id)
+    except JobNotFoundError as e:
+        raise HTTPException(
+            status_code=404,
+            detail={"error": str(e)}
+        ) from e
+    except JobStateError as e:
+        raise HTTPException(
+            status_code=409,
+            detail={"error": str(e)}
+        ) from e
+
+
+@router.get(
+    "/jobs/{job_id}/result",
+    responses={
+        404: {"model": ErrorResponse},
+        409: {"model": ErrorResponse},
+    },
+    summary="Download the result of a job",
+    description="Stream the Parquet file produced by a succeeded job",
+)
+async def get_job_result(job_id: str):
+    """
+    Stream the result file of a job from MinIO.
+    
+    Args:
+        job_id: Identifier of the job
+        
+    Returns:
+        The Parquet file
+    """
+    try:
+        job = await job_manager.get(job_id)
+    except JobNotFoundError as e:
+        raise HTTPException(
+            status_code=404,
+            detail={"error": str(e)}
+        ) from e
+    
+    if job["status"] != "succeeded":
+        raise HTTPException(
+            status_code=409,
+            detail={"error": f"Job is {job['status']}, it has no result"}
+        )
+    
+    parquet_path = job["result"]["parquet_path"]
+    try:
+        content = await async_minio_client.stream_object(parquet_path)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=404,
+            detail={"error": str(e)}
+        ) from e
+    
+    filename = os.path.basename(parquet_path)
+    return StreamingResponse(
+        content,
+        media_type="application/vnd.apache.parquet",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
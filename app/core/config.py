@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Literal
 import os
 from pydantic_settings import BaseSettings
 
@@ -18,12 +18,66 @@ class Settings(BaseSettings):
     MINIO_ACCESS_KEY: str = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
     MINIO_SECRET_KEY: str = os.getenv("MINIO_SECRET_KEY", "minioadmin")
     MINIO_SECURE: bool = os.getenv("MINIO_SECURE", "False").lower() == "true"
+    MINIO_REGION: str = os.getenv("MINIO_REGION", "us-east-1")
+    MINIO_POOL_MAXSIZE: int = 32
+    MINIO_CONNECT_TIMEOUT: float = 10
+    MINIO_READ_TIMEOUT: float = 300
+    MINIO_MAX_RETRIES: int = 5
+    MINIO_RETRY_BACKOFF: float = 0.2
+    MINIO_TCP_KEEPALIVE: bool = True
+    MINIO_BUCKET_CACHE_TTL: int = 300
+    MINIO_RANGE_REQUEST_WORKERS: int = 8
+    MINIO_RANGE_SIZE_MB: int = 8
+    MINIO_READAHEAD_ROW_GROUPS: int = 2
+    MINIO_UPLOAD_PART_SIZE_MB: int = 16
+    MINIO_UPLOAD_PARALLELISM: int = 4
+    PARQUET_ROW_GROUP_SIZE: int = 1024 * 1024
+    PARQUET_COMPRESSION: str = "snappy"
+    ENCODING_SAMPLE_ROWS: int = 10_000
+    DICTIONARY_MAX_DISTINCT_RATIO: float = 0.5
     
     DEFAULT_TIMEOUT: int = 120
     DEFAULT_MAX_MEMORY: int = 2048
     DEFAULT_MAX_CPU: float = 1.0
+    DEFAULT_CHUNK_SIZE: int = 100_000
+    DTYPE_BACKEND: Literal["numpy", "pyarrow"] = "numpy"
+    TEXT_ENGINE: Literal["pandas", "pyarrow"] = "pandas"
+    TEXT_BLOCK_SIZE_MB: int = 4
+    EXCEL_ENGINE: str = "auto"
+    EXCEL_SIDECAR: bool = True
     
     ALLOWED_IMPORTS: List[str] = ["pandas", "numpy", "pycatch22"]
+    CATCH22_MIN_LENGTH: int = 10
+    CODE_CACHE_SIZE: int = 256
+    PROFILE_TOP_FUNCTIONS: int = 30
+    PROFILE_TOP_ALLOCATIONS: int = 10
+    PROFILE_TRACEMALLOC_FRAMES: int = 8
+    
+    IO_WORKERS: int = 16
+    EXECUTION_WORKERS: int = os.cpu_count() or 1
+    MAX_CONCURRENT_JOBS: int = 8
+    MAX_QUEUED_JOBS: int = 32
+    QUEUE_FULL_RETRY_AFTER: int = 5
+    BATCH_CONCURRENCY: int = 4
+    BATCH_MAX_DATASETS: int = 1000
+    
+    SANDBOX_MAX_JOBS_PER_WORKER: int = 100
+    SANDBOX_MAX_WORKER_RSS_MB: int = 1024
+    SANDBOX_KILL_GRACE: int = 5
+    CPU_SCHEDULER_ENABLED: bool = True
+    CPU_FAIR_SHARE_HALF_LIFE: float = 60
+    CPU_STARVATION_SECONDS: float = 30
+    SHARED_MEMORY_DIR: str = "/dev/shm"
+    DATASET_CACHE_MAX_MB: int = 1024
+    
+    JOB_STORE_BACKEND: Literal["sqlite", "memory"] = "sqlite"
+    JOB_STORE_PATH: str = "jobs.sqlite3"
+    JOB_TTL: int = 7 * 24 * 60 * 60
+    
+    RESULT_CACHE_BACKEND: Literal["memory", "sqlite", "none"] = "memory"
+    RESULT_CACHE_MAX_ENTRIES: int = 1024
+    RESULT_CACHE_TTL: int = 24 * 60 * 60
+    RESULT_CACHE_PATH: str = "result_cache.sqlite3"
     
     class Config:
         env_file = ".env"
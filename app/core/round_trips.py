@@ -0,0 +1,67 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+
+class RoundTripCounter:
+    """
+    Counts the HTTP requests made to MinIO on behalf of a single request, by method,
+    and the object bytes they uploaded.
+    """
+
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+
+    def record(self, method: str, count: int = 1) -> None:
+        """
+        Count requests; safe to call from the I/O threads of the request.
+
+        Args:
+            method: HTTP method of the requests
+            count: Number of requests
+        """
+        with self._lock:
+            self.counts[method] = self.counts.get(method, 0) + count
+
+    def record_upload(self, nbytes: int) -> None:
+        """
+        Count object bytes uploaded by a successful request.
+
+        Args:
+            nbytes: Size of the uploaded object or part
+        """
+        with self._lock:
+            self.bytes_sent += nbytes
+
+    def as_dict(self) -> Dict[str, int]:
+        """
+        Return the total number of requests and the number per method.
+
+        Returns:
+            Dictionary with a "total" entry and one entry per HTTP method
+        """
+        with self._lock:
+            return {"total": sum(self.counts.values()), **self.counts}
+
+
+# Counter of the request running in the current context, None outside a request
+current_round_trips: ContextVar[Optional[RoundTripCounter]] = ContextVar(
+    "current_round_trips", default=None
+)
+
+
+@contextmanager
+def count_round_trips() -> Iterator[RoundTripCounter]:
+    """
+    Count the MinIO requests made in the enclosed block, including the requests of
+    threads the context is propagated to.
+    """
+    counter = RoundTripCounter()
+    token = current_round_trips.set(counter)
+    try:
+        yield counter
+    finally:
+        current_round_trips.reset(token)
@@ -0,0 +1,85 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+
+class StageTimer:
+    """Collects wall-clock durations for the named stages of a single request."""
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+        # Stage currently running, for progress reporting
+        self.current: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Context manager that times the enclosed block under the given stage name.
+
+        Args:
+            name: Name of the stage (e.g. "load", "execute", "save")
+        """
+        start_time = time.perf_counter()
+        previous, self.current = self.current, name
+        try:
+            yield
+        finally:
+            self.current = previous
+            self.record(name, time.perf_counter() - start_time)
+
+    def record(self, name: str, seconds: float) -> None:
+        """
+        Add a duration to a stage, accumulating if the stage was already recorded.
+        Safe to call from the I/O threads of the request.
+
+        Args:
+            name: Name of the stage
+            seconds: Duration in seconds
+        """
+        with self._lock:
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def as_dict(self) -> Dict[str, float]:
+        """
+        Return the recorded timings rounded to microseconds.
+
+        Returns:
+            Dictionary mapping stage names to durations in seconds
+        """
+        with self._lock:
+            return {name: round(seconds, 6) for name, seconds in self.timings.items()}
+
+
+# Timer of the request running in the current context, None outside a request
+current_timer: ContextVar[Optional[StageTimer]] = ContextVar(
+    "current_timer", default=None
+)
+
+
+@contextmanager
+def use_timer(timer: StageTimer) -> Iterator[StageTimer]:
+    """
+    Make a timer the current timer in the enclosed block, so that code without
+    access to it (MinIO transfers, Parquet encoding) can record stages on it.
+    """
+    token = current_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        current_timer.reset(token)
+
+
+def record_stage(name: str, seconds: float) -> None:
+    """
+    Add a duration to a stage of the current timer; does nothing outside a request.
+
+    Args:
+        name: Name of the stage
+        seconds: Duration in seconds
+    """
+    timer = current_timer.get()
+    if timer is not None:
+        timer.record(name, seconds)
@@ -0,0 +1,72 @@
+from typing import Any, Dict, List, Literal, Optional
+
+from pydantic import BaseModel, Field, root_validator
+
+from app.schemas.process import ProcessOptions, ProcessResponse
+
+
+class BatchRequest(ProcessOptions):
+    dataset_paths: Optional[List[str]] = Field(
+        None, description="Paths to the datasets in MinIO"
+    )
+    dataset_pattern: Optional[str] = Field(
+        None,
+        description=(
+            "Glob over dataset paths, matched one path segment at a time "
+            "(e.g. bucket/year=2026/month=*/*.parquet)"
+        ),
+    )
+    output_prefix: Optional[str] = Field(
+        None,
+        description=(
+            "Prefix (bucket/prefix) under which results are saved, mirroring the "
+            "partition layout of the inputs. Defaults to a new processed/batch_* "
+            "prefix next to the inputs"
+        ),
+    )
+    concurrency: Optional[int] = Field(
+        None, gt=0, description="Datasets processed at the same time"
+    )
+
+    @root_validator(skip_on_failure=True)
+    def validate_datasets(cls, values):
+        paths, pattern = values.get("dataset_paths"), values.get("dataset_pattern")
+        if (paths is None) == (pattern is None):
+            raise ValueError(
+                "Exactly one of dataset_paths and dataset_pattern must be given"
+            )
+        if paths is not None and not paths:
+            raise ValueError("dataset_paths cannot be empty")
+        return values
+
+
+class BatchItemResponse(BaseModel):
+    dataset_path: str = Field(..., description="Path to the dataset in MinIO")
+    status: Literal["success", "error"] = Field(
+        ..., description="Status of the dataset"
+    )
+    result: Optional[ProcessResponse] = Field(
+        None, description="Result of a processed dataset"
+    )
+    error: Optional[Dict[str, Any]] = Field(
+        None, description="Error of a failed dataset, with the HTTP status it maps to"
+    )
+    timings: Dict[str, float] = Field(
+        ..., description="Time spent in each stage for this dataset, in seconds"
+    )
+
+
+class BatchResponse(BaseModel):
+    status: Literal["success", "partial", "error"] = Field(
+        ..., description="'success' if every dataset succeeded, 'error' if none did"
+    )
+    output_prefix: str = Field(..., description="Prefix under which results were saved")
+    total: int = Field(..., description="Number of datasets in the batch")
+    succeeded: int = Field(..., description="Number of datasets processed successfully")
+    failed: int = Field(..., description="Number of datasets that failed")
+    elapsed: float = Field(..., description="Wall-clock time of the batch in seconds")
+    timings: Dict[str, float] = Field(
+        ...,
+        description="Time spent in each stage, summed over the datasets, in seconds",
+    )
+    items: List[BatchItemResponse] = Field(..., description="Outcome of each dataset")
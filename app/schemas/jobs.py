@@ -0,0 +1,25 @@
+from typing import Any, Dict, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+from app.schemas.process import ProcessResponse
+
+JobStatus = Literal["queued", "running", "succeeded", "failed", "cancelled"]
+
+
+class JobResponse(BaseModel):
+    job_id: str = Field(..., description="Identifier of the job")
+    status: JobStatus = Field(..., description="Status of the job")
+    created_at: float = Field(..., description="Submission time (Unix timestamp)")
+    started_at: Optional[float] = Field(None, description="Time the job left the queue")
+    finished_at: Optional[float] = Field(None, description="Time the job finished")
+    stage: Optional[str] = Field(None, description="Stage currently running")
+    timings: Optional[Dict[str, float]] = Field(
+        None, description="Time spent in each stage so far, in seconds"
+    )
+    result: Optional[ProcessResponse] = Field(
+        None, description="Result of a succeeded job"
+    )
+    error: Optional[Dict[str, Any]] = Field(
+        None, description="Error of a failed job, with the HTTP status it maps to"
+    )
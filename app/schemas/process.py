@@ -1,20 +1,406 @@
-from typing import Optional, List, Dict, Any
-from pydantic import BaseModel, Field, validator
+from typing import Optional, List, Dict, Any, Literal, Union
+import keyword
+import re
+import pyarrow as pa
+from pydantic import BaseModel, Field, root_validator, validator
 
+FILTER_OPERATORS = ["=", "==", "!=", "<", "<=", ">", ">=", "in", "not in"]
 
-class ProcessRequest(BaseModel):
-    dataset_path: str = Field(..., description="Path to the dataset in MinIO")
-    code: str = Field(..., description="Python code containing a process function")
+STEP_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+# Cell range in A1 notation; the rows are optional ("B:F", "B2:F", "B2:F100")
+CELL_RANGE_PATTERN = re.compile(
+    r"^([A-Z]{1,3})([1-9][0-9]*)?:([A-Z]{1,3})([1-9][0-9]*)?$"
+)
+
+
+class Catch22Options(BaseModel):
+    id_column: str = Field(..., description="Column identifying the series")
+    time_column: Optional[str] = Field(
+        None,
+        description="Column ordering the values of each series (row order if omitted)",
+    )
+    value_columns: Optional[List[str]] = Field(
+        None,
+        description=(
+            "Columns to compute features of (all numeric columns other than the id "
+            "and time columns if omitted)"
+        ),
+    )
+    catch24: bool = Field(
+        False, description="Also compute the mean and standard deviation of each series"
+    )
+    short_names: bool = Field(
+        False, description="Name the feature columns by the short feature names"
+    )
+    min_length: Optional[int] = Field(
+        None,
+        ge=3,
+        description=(
+            "Series with fewer values get missing features (CATCH22_MIN_LENGTH if "
+            "omitted)"
+        ),
+    )
+
+
+class PipelineStep(BaseModel):
+    name: Optional[str] = Field(
+        None,
+        description=(
+            "Name of the step, used in the step timings and checkpoint file names "
+            "(step_<n> if omitted)"
+        ),
+    )
+    code: Optional[str] = Field(
+        None, description="Python code containing a process function"
+    )
+    catch22: Optional[Catch22Options] = Field(
+        None,
+        description=(
+            "Built-in step run instead of code: the catch22 features of every series "
+            "of the DataFrame, one row per series"
+        ),
+    )
+    checkpoint: bool = Field(
+        False, description="Also save the output of this step to MinIO"
+    )
+
+    @validator("name")
+    def validate_name(cls, v):
+        if v is not None and not STEP_NAME_PATTERN.match(v):
+            raise ValueError("Step names may only contain letters, digits, '_' and '-'")
+        return v
+
+    @validator("code")
+    def validate_code_not_empty(cls, v):
+        if v is not None and not v.strip():
+            raise ValueError("Code cannot be empty")
+        return v
+
+    @root_validator(skip_on_failure=True)
+    def validate_code_or_catch22(cls, values):
+        if (values.get("code") is None) == (values.get("catch22") is None):
+            raise ValueError(
+                "Exactly one of code and catch22 must be given for each step"
+            )
+        return values
+
+
+class InputOptions(BaseModel):
+    engine: Optional[Literal["pandas", "pyarrow"]] = Field(
+        None,
+        description=(
+            "Parser of CSV and newline-delimited JSON datasets: the pyarrow engine "
+            "parses blocks of the file on all cores (pyarrow with the pyarrow dtype "
+            "backend, TEXT_ENGINE otherwise, if omitted)"
+        ),
+    )
+    column_types: Optional[Dict[str, str]] = Field(
+        None,
+        description=(
+            "Explicit schema of CSV, JSON and Excel datasets: the Arrow type of some "
+            "columns (e.g. 'int64', 'string', 'timestamp[ms]'), used instead of the "
+            "type inferred from their values"
+        ),
+    )
+
+    sheet: Optional[Union[int, str]] = Field(
+        None,
+        description=(
+            "Sheet of an Excel dataset, by name or zero-based index (the first sheet "
+            "if omitted)"
+        ),
+    )
+    cell_range: Optional[str] = Field(
+        None,
+        description=(
+            "Cells of an Excel dataset to read, in A1 notation (e.g. 'B2:F1000'); "
+            "the first row of the range holds the column names"
+        ),
+    )
+
+    @validator("cell_range")
+    def validate_cell_range(cls, v):
+        if v is not None and not CELL_RANGE_PATTERN.match(v.replace("$", "").upper()):
+            raise ValueError(f"Invalid cell range: {v}")
+        return v
+
+    @validator("column_types")
+    def validate_column_types(cls, v):
+        if not v:
+            return None
+        for column, type_name in v.items():
+            try:
+                pa.type_for_alias(type_name)
+            except (KeyError, ValueError) as e:
+                raise ValueError(f"Unknown type of column {column}: {type_name}") from e
+        return v
+
+
+class OutputOptions(BaseModel):
+    optimize: bool = Field(
+        True,
+        description=(
+            "Choose dictionary or plain encoding per column from its estimated "
+            "cardinality; when false, every column is written with the Parquet "
+            "writer defaults"
+        ),
+    )
+    compression: Optional[
+        Literal["snappy", "zstd", "gzip", "brotli", "lz4", "none"]
+    ] = Field(
+        None,
+        description=(
+            "Compression codec of the result file (PARQUET_COMPRESSION if omitted)"
+        ),
+    )
+    compression_level: Optional[int] = Field(
+        None, description="Compression level, for codecs that support one"
+    )
+    row_group_size: Optional[int] = Field(
+        None, gt=0, description="Rows per row group (PARQUET_ROW_GROUP_SIZE if omitted)"
+    )
+    column_encodings: Optional[Dict[str, Literal["dictionary", "plain"]]] = Field(
+        None, description="Encoding of specific columns, overriding the estimate"
+    )
+
+
+class ProcessOptions(BaseModel):
+    """Code and options of a job, shared by single and batch requests."""
+
+    code: Optional[str] = Field(
+        None, description="Python code containing a process function"
+    )
+    steps: Optional[List[PipelineStep]] = Field(
+        None,
+        description=(
+            "Pipeline of steps run instead of code, each on the output of the previous "
+            "one, in the same worker and without saving the intermediate DataFrames "
+            "unless the step is a checkpoint"
+        ),
+    )
+    catch22: Optional[Catch22Options] = Field(
+        None,
+        description=(
+            "Built-in catch22 feature extraction, run as a last 'catch22' step on the "
+            "output of code or steps, or on the dataset if neither is given"
+        ),
+    )
+    inputs: Optional[Dict[str, str]] = Field(
+        None,
+        description=(
+            "Additional datasets in MinIO by name, loaded in full alongside the "
+            "dataset and passed to process as keyword arguments of the same name"
+        ),
+    )
     timeout: Optional[int] = Field(None, description="Timeout in seconds")
     max_memory: Optional[int] = Field(None, description="Maximum memory in MB")
-    max_cpu: Optional[float] = Field(None, description="Maximum CPU cores")
+    max_cpu: Optional[float] = Field(
+        None,
+        gt=0,
+        description=(
+            "Maximum CPU cores: the worker is pinned to this many cores, rounded up, "
+            "its BLAS, OpenMP and Arrow thread pools are capped at as many threads, "
+            "and its CPU time budget is timeout x max_cpu core-seconds"
+        ),
+    )
+    tenant: Optional[str] = Field(
+        None,
+        description=(
+            "Tenant the job's cores are accounted to; cores are shared fairly between "
+            "tenants (all jobs without a tenant share one)"
+        ),
+    )
+    mode: Literal["full", "chunked", "map"] = Field(
+        "full",
+        description=(
+            "Execution mode. 'full' calls process once on the whole dataset; 'chunked' "
+            "calls it once per Parquet row group or text chunk and appends the "
+            "results, for row-wise functions on datasets larger than memory; 'map' "
+            "splits the dataset into one partition per core of max_cpu, calls process "
+            "on the partitions in parallel sandbox workers and concatenates the "
+            "results in order, for row-wise or per-group functions"
+        ),
+    )
+    partition_by: Optional[List[str]] = Field(
+        None,
+        description=(
+            "Key columns of map mode: rows with the same key are kept in the same "
+            "partition, for per-group functions (rows are split evenly if omitted)"
+        ),
+    )
+    chunk_size: Optional[int] = Field(
+        None,
+        gt=0,
+        description="Rows per chunk for CSV and JSON lines datasets in chunked mode",
+    )
+    columns: Optional[List[str]] = Field(
+        None, description="Columns to load (all columns if omitted)"
+    )
+    filters: Optional[List[Any]] = Field(
+        None,
+        description=(
+            "Row filters in pyarrow filter syntax: a list of [column, op, value] "
+            "conditions combined with AND, or a list of such lists combined with OR"
+        ),
+    )
+    dtype_backend: Optional[Literal["numpy", "pyarrow"]] = Field(
+        None,
+        description=(
+            "Backing of the DataFrames passed to process: NumPy dtypes, or pyarrow "
+            "dtypes that keep strings and nullable columns in Arrow memory from load "
+            "to save (DTYPE_BACKEND if omitted)"
+        ),
+    )
+    input: Optional[InputOptions] = Field(
+        None, description="Parsing of the dataset, for text and Excel formats"
+    )
+    output: Optional[OutputOptions] = Field(
+        None, description="Encoding of the result Parquet file"
+    )
+    use_cache: bool = Field(
+        True,
+        description=(
+            "Return the result of an earlier identical job (same dataset version, "
+            "code and options) instead of running the job again"
+        ),
+    )
+    profile: bool = Field(
+        False,
+        description=(
+            "Run the code under cProfile and tracemalloc and return the top functions "
+            "by cumulative time, the top allocation sites and the peak traced memory "
+            "in the metadata; profiled jobs are slower and bypass the result cache"
+        ),
+    )
 
     @validator("code")
     def validate_code_not_empty(cls, v):
-        if not v.strip():
+        if v is not None and not v.strip():
             raise ValueError("Code cannot be empty")
         return v
 
+    @validator("partition_by", pre=True)
+    def validate_partition_by(cls, v):
+        if isinstance(v, str):
+            v = [v]
+        return v or None
+
+    @validator("inputs")
+    def validate_inputs(cls, v):
+        if not v:
+            return None
+        for name in v:
+            if not name.isidentifier() or keyword.iskeyword(name):
+                raise ValueError(
+                    f"Input name '{name}' is not a valid Python identifier"
+                )
+        return v
+
+    @root_validator(skip_on_failure=True)
+    def validate_steps(cls, values):
+        code, steps = values.get("code"), values.get("steps")
+        catch22 = values.get("catch22")
+        if code is not None and steps is not None:
+            raise ValueError("Only one of code and steps can be given")
+        if code is None and steps is None and catch22 is None:
+            raise ValueError("One of code, steps and catch22 must be given")
+        if steps is not None:
+            if not steps:
+                raise ValueError("steps cannot be empty")
+            for index, step in enumerate(steps, start=1):
+                if step.name is None:
+                    step.name = f"step_{index}"
+            names = [step.name for step in steps]
+            if catch22 is not None:
+                names.append("catch22")
+            if len(set(names)) != len(names):
+                raise ValueError("Step names must be unique")
+        return values
+
+    @root_validator(skip_on_failure=True)
+    def validate_catch22_mode(cls, values):
+        catch22 = [values.get("catch22")] + [
+            step.catch22 for step in values.get("steps") or []
+        ]
+        catch22 = [options for options in catch22 if options is not None]
+        if not catch22:
+            return values
+        if values.get("mode") == "chunked":
+            raise ValueError(
+                "catch22 needs whole series and is not supported in chunked mode"
+            )
+        if values.get("mode") == "map" and values.get("partition_by") is None:
+            # Keep every series in one partition
+            values["partition_by"] = [catch22[0].id_column]
+        return values
+
+    @root_validator(skip_on_failure=True)
+    def validate_partition_by_mode(cls, values):
+        partition_by = values.get("partition_by")
+        if partition_by is None:
+            return values
+        if values.get("mode") != "map":
+            raise ValueError("partition_by is only supported in map mode")
+        columns = values.get("columns")
+        if columns is not None:
+            missing = [column for column in partition_by if column not in columns]
+            if missing:
+                raise ValueError(
+                    f"Partition columns must be loaded: {', '.join(missing)}"
+                )
+        return values
+
+    def pipeline(self) -> List[PipelineStep]:
+        """
+        Return the steps of the job; a job given as code is a single 'process' step,
+        followed by a 'catch22' step if the job extracts features.
+        """
+        if self.steps is not None:
+            steps = list(self.steps)
+        elif self.code is not None:
+            steps = [PipelineStep(name="process", code=self.code)]
+        else:
+            steps = []
+        if self.catch22 is not None:
+            steps.append(PipelineStep(name="catch22", catch22=self.catch22))
+        return steps
+
+    @validator("filters")
+    def validate_filters(cls, v):
+        if not v:
+            return None
+        # A single conjunction is a list of conditions; normalize to a list of
+        # conjunctions
+        if isinstance(v[0], (list, tuple)) and v[0] and isinstance(v[0][0], str):
+            v = [v]
+        conjunctions = []
+        for conjunction in v:
+            if not isinstance(conjunction, (list, tuple)) or not conjunction:
+                raise ValueError(
+                    "Each filter group must be a non-empty list of conditions"
+                )
+            conditions = []
+            for condition in conjunction:
+                if (
+                    not isinstance(condition, (list, tuple))
+                    or len(condition) != 3
+                    or not isinstance(condition[0], str)
+                ):
+                    raise ValueError(f"Invalid filter condition: {condition}")
+                column, op, value = condition
+                if op not in FILTER_OPERATORS:
+                    raise ValueError(f"Invalid filter operator: {op}")
+                if op in ["in", "not in"] and not isinstance(value, (list, tuple)):
+                    raise ValueError(f"Operator '{op}' requires a list of values")
+                conditions.append((column, op, value))
+            conjunctions.append(conditions)
+        return conjunctions
+
+
+class ProcessRequest(ProcessOptions):
+    dataset_path: str = Field(..., description="Path to the dataset in MinIO")
+
 
 class ProcessResponse(BaseModel):
     status: str = Field(..., description="Status of the processing")
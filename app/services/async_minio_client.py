@@ -0,0 +1,706 @@
+import asyncio
+import io
+import threading
+import time
+import xml.etree.ElementTree as ET
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+import pyarrow as pa
+import pyarrow.parquet as pq
+from minio.credentials import Credentials
+from minio.datatypes import Object
+from minio.helpers import ObjectWriteResult, queryencode, quote
+from minio.signer import sign_v4_s3
+from minio.time import to_amz_date, utcnow
+
+from app.core.config import settings
+from app.core.round_trips import current_round_trips
+from app.core.timing import record_stage
+from app.services.parquet_encoding import ParquetEncoding
+
+# Payloads are not hashed; the connection (TLS in production) protects them
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+
+# Statuses retried with backoff, like the connection pool of the blocking client
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+class AsyncS3Error(ValueError):
+    """
+    Exception raised when MinIO rejects a request.
+
+    Args:
+        message: Description of the failure
+        code: S3 error code, e.g. "NoSuchKey"
+        status_code: HTTP status of the response
+    """
+
+    def __init__(
+        self,
+        message: str,
+        code: Optional[str] = None,
+        status_code: Optional[int] = None,
+    ):
+        super().__init__(message)
+        self.code = code
+        self.status_code = status_code
+
+
+class AsyncMinioClient:
+    """
+    MinIO client for the event loop, without a thread per transfer.
+
+    Requests are signed with the MinIO SDK's signer and sent over a pooled
+    httpx.AsyncClient, so any number of stats, downloads and uploads can be in
+    flight on one event loop. It shares the connection settings and the round trip
+    counting of the blocking client. It keeps its own cache of known buckets, with
+    the same MINIO_BUCKET_CACHE_TTL, and raises AsyncS3Error, a ValueError like the
+    errors of the blocking client, so callers handle both the same way.
+
+    Parsing and encoding remain synchronous (pyarrow and pandas pull from file
+    objects), so loads that are decoded while they are read stay on
+    MinioClient; save_table encodes in a thread and uploads from the loop.
+    """
+
+    def __init__(self):
+        scheme = "https" if settings.MINIO_SECURE else "http"
+        self.base_url = f"{scheme}://{settings.MINIO_ENDPOINT}"
+        self.part_size = max(settings.MINIO_UPLOAD_PART_SIZE_MB, 5) * 1024 * 1024
+        self._credentials = Credentials(
+            settings.MINIO_ACCESS_KEY, settings.MINIO_SECRET_KEY
+        )
+        # Buckets known to exist, with the time their entry expires
+        self._known_buckets: Dict[str, float] = {}
+        self._http: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """Connection pool of the running event loop, created on first use."""
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._loop is not loop:
+            # Connections are bound to the loop that opened them
+            self._http = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.MINIO_POOL_MAXSIZE,
+                    max_keepalive_connections=settings.MINIO_POOL_MAXSIZE,
+                ),
+                timeout=httpx.Timeout(
+                    settings.MINIO_READ_TIMEOUT,
+                    connect=settings.MINIO_CONNECT_TIMEOUT,
+                ),
+            )
+            self._loop = loop
+        return self._http
+
+    async def aclose(self) -> None:
+        """Close the pooled connections."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+            self._loop = None
+
+    async def bucket_exists(self, bucket_name: str, create: bool = False) -> bool:
+        """
+        Check whether a bucket exists, optionally creating it.
+
+        Args:
+            bucket_name: Name of the bucket
+            create: Create the bucket if it does not exist
+
+        Returns:
+            True if the bucket exists (or was created)
+        """
+        if self._known_buckets.get(bucket_name, 0.0) > time.monotonic():
+            return True
+
+        try:
+            await self._request("HEAD", bucket_name)
+            exists = True
+        except AsyncS3Error as e:
+            if e.status_code != 404:
+                raise
+            exists = False
+        if not exists and create:
+            try:
+                await self._request("PUT", bucket_name)
+            except AsyncS3Error as e:
+                # Created concurrently by another job
+                if e.code not in ["BucketAlreadyOwnedByYou", "BucketAlreadyExists"]:
+                    raise
+            exists = True
+
+        if exists and settings.MINIO_BUCKET_CACHE_TTL > 0:
+            expires = time.monotonic() + settings.MINIO_BUCKET_CACHE_TTL
+            self._known_buckets[bucket_name] = expires
+        return exists
+
+    async def object_stat(self, path: str) -> Object:
+        """
+        Get the metadata of an object (size, ETag, version) without downloading it.
+
+        Args:
+            path: Path to the object in MinIO (bucket/object)
+
+        Returns:
+            The object's metadata
+        """
+        bucket_name, object_name = self._split_path(path)
+        try:
+            response = await self._request("HEAD", bucket_name, object_name)
+        except AsyncS3Error as e:
+            message = f"Error accessing MinIO: {str(e)}"
+            raise AsyncS3Error(message, e.code, e.status_code) from e
+        headers = response.headers
+        return Object(
+            bucket_name,
+            object_name,
+            last_modified=(
+                parsedate_to_datetime(headers["last-modified"])
+                if "last-modified" in headers else None
+            ),
+            etag=headers.get("etag", "").strip('"'),
+            size=int(headers.get("content-length", 0)),
+            metadata=dict(headers),
+            version_id=headers.get("x-amz-version-id"),
+            content_type=headers.get("content-type"),
+        )
+
+    async def object_version(self, path: str) -> str:
+        """
+        Get the current version of an object without downloading it.
+
+        Args:
+            path: Path to the object in MinIO (bucket/object)
+
+        Returns:
+            The version ID of the object on versioned buckets, otherwise its ETag
+        """
+        stat = await self.object_stat(path)
+        return stat.version_id or stat.etag
+
+    async def object_exists(self, path: str) -> bool:
+        """
+        Check whether an object exists.
+
+        Args:
+            path: Path to the object in MinIO (bucket/object)
+
+        Returns:
+            True if the object exists
+        """
+        try:
+            await self.object_stat(path)
+            return True
+        except ValueError:
+            return False
+
+    async def get_object(
+        self,
+        path: str,
+        offset: int = 0,
+        length: Optional[int] = None,
+        etag: Optional[str] = None,
+    ) -> bytes:
+        """
+        Download an object, or a range of it.
+
+        Args:
+            path: Path to the object in MinIO (bucket/object)
+            offset: First byte to read
+            length: Number of bytes to read (up to the end of the object if omitted)
+            etag: Expected ETag of the object; the read fails if it has changed
+
+        Returns:
+            The content of the object or range
+        """
+        bucket_name, object_name = self._split_path(path)
+        response = await self._request(
+            "GET",
+            bucket_name,
+            object_name,
+            headers=self._range_headers(offset, length, etag),
+        )
+        return response.content
+
+    async def read_ranges(
+        self, path: str, ranges: List[Tuple[int, int]], etag: Optional[str] = None
+    ) -> List[bytes]:
+        """
+        Download several ranges of an object concurrently.
+
+        Args:
+            path: Path to the object in MinIO (bucket/object)
+            ranges: (offset, length) of each range
+            etag: Expected ETag of the object; the read fails if it has changed
+
+        Returns:
+            The content of each range, in the order of the ranges
+        """
+        return list(await asyncio.gather(*(
+            self.get_object(path, offset, length, etag) for offset, length in ranges
+        )))
+
+    async def stream_object(
+        self, path: str, chunk_size: int = 1024 * 1024
+    ) -> AsyncIterator[bytes]:
+        """
+        Stream the content of an object without buffering it whole.
+
+        The request is sent before the first chunk is returned, so a missing object
+        raises here rather than while the content is being iterated.
+
+        Args:
+            path: Path to the object in MinIO (bucket/object)
+            chunk_size: Size of the chunks read from the response
+
+        Returns:
+            Async iterator over the content of the object
+        """
+        bucket_name, object_name = self._split_path(path)
+        try:
+            response = await self._request("GET", bucket_name, object_name, stream=True)
+        except AsyncS3Error as e:
+            message = f"Error accessing MinIO: {str(e)}"
+            raise AsyncS3Error(message, e.code, e.status_code) from e
+        return self._iter_response(response, chunk_size)
+
+    @staticmethod
+    async def _iter_response(
+        response: httpx.Response, chunk_size: int
+    ) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in response.aiter_bytes(chunk_size):
+                yield chunk
+        finally:
+            await response.aclose()
+
+    async def put_object(
+        self, bucket_name: str, object_name: str, data: bytes
+    ) -> ObjectWriteResult:
+        """
+        Upload an object with a single request.
+
+        Args:
+            bucket_name: Name of the bucket (created if it does not exist)
+            object_name: Name of the object
+            data: Content of the object
+
+        Returns:
+            The bucket, name, version and ETag of the object
+        """
+        await self.bucket_exists(bucket_name, create=True)
+        response = await self._request(
+            "PUT", bucket_name, object_name, content=data,
+            headers={"Content-Type": "application/octet-stream"},
+        )
+        return self._write_result(
+            bucket_name, object_name, response.headers.get("etag"), response
+        )
+
+    async def upload(
+        self, bucket_name: str, object_name: str, parts: AsyncIterator[bytes]
+    ) -> ObjectWriteResult:
+        """
+        Upload an object from a stream of parts, MINIO_UPLOAD_PARALLELISM at a time.
+
+        A single part is uploaded with put_object. Otherwise a multipart upload is
+        started with the second part, and aborted if any part fails, so no object
+        is created.
+
+        Args:
+            bucket_name: Name of the bucket (created if it does not exist)
+            object_name: Name of the object
+            parts: Parts of the object; all but the last must be at least 5 MB
+
+        Returns:
+            The bucket, name, version and ETag of the object
+        """
+        iterator = parts.__aiter__()
+        first = await anext(iterator, None)
+        second = await anext(iterator, None) if first is not None else None
+        if second is None:
+            return await self.put_object(bucket_name, object_name, first or b"")
+
+        await self.bucket_exists(bucket_name, create=True)
+        response = await self._request(
+            "POST", bucket_name, object_name, query={"uploads": ""},
+            headers={"Content-Type": "application/octet-stream"},
+        )
+        upload_id = self._find_text(response.content, "UploadId")
+
+        slots = asyncio.Semaphore(max(settings.MINIO_UPLOAD_PARALLELISM, 1))
+        etags: Dict[int, str] = {}
+        tasks: List[asyncio.Task] = []
+
+        async def upload_part(part_number: int, data: bytes) -> None:
+            try:
+                part_response = await self._request(
+                    "PUT", bucket_name, object_name, content=data,
+                    query={"partNumber": str(part_number), "uploadId": upload_id},
+                )
+                etags[part_number] = part_response.headers["etag"]
+            finally:
+                slots.release()
+
+        try:
+            part_number = 0
+
+            async def remaining() -> AsyncIterator[bytes]:
+                yield first
+                yield second
+                async for part in iterator:
+                    yield part
+
+            async for data in remaining():
+                # Failed parts stop the upload before more data is read
+                for task in tasks:
+                    if task.done() and task.exception() is not None:
+                        raise task.exception()
+                await slots.acquire()
+                part_number += 1
+                tasks.append(asyncio.create_task(upload_part(part_number, data)))
+            await asyncio.gather(*tasks)
+
+            body = "".join(
+                f"<Part><PartNumber>{number}</PartNumber><ETag>{etags[number]}</ETag></Part>"
+                for number in sorted(etags)
+            )
+            response = await self._request(
+                "POST", bucket_name, object_name, query={"uploadId": upload_id},
+                content=f"<CompleteMultipartUpload>{body}</CompleteMultipartUpload>".encode(),
+            )
+            # Completion can fail after the 200 status has been sent
+            self._raise_for_error(response.content, response.status_code)
+            etag = self._find_text(response.content, "ETag")
+            return self._write_result(bucket_name, object_name, etag, response)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            try:
+                await self._request(
+                    "DELETE", bucket_name, object_name, query={"uploadId": upload_id}
+                )
+            except (AsyncS3Error, httpx.HTTPError):
+                pass
+            raise
+
+    async def copy_object(
+        self, source_path: str, bucket_name: str, object_name: str
+    ) -> str:
+        """
+        Copy an object within MinIO without downloading it.
+
+        Args:
+            source_path: Path to the source object (bucket/object)
+            bucket_name: Name of the destination bucket (created if it does not exist)
+            object_name: Name of the destination object
+
+        Returns:
+            Path to the copy (bucket/object)
+        """
+        source_bucket, source_object = self._split_path(source_path)
+        try:
+            await self.bucket_exists(bucket_name, create=True)
+            source = quote(f"/{source_bucket}/{source_object}")
+            response = await self._request(
+                "PUT", bucket_name, object_name, headers={"x-amz-copy-source": source}
+            )
+            self._raise_for_error(response.content, response.status_code)
+            return f"{bucket_name}/{object_name}"
+        except AsyncS3Error as e:
+            message = f"Error copying in MinIO: {str(e)}"
+            raise AsyncS3Error(message, e.code, e.status_code) from e
+
+    async def save_table(
+        self,
+        table: pa.Table,
+        bucket_name: str,
+        object_name: str,
+        encoding: Optional[ParquetEncoding] = None
+    ) -> ObjectWriteResult:
+        """
+        Save an Arrow table as a Parquet file in MinIO.
+
+        The file is encoded by a thread, into parts that are uploaded from the event
+        loop while the next ones are encoded. At most two encoded parts wait for
+        their upload, as with MinioClient.save_dataframe. The time spent encoding is
+        recorded as the "encode" stage of the request, and the time spent waiting
+        for MinIO, while the encoder is blocked or after it is done, as "upload".
+
+        Args:
+            table: Table to save
+            bucket_name: Name of the bucket (created if it does not exist)
+            object_name: Name of the object (should end with .parquet)
+            encoding: Encoding of the file (the Parquet writer defaults if omitted)
+
+        Returns:
+            The bucket, name, version and ETag of the saved file
+        """
+        if not object_name.endswith(".parquet"):
+            object_name = f"{object_name}.parquet"
+        encoding = encoding or ParquetEncoding()
+        loop = asyncio.get_running_loop()
+        parts: asyncio.Queue = asyncio.Queue()
+        sink = _PartSink(self.part_size, loop, parts)
+
+        def encode() -> float:
+            start_time = time.perf_counter()
+            try:
+                options = encoding.writer_options()
+                with pq.ParquetWriter(sink, table.schema, **options) as writer:
+                    writer.write_table(table, row_group_size=encoding.row_group_size)
+                sink.finish()
+            except BaseException as e:
+                # The upload must be aborted, not completed with the parts so far
+                loop.call_soon_threadsafe(parts.put_nowait, e)
+                raise
+            loop.call_soon_threadsafe(parts.put_nowait, None)
+            end_time = time.perf_counter()
+            record_stage("encode", end_time - start_time - sink.wait_seconds)
+            return end_time
+
+        async def encoded_parts() -> AsyncIterator[bytes]:
+            while (part := await parts.get()) is not None:
+                if isinstance(part, BaseException):
+                    raise ValueError(f"Error encoding Parquet: {str(part)}")
+                yield part
+                sink.release()
+
+        encoder = asyncio.ensure_future(asyncio.to_thread(encode))
+        try:
+            result = await self.upload(bucket_name, object_name, encoded_parts())
+        except BaseException:
+            # Unblock the encoder and let it finish before the table is released
+            sink.fail()
+            await asyncio.gather(encoder, return_exceptions=True)
+            raise
+        encoded_at = await encoder
+        record_stage("upload", sink.wait_seconds + time.perf_counter() - encoded_at)
+        return result
+
+    async def _request(
+        self,
+        method: str,
+        bucket_name: str,
+        object_name: Optional[str] = None,
+        query: Optional[Dict[str, str]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        content: Optional[bytes] = None,
+        stream: bool = False,
+    ) -> httpx.Response:
+        """
+        Send a signed request, retrying transport errors and 5xx responses.
+
+        Every attempt is counted for the request context it is made in, with the
+        bytes of successful uploads. Object stat requests are timed as the "stat"
+        stage and bucket existence checks as the "bucket_check" stage.
+
+        Raises:
+            AsyncS3Error: If MinIO answers with an error or cannot be reached
+        """
+        path = f"/{bucket_name}"
+        if object_name:
+            path = f"{path}/{quote(object_name)}"
+        query_string = "&".join(
+            f"{queryencode(key)}={queryencode(value)}"
+            for key, value in sorted((query or {}).items())
+        )
+        url = f"{self.base_url}{path}" + (f"?{query_string}" if query_string else "")
+
+        for attempt in range(settings.MINIO_MAX_RETRIES + 1):
+            round_trips = current_round_trips.get()
+            if round_trips is not None:
+                round_trips.record(method)
+            request = self.http.build_request(
+                method, url, headers=self._sign(method, url, headers), content=content
+            )
+            start_time = time.perf_counter()
+            try:
+                response = await self.http.send(request, stream=stream)
+            except httpx.TransportError as e:
+                if attempt == settings.MINIO_MAX_RETRIES:
+                    raise AsyncS3Error(f"Cannot reach MinIO: {str(e)}") from e
+                await asyncio.sleep(settings.MINIO_RETRY_BACKOFF * 2 ** attempt)
+                continue
+
+            retry = attempt < settings.MINIO_MAX_RETRIES
+            if response.status_code in RETRY_STATUSES and retry:
+                await response.aclose()
+                await asyncio.sleep(settings.MINIO_RETRY_BACKOFF * 2 ** attempt)
+                continue
+            if method == "HEAD":
+                record_stage(
+                    "stat" if object_name else "bucket_check",
+                    time.perf_counter() - start_time,
+                )
+            if response.status_code >= 300:
+                body = await response.aread()
+                self._raise_for_error(body, response.status_code, path.lstrip("/"))
+            if round_trips is not None and method == "PUT" and content:
+                round_trips.record_upload(len(content))
+            return response
+        raise AssertionError("unreachable")
+
+    def _sign(
+        self, method: str, url: str, headers: Optional[Dict[str, str]]
+    ) -> Dict[str, str]:
+        """Add the AWS Signature Version 4 headers to a request."""
+        split_url = urlsplit(url)
+        date = utcnow()
+        signed = {
+            **(headers or {}),
+            "Host": split_url.netloc,
+            "x-amz-date": to_amz_date(date),
+            "x-amz-content-sha256": UNSIGNED_PAYLOAD,
+        }
+        return sign_v4_s3(
+            method=method,
+            url=split_url,
+            region=settings.MINIO_REGION,
+            headers=signed,
+            credentials=self._credentials,
+            content_sha256=UNSIGNED_PAYLOAD,
+            date=date,
+        )
+
+    @staticmethod
+    def _range_headers(
+        offset: int, length: Optional[int], etag: Optional[str]
+    ) -> Dict[str, str]:
+        headers = {}
+        if offset or length is not None:
+            end = "" if length is None else str(offset + length - 1)
+            headers["Range"] = f"bytes={offset}-{end}"
+        if etag is not None:
+            headers["If-Match"] = f'"{etag}"'
+        return headers
+
+    @staticmethod
+    def _raise_for_error(
+        body: bytes, status_code: int, resource: Optional[str] = None
+    ) -> None:
+        """Raise the S3 error of a response, if it has one."""
+        if status_code < 300 and b"<Error>" not in body[:512]:
+            return
+        code = AsyncMinioClient._find_text(body, "Code")
+        message = AsyncMinioClient._find_text(body, "Message")
+        if code is None:
+            # HEAD responses have no body
+            code = {
+                404: "NoSuchKey", 403: "AccessDenied", 412: "PreconditionFailed"
+            }.get(status_code, "UnknownError")
+            message = f"{resource}: HTTP {status_code}"
+        raise AsyncS3Error(f"{code}: {message}", code, status_code)
+
+    @staticmethod
+    def _write_result(
+        bucket_name: str,
+        object_name: str,
+        etag: Optional[str],
+        response: httpx.Response,
+    ) -> ObjectWriteResult:
+        """Result of an upload, with the ETag unquoted like those of the SDK."""
+        return ObjectWriteResult(
+            bucket_name,
+            object_name,
+            response.headers.get("x-amz-version-id"),
+            (etag or "").strip('"') or None,
+            response.headers,
+        )
+
+    @staticmethod
+    def _find_text(body: bytes, tag: str) -> Optional[str]:
+        """Text of the first element with the given tag in an S3 XML response."""
+        try:
+            root = ET.fromstring(body)
+        except ET.ParseError:
+            return None
+        for element in root.iter():
+            if element.tag.rsplit("}", 1)[-1] == tag:
+                return element.text
+        return None
+
+    @staticmethod
+    def _split_path(path: str) -> Tuple[str, str]:
+        parts = path.split("/", 1)
+        if len(parts) != 2:
+            raise ValueError(
+                f"Invalid path format: {path}. Expected format: bucket/object"
+            )
+        return parts[0], parts[1]
+
+
+class _PartSink(io.RawIOBase):
+    """
+    Parquet writer sink that cuts the file into upload parts for the event loop.
+
+    Runs on the encoding thread; writes block while two parts wait for their upload,
+    for wait_seconds in total.
+    """
+
+    def __init__(
+        self, part_size: int, loop: asyncio.AbstractEventLoop, parts: asyncio.Queue
+    ):
+        self.part_size = part_size
+        self._loop = loop
+        self._parts = parts
+        self._buffer = bytearray()
+        self._position = 0
+        self._pending = threading.Semaphore(2)
+        self._failed = threading.Event()
+        self.wait_seconds = 0.0
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self._position += len(data)
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            self._emit(part)
+        return len(data)
+
+    def finish(self) -> None:
+        """Hand over the rest of the file as the last part."""
+        if self._buffer or self._position == 0:
+            self._emit(bytes(self._buffer))
+            self._buffer.clear()
+
+    def release(self) -> None:
+        """Called by the event loop once a part has been taken for upload."""
+        self._pending.release()
+
+    def fail(self) -> None:
+        """Make the encoder stop at its next part."""
+        self._failed.set()
+
+    def _emit(self, part: bytes) -> None:
+        start_time = time.perf_counter()
+        while not self._pending.acquire(timeout=0.1):
+            if self._failed.is_set():
+                raise IOError("Upload aborted")
+        self.wait_seconds += time.perf_counter() - start_time
+        if self._failed.is_set():
+            raise IOError("Upload aborted")
+        self._loop.call_soon_threadsafe(self._parts.put_nowait, part)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        # ParquetWriter closes its sink; the parts are handed over by finish()
+        pass
+
+
+# Singleton instance
+async_minio_client = AsyncMinioClient()
@@ -0,0 +1,261 @@
+import asyncio
+import posixpath
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.timing import StageTimer
+from app.schemas.batch import BatchItemResponse, BatchRequest, BatchResponse
+from app.schemas.process import ProcessOptions, ProcessRequest
+from app.services.execution_pool import execution_pool
+from app.services.minio_client import minio_client
+from app.services.processing import ProcessingError, processing_service
+
+
+class BatchService:
+    """
+    Runs the same code over many datasets.
+    
+    The code is validated once for the whole batch, and each dataset is then
+    processed as an ordinary job, so it goes through the result and dataset caches
+    and the admission control of the execution pool. At most `concurrency` datasets
+    of a batch are in flight at a time, never more than the job slots of the pool.
+    """
+    
+    async def run(self, request: BatchRequest) -> BatchResponse:
+        """
+        Process every dataset of a batch.
+        
+        A failing dataset does not stop the batch; its error is reported in its item.
+        
+        Args:
+            request: The batch request
+            
+        Returns:
+            The outcome of each dataset and the aggregated timings
+            
+        Raises:
+            ProcessingError: If the batch as a whole cannot be run
+        """
+        start_time = time.perf_counter()
+        timer = StageTimer()
+        
+        with timer.stage("validate"):
+            is_valid, validation_result = processing_service.validate(request)
+        
+        if not is_valid:
+            raise ProcessingError(
+                status_code=400,
+                detail=validation_result
+            )
+        
+        with timer.stage("list"):
+            dataset_paths = await self._dataset_paths(request)
+        
+        if len(dataset_paths) > settings.BATCH_MAX_DATASETS:
+            raise ProcessingError(
+                status_code=400,
+                detail={
+                    "error": f"Batch has {len(dataset_paths)} datasets, "
+                             f"the maximum is {settings.BATCH_MAX_DATASETS}"
+                }
+            )
+        
+        try:
+            output_prefix, output_objects = self._output_objects(
+                dataset_paths, request.output_prefix
+            )
+        except ValueError as e:
+            raise ProcessingError(
+                status_code=400,
+                detail={"error": str(e)}
+            ) from e
+        
+        if execution_pool.is_saturated():
+            raise ProcessingError(
+                status_code=503,
+                detail={
+                    "error": (
+                        f"Job queue is full ({execution_pool.queued_jobs} jobs waiting)"
+                    )
+                },
+                headers={"Retry-After": str(settings.QUEUE_FULL_RETRY_AFTER)}
+            )
+        
+        concurrency = min(
+            request.concurrency or settings.BATCH_CONCURRENCY,
+            execution_pool.max_concurrent_jobs
+        )
+        slots = asyncio.Semaphore(concurrency)
+        options = request.model_dump(include=set(ProcessOptions.model_fields))
+        items = await asyncio.gather(*(
+            self._run_item(dataset_path, output_object, options, slots)
+            for dataset_path, output_object in zip(
+                dataset_paths, output_objects, strict=True
+            )
+        ))
+        
+        # Sum the stages of all datasets; they overlap, so the total exceeds the
+        # elapsed time
+        for item in items:
+            for name, seconds in item.timings.items():
+                timer.record(name, seconds)
+        
+        succeeded = sum(1 for item in items if item.status == "success")
+        if succeeded == len(items):
+            status = "success"
+        elif succeeded:
+            status = "partial"
+        else:
+            status = "error"
+        
+        return BatchResponse(
+            status=status,
+            output_prefix=output_prefix,
+            total=len(items),
+            succeeded=succeeded,
+            failed=len(items) - succeeded,
+            elapsed=round(time.perf_counter() - start_time, 6),
+            timings=timer.as_dict(),
+            items=items
+        )
+    
+    async def _dataset_paths(self, request: BatchRequest) -> List[str]:
+        """
+        Resolve the datasets of a batch, in order and without duplicates.
+        
+        Args:
+            request: The batch request
+            
+        Returns:
+            Paths to the datasets (bucket/object)
+        """
+        if request.dataset_paths is not None:
+            return list(dict.fromkeys(request.dataset_paths))
+        
+        try:
+            dataset_paths = await execution_pool.run_io(
+                minio_client.list_objects, request.dataset_pattern
+            )
+        except ValueError as e:
+            raise ProcessingError(
+                status_code=404,
+                detail={"error": str(e)}
+            ) from e
+        if not dataset_paths:
+            raise ProcessingError(
+                status_code=404,
+                detail={"error": f"No datasets match {request.dataset_pattern}"}
+            )
+        return dataset_paths
+    
+    def _output_objects(
+        self, dataset_paths: List[str], output_prefix: Optional[str]
+    ) -> Tuple[str, List[Tuple[str, str]]]:
+        """
+        Choose where the result of each dataset is saved.
+        
+        Results keep the layout of the datasets below their common directory, so
+        partitioned inputs (year=2026/month=01/...) give partitioned outputs.
+        
+        Args:
+            dataset_paths: Paths to the datasets (bucket/object)
+            output_prefix: Prefix requested by the client (bucket/prefix), if any
+            
+        Returns:
+            Tuple containing the output prefix and the bucket and object name of the
+            result of each dataset
+        """
+        base_dir = posixpath.commonpath(
+            [posixpath.dirname(path) for path in dataset_paths]
+        )
+        
+        if output_prefix is None:
+            # A new prefix next to the inputs, like the results of single jobs
+            timestamp = int(time.time())
+            unique_id = str(uuid.uuid4())[:8]
+            parent = base_dir or dataset_paths[0].split("/", 1)[0]
+            output_prefix = f"{parent}/processed/batch_{timestamp}_{unique_id}"
+        
+        output_bucket, _, prefix = output_prefix.strip("/").partition("/")
+        if not output_bucket:
+            raise ValueError(
+                f"Invalid output prefix: {output_prefix}. "
+                "Expected format: bucket/prefix"
+            )
+        prefix = prefix.strip("/")
+        
+        output_objects = []
+        for dataset_path in dataset_paths:
+            relative_path = dataset_path[len(base_dir):].lstrip("/")
+            object_name = f"{posixpath.splitext(relative_path)[0]}.parquet"
+            if prefix:
+                object_name = f"{prefix}/{object_name}"
+            output_objects.append((output_bucket, object_name))
+        
+        duplicates = len(output_objects) - len(set(output_objects))
+        if duplicates:
+            raise ValueError(
+                f"{duplicates} datasets would be saved to the same result file; "
+                "datasets in the same directory must have different names"
+            )
+        
+        return "/".join(filter(None, (output_bucket, prefix))), output_objects
+    
+    async def _run_item(
+        self,
+        dataset_path: str,
+        output_object: Tuple[str, str],
+        options: Dict[str, Any],
+        slots: asyncio.Semaphore
+    ) -> BatchItemResponse:
+        """
+        Process one dataset of a batch.
+        
+        Args:
+            dataset_path: Path to the dataset (bucket/object)
+            output_object: Bucket and object name to save the result to
+            options: Code and options shared by the datasets of the batch
+            slots: Semaphore bounding the datasets of the batch in flight
+            
+        Returns:
+            The outcome of the dataset
+        """
+        # The batch bounds its own datasets in flight, so they wait for a job slot
+        # rather than failing when the queue fills up behind them
+        async with slots:
+            timer = StageTimer()
+            try:
+                response = await processing_service.run(
+                    ProcessRequest(dataset_path=dataset_path, **options),
+                    timer,
+                    output_object=output_object,
+                    validated=True,
+                    wait_for_slot=True
+                )
+            except ProcessingError as e:
+                error = {"status_code": e.status_code, **e.detail}
+            except Exception as e:
+                error = {
+                    "status_code": 500,
+                    "error": f"An unexpected error occurred: {str(e)}"
+                }
+            else:
+                return BatchItemResponse(
+                    dataset_path=dataset_path,
+                    status="success",
+                    result=response,
+                    timings=timer.as_dict()
+                )
+            
+            return BatchItemResponse(
+                dataset_path=dataset_path,
+                status="error",
+                error=error,
+                timings=timer.as_dict()
+            )
+
+
+# Singleton instance
+batch_service = BatchService()
@@ -1,15 +1,26 @@
+import functools
+import inspect
+import math
+import os
 import time
 import traceback
-from typing import Dict, Any, Tuple, Optional
+from typing import Callable, ContextManager, Dict, Any, List, Tuple, Optional, Union
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+from threadpoolctl import threadpool_limits
 import importlib
 import sys
 import resource
 import signal
-from contextlib import contextmanager
+from contextlib import contextmanager, nullcontext
+from types import CodeType
 
 from app.core.config import settings
+from app.services.features import catch22_features
+from app.services.minio_file import select_table
+from app.services.profiling import USER_CODE_FILENAME, CallProfiler
+from app.services.shared_tables import shared_table_store, table_to_dataframe
 
 
 class TimeoutException(Exception):
@@ -17,49 +28,270 @@ class TimeoutException(Exception):
     pass
 
 
+class CPUTimeLimitException(Exception):
+    """Exception raised when code execution exceeds its CPU time budget."""
+    pass
+
+
 @contextmanager
 def time_limit(seconds: int):
     """
     Context manager to limit execution time.
     
+    Must be used from the main thread of the process running the code.
+    
     Args:
         seconds: Maximum execution time in seconds
     """
     def signal_handler(signum, frame):
         raise TimeoutException("Code execution timed out")
     
-    signal.signal(signal.SIGALRM, signal_handler)
+    previous_handler = signal.signal(signal.SIGALRM, signal_handler)
     signal.alarm(seconds)
     try:
         yield
     finally:
         signal.alarm(0)
+        signal.signal(signal.SIGALRM, previous_handler)
+
+
+def current_memory_usage() -> Tuple[int, int]:
+    """
+    Get the virtual memory size and resident set size of the current process.
+    
+    Returns:
+        Tuple containing the virtual memory size and the resident set size in bytes
+        (both 0 when /proc is not available)
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            size_pages, resident_pages = statm.read().split()[:2]
+    except (OSError, ValueError):
+        return 0, 0
+    page_size = resource.getpagesize()
+    return int(size_pages) * page_size, int(resident_pages) * page_size
+
+
+def reset_peak_memory() -> None:
+    """Reset the peak resident set size of the current process (Linux only)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        pass
 
 
-def set_resource_limits(max_memory_mb: int):
+def peak_memory_usage() -> int:
     """
-    Set resource limits for the current process.
+    Get the peak resident set size of the current process.
+    
+    On Linux this is the peak since the last reset_peak_memory call; elsewhere it
+    is the peak over the lifetime of the process.
+    
+    Returns:
+        Peak resident set size in bytes
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@contextmanager
+def resource_limits(max_memory_mb: int, max_cpu_seconds: int):
+    """
+    Context manager to limit the resources available to the current process.
+    
+    Only the soft limits are changed, so the previous limits are restored on exit
+    and a long-lived sandbox worker can run the next job with its own limits.
+    The memory budget is counted on top of the address space the process already
+    uses, so the memory taken by the pre-imported libraries is not charged to the job.
     
     Args:
-        max_memory_mb: Maximum memory in MB
+        max_memory_mb: Maximum additional memory in MB
+        max_cpu_seconds: Maximum CPU time in seconds
     """
+    def signal_handler(signum, frame):
+        raise CPUTimeLimitException("Code execution exceeded its CPU time budget")
+    
+    previous_memory_limit = resource.getrlimit(resource.RLIMIT_AS)
+    previous_cpu_limit = resource.getrlimit(resource.RLIMIT_CPU)
+    previous_handler = signal.signal(signal.SIGXCPU, signal_handler)
+    
     # Convert MB to bytes
-    max_memory_bytes = max_memory_mb * 1024 * 1024
+    max_memory_bytes = current_memory_usage()[0] + max_memory_mb * 1024 * 1024
+    
+    # RLIMIT_CPU counts the whole lifetime of the process, so add the budget to the
+    # CPU time already used
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    max_cpu = math.ceil(usage.ru_utime + usage.ru_stime + max_cpu_seconds)
+    
+    try:
+        memory_hard_limit = previous_memory_limit[1]
+        cpu_hard_limit = previous_cpu_limit[1]
+        resource.setrlimit(
+            resource.RLIMIT_AS,
+            (_clamp_limit(max_memory_bytes, memory_hard_limit), memory_hard_limit)
+        )
+        resource.setrlimit(
+            resource.RLIMIT_CPU,
+            (_clamp_limit(max_cpu, cpu_hard_limit), cpu_hard_limit)
+        )
+        yield
+    finally:
+        resource.setrlimit(resource.RLIMIT_AS, previous_memory_limit)
+        resource.setrlimit(resource.RLIMIT_CPU, previous_cpu_limit)
+        signal.signal(signal.SIGXCPU, previous_handler)
+
+
+def _clamp_limit(value: int, hard_limit: int) -> int:
+    """Keep a soft limit within the hard limit of the process."""
+    if hard_limit == resource.RLIM_INFINITY:
+        return value
+    return min(value, hard_limit)
+
+
+@contextmanager
+def cpu_affinity(cores: Optional[List[int]]):
+    """
+    Context manager to run the current process on a set of cores.
+    
+    Every thread of the process is pinned to the cores, including the thread pools
+    numpy and pyarrow started earlier, and the pyarrow, BLAS and OpenMP pools are
+    capped at one thread per core. The previous affinity and pool sizes are
+    restored on exit. Affinity is only supported on Linux; elsewhere only the
+    pools are capped.
+    
+    Args:
+        cores: Cores to run on (no change if None)
+    """
+    if not cores:
+        yield
+        return
+    
+    previous_cores = None
+    if hasattr(os, "sched_setaffinity"):
+        previous_cores = os.sched_getaffinity(0)
+    previous_arrow_threads = pa.cpu_count()
+    try:
+        if previous_cores is not None:
+            _set_process_affinity(cores)
+        pa.set_cpu_count(len(cores))
+        with threadpool_limits(limits=len(cores)):
+            yield
+    finally:
+        pa.set_cpu_count(previous_arrow_threads)
+        if previous_cores is not None:
+            _set_process_affinity(previous_cores)
+
+
+def _set_process_affinity(cores) -> None:
+    """
+    Pin every thread of the current process; sched_setaffinity(0) only pins the
+    calling thread.
+    """
+    try:
+        thread_ids = [int(tid) for tid in os.listdir("/proc/self/task")]
+    except OSError:
+        thread_ids = [0]
+    for thread_id in thread_ids:
+        try:
+            os.sched_setaffinity(thread_id, cores)
+        except OSError:
+            # The thread exited
+            pass
+
+
+@functools.lru_cache(maxsize=settings.CODE_CACHE_SIZE)
+def compile_code(code: str) -> CodeType:
+    """
+    Compile user code, caching the code object by source.
+    
+    Each sandbox worker keeps its own cache, so a script that is resubmitted is
+    only compiled the first time it reaches a given worker.
+    
+    Args:
+        code: Python source code
+        
+    Returns:
+        The compiled module code object
+    """
+    return compile(code, USER_CODE_FILENAME, "exec")
+
+
+def partition_table(
+    table: pa.Table,
+    index: int,
+    count: int,
+    partition_by: Optional[List[str]] = None
+) -> pa.Table:
+    """
+    Select one of the partitions of a table in map mode.
+    
+    Without partition_by, the rows are split into count contiguous slices of the
+    same size. With partition_by, rows with the same key stay together: the keys
+    are numbered in order of first appearance and cut into count ranges holding
+    about the same number of rows. Concatenating the results of the partitions in
+    order keeps the keys in order of first appearance.
+    
+    Every worker computes the split of the whole table, so no partition is copied
+    before it reaches its worker.
+    
+    Args:
+        table: The table to split
+        index: Zero-based index of the partition to select
+        count: Number of partitions
+        partition_by: Key columns
+        
+    Returns:
+        The rows of the partition
+    """
+    rows = table.num_rows
+    if not partition_by:
+        start = rows * index // count
+        return table.slice(start, rows * (index + 1) // count - start)
+    
+    missing = [column for column in partition_by if column not in table.schema.names]
+    if missing:
+        raise ValueError(f"Unknown partition columns: {', '.join(missing)}")
+    if rows == 0:
+        return table
     
-    # Set memory limit
-    resource.setrlimit(resource.RLIMIT_AS, (max_memory_bytes, max_memory_bytes))
+    keys = table.select(partition_by).to_pandas()
+    codes = keys.groupby(partition_by, sort=False, dropna=False).ngroup().to_numpy()
+    sizes = np.bincount(codes)
+    # Each key goes to the partition its middle row falls into
+    middles = np.cumsum(sizes) - sizes / 2
+    key_partitions = np.minimum((middles * count // rows).astype(np.int64), count - 1)
+    return table.filter(pa.array(key_partitions[codes] == index))
 
 
 class CodeExecutor:
+    """
+    Runs user code against a DataFrame.
+    
+    execute_code applies process-wide resource limits and a SIGALRM timer, so it
+    must run in the main thread of a sandbox worker (see app.services.sandbox_pool),
+    never in the API server process.
+    """
+    
     def __init__(self):
         pass
     
     def execute_code(
         self, 
-        code: str, 
+        code: Optional[str], 
         df: pd.DataFrame, 
         timeout: Optional[int] = None,
-        max_memory: Optional[int] = None
+        max_memory: Optional[int] = None,
+        inputs: Optional[Dict[str, pd.DataFrame]] = None,
+        builtin: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+        max_cpu: Optional[float] = None,
+        profiler: Optional[ContextManager[Any]] = None
     ) -> Tuple[bool, Dict[str, Any]]:
         """
         Execute the user's code in a sandbox environment.
@@ -69,6 +301,14 @@ class CodeExecutor:
             df: Input DataFrame
             timeout: Maximum execution time in seconds
             max_memory: Maximum memory in MB
+            inputs: Additional DataFrames by name, passed to 'process' as the keyword
+                arguments it declares
+            builtin: Built-in function called instead of the process function of
+                code, under the same limits
+            max_cpu: Maximum CPU cores; the CPU time budget is timeout x max_cpu
+                core-seconds
+            profiler: Context the code and the call to 'process' run in, to profile
+                them (see CallProfiler.step)
             
         Returns:
             Tuple containing a boolean indicating if the execution was successful and a dictionary with execution details
@@ -76,6 +316,7 @@ class CodeExecutor:
         # Set default values if not provided
         timeout = timeout or settings.DEFAULT_TIMEOUT
         max_memory = max_memory or settings.DEFAULT_MAX_MEMORY
+        max_cpu_seconds = math.ceil(timeout * (max_cpu or settings.DEFAULT_MAX_CPU))
         
         # Create a namespace for execution
         namespace = {
@@ -88,34 +329,41 @@ class CodeExecutor:
         try:
             import pycatch22
             namespace["pycatch22"] = pycatch22
+            namespace["catch22_features"] = catch22_features
         except ImportError:
             pass
         
         # Add the input DataFrame to the namespace
-        # Make a copy to prevent modifications to the original
-        namespace["input_df"] = df.copy()
+        # No defensive copy: the worker owns its DataFrame, and copy-on-write
+        # only copies the columns the code modifies
+        namespace["input_df"] = df
         
         try:
-            # Set resource limits
-            set_resource_limits(max_memory)
-            
-            # Execute the code with a time limit
-            with time_limit(timeout):
+            # Execute the code with resource and time limits
+            with resource_limits(max_memory, max_cpu_seconds), time_limit(timeout):
                 start_time = time.time()
                 
-                # Execute the user's code
-                exec(code, namespace)
-                
-                # Check if the process function exists
-                if "process" not in namespace or not callable(namespace["process"]):
-                    return False, {
-                        "success": False,
-                        "error": "No 'process' function found in the code",
-                        "execution_time": time.time() - start_time
-                    }
-                
-                # Call the process function with the input DataFrame
-                result_df = namespace["process"](namespace["input_df"])
+                with profiler or nullcontext():
+                    if builtin is not None:
+                        process = builtin
+                        inputs = None
+                    else:
+                        # Execute the user's code, compiled once per worker
+                        exec(compile_code(code), namespace)
+                        
+                        # Check if the process function exists
+                        process = namespace.get("process")
+                        if process is None or not callable(process):
+                            return False, {
+                                "success": False,
+                                "error": "No 'process' function found in the code",
+                                "execution_time": time.time() - start_time
+                            }
+                    
+                    # Call the process function with the input DataFrame
+                    result_df = process(
+                        namespace["input_df"], **self._process_kwargs(process, inputs)
+                    )
                 
                 # Check if the result is a DataFrame
                 if not isinstance(result_df, pd.DataFrame):
@@ -125,12 +373,6 @@ class CodeExecutor:
                         "execution_time": time.time() - start_time
                     }
                 
-                # Optimize the DataFrame for Parquet storage
-                # Convert object columns to categorical if they have few unique values
-                for col in result_df.select_dtypes(include=['object']).columns:
-                    if result_df[col].nunique() < len(result_df) * 0.5:  # If less than 50% unique values
-                        result_df[col] = result_df[col].astype('category')
-                
                 execution_time = time.time() - start_time
                 
                 return True, {
@@ -146,6 +388,14 @@ class CodeExecutor:
                 "success": False,
                 "error": f"Code execution timed out after {timeout} seconds"
             }
+        except CPUTimeLimitException:
+            return False, {
+                "success": False,
+                "error": (
+                    "Code execution exceeded its CPU time budget of "
+                    f"{max_cpu_seconds} seconds"
+                )
+            }
         except MemoryError:
             return False, {
                 "success": False,
@@ -157,7 +407,220 @@ class CodeExecutor:
                 "error": str(e),
                 "traceback": traceback.format_exc()
             }
+    
+    @staticmethod
+    def _process_kwargs(
+        process: Callable[..., Any], inputs: Optional[Dict[str, pd.DataFrame]]
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Select the additional inputs a 'process' function accepts.
+        
+        A function taking **kwargs gets every input; otherwise only the inputs named
+        by its parameters are passed, so the steps of a pipeline can each declare the
+        inputs they use.
+        """
+        if not inputs:
+            return {}
+        try:
+            parameters = inspect.signature(process).parameters
+        except (TypeError, ValueError):
+            return dict(inputs)
+        if any(p.kind == inspect.Parameter.VAR_KEYWORD for p in parameters.values()):
+            return dict(inputs)
+        return {name: df for name, df in inputs.items() if name in parameters}
+    
+    def execute_pipeline(
+        self,
+        steps: List[Tuple[str, Union[str, Dict[str, Any]]]],
+        input_path: str,
+        output_path: str,
+        timeout: Optional[int] = None,
+        max_memory: Optional[int] = None,
+        columns: Optional[List[str]] = None,
+        filters: Optional[List[List[Tuple[str, str, Any]]]] = None,
+        checkpoint_paths: Optional[Dict[str, str]] = None,
+        input_paths: Optional[Dict[str, str]] = None,
+        dtype_backend: str = "numpy",
+        partition: Optional[Tuple[int, int]] = None,
+        partition_by: Optional[List[str]] = None,
+        max_cpu: Optional[float] = None,
+        profile: bool = False
+    ) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Execute a pipeline of steps on a table exchanged through shared memory.
+        
+        Each step is called on the DataFrame returned by the previous one, which
+        stays in the worker's memory. Only the output of the last step, and of the
+        steps listed in checkpoint_paths, is written to shared memory. The timeout
+        applies to the whole pipeline. Besides the execution time of the steps, the
+        result reports the time spent converting the input tables to DataFrames
+        (convert_time) and writing the outputs to shared memory (write_time), and,
+        when columns or filters are given, the rows_read and rows_skipped by the
+        selection (selection).
+        
+        Args:
+            steps: Name and Python code of each step, in order; built-in catch22
+                steps have the keyword arguments of catch22_features instead of code
+            input_path: Path of the shared input table
+            output_path: Path where the shared result table is written
+            timeout: Maximum execution time of the pipeline in seconds
+            max_memory: Maximum memory in MB
+            columns: Columns to select from the input table (all if omitted)
+            filters: Row filters to apply to the input table
+            checkpoint_paths: Paths where the outputs of checkpoint steps are written,
+                by step name
+            input_paths: Paths of additional shared input tables, by the name under
+                which they are passed to the steps
+            dtype_backend: Backing of the DataFrames passed to the steps ("numpy" or
+                "pyarrow")
+            partition: Index and number of partitions of a map job; the steps only
+                run on the selected partition of the input table (see partition_table).
+                Empty partitions other than the first are skipped, and their
+                result_path is None
+            partition_by: Key columns of the partitions
+            max_cpu: Maximum CPU cores, which sets the CPU time budget of each step
+            profile: Profile the steps; the summary of CallProfiler is returned as
+                "profile", also when a step fails
+            
+        Returns:
+            Tuple containing a boolean indicating if the execution was successful and
+            a dictionary with execution details
+        """
+        timeout = timeout or settings.DEFAULT_TIMEOUT
+        checkpoint_paths = checkpoint_paths or {}
+        
+        reset_peak_memory()
+        convert_start = time.perf_counter()
+        try:
+            table = shared_table_store.read(input_path)
+            selection = None
+            if columns is not None or filters is not None:
+                rows = table.num_rows
+                table = select_table(table, columns, filters)
+                selection = {
+                    "rows_read": table.num_rows,
+                    "rows_skipped": rows - table.num_rows
+                }
+            if partition is not None:
+                table = partition_table(table, *partition, partition_by)
+            input_tables = {
+                name: shared_table_store.read(path)
+                for name, path in (input_paths or {}).items()
+            }
+        except (pa.ArrowException, ValueError) as e:
+            return False, {"success": False, "error": str(e)}
+        
+        if partition is not None and partition[0] > 0 and table.num_rows == 0:
+            # The first partition alone gives the result its columns
+            return True, {
+                "success": True,
+                "selection": selection,
+                "execution_time": 0.0,
+                "convert_time": 0.0,
+                "write_time": 0.0,
+                "input_rows": 0,
+                "rows": 0,
+                "columns": [],
+                "steps": [],
+                "result_path": None,
+                "peak_memory": peak_memory_usage(),
+            }
+        input_rows = table.num_rows
+        df = table_to_dataframe(table, dtype_backend)
+        inputs = {
+            name: table_to_dataframe(input_table, dtype_backend)
+            for name, input_table in input_tables.items()
+        }
+        del table, input_tables
+        convert_time = time.perf_counter() - convert_start
+        
+        start_time = time.time()
+        write_time = 0.0
+        step_results = []
+        profiler = CallProfiler() if profile else None
+        for name, code in steps:
+            # Later steps get what is left of the time budget, and do not start
+            # once it is spent
+            remaining = timeout - (time.time() - start_time)
+            if remaining <= 0:
+                success, result = False, {
+                    "success": False,
+                    "error": f"Code execution timed out after {timeout} seconds"
+                }
+            else:
+                success, result = self.execute_code(
+                    code=code if isinstance(code, str) else None,
+                    df=df,
+                    timeout=math.ceil(remaining),
+                    max_memory=max_memory,
+                    inputs=inputs,
+                    builtin=(
+                        functools.partial(catch22_features, **code)
+                        if isinstance(code, dict) else None
+                    ),
+                    max_cpu=max_cpu,
+                    profiler=profiler.step(name) if profiler is not None else None
+                )
+            if not success:
+                if len(steps) > 1:
+                    result["error"] = f"Step '{name}': {result['error']}"
+                    result["step"] = name
+                if profiler is not None:
+                    result["profile"] = profiler.summary()
+                return False, result
+            
+            df = result.pop("result_df")
+            step_result = {
+                "name": name,
+                "execution_time": result["execution_time"],
+                "rows": result["rows"],
+                "columns": result["columns"],
+            }
+            if name in checkpoint_paths:
+                write_start = time.perf_counter()
+                error = self._write_result(df, checkpoint_paths[name])
+                write_time += time.perf_counter() - write_start
+                if error is not None:
+                    return False, {
+                        "success": False,
+                        "error": f"Step '{name}': {error}",
+                        "step": name
+                    }
+                step_result["result_path"] = checkpoint_paths[name]
+            step_results.append(step_result)
+        
+        write_start = time.perf_counter()
+        error = self._write_result(df, output_path)
+        write_time += time.perf_counter() - write_start
+        if error is not None:
+            return False, {"success": False, "error": error}
+        
+        outcome = {
+            "success": True,
+            "selection": selection,
+            "execution_time": sum(step["execution_time"] for step in step_results),
+            "convert_time": convert_time,
+            "write_time": write_time,
+            "input_rows": input_rows,
+            "rows": step_results[-1]["rows"],
+            "columns": step_results[-1]["columns"],
+            "steps": step_results,
+            "result_path": output_path,
+            "peak_memory": peak_memory_usage(),
+        }
+        if profiler is not None:
+            outcome["profile"] = profiler.summary()
+        return True, outcome
+    
+    @staticmethod
+    def _write_result(df: pd.DataFrame, path: str) -> Optional[str]:
+        """Write a result DataFrame to shared memory, or return why it cannot be."""
+        try:
+            shared_table_store.write(df, path)
+        except (pa.ArrowException, ValueError, TypeError) as e:
+            return f"The DataFrame returned by 'process' cannot be stored: {str(e)}"
+        return None
 
 
 # Singleton instance
-code_executor = CodeExecutor() 
\ No newline at end of file
+code_executor = CodeExecutor() 
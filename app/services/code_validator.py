@@ -1,4 +1,5 @@
 import ast
+import functools
 from typing import List, Dict, Any, Tuple, Set
 
 from app.core.config import settings
@@ -88,52 +89,61 @@ class CodeValidator:
             "concurrent", "concurrent.futures", "subprocess", "sched", "queue",
             "dummy_threading", "_thread",
         }
+        self._validate_cached = functools.lru_cache(maxsize=settings.CODE_CACHE_SIZE)(
+            self._validate
+        )
 
     def validate_code(self, code: str) -> Tuple[bool, Dict[str, Any]]:
         """
         Validate the user's code for security and correctness.
         
+        Verdicts are cached by source (CODE_CACHE_SIZE entries, least recently
+        used first out), so resubmitted scripts are not parsed again.
+        
         Args:
             code: Python code to validate
             
         Returns:
             Tuple containing a boolean indicating if the code is valid and a dictionary with validation details
         """
+        return self._validate_cached(code)
+    
+    def cache_stats(self) -> Dict[str, int]:
+        """Return the hit and miss counters and the size of the verdict cache."""
+        info = self._validate_cached.cache_info()
+        return {"hits": info.hits, "misses": info.misses, "entries": info.currsize}
+    
+    def _validate(self, code: str) -> Tuple[bool, Dict[str, Any]]:
         try:
-            # Parse the code into an AST
+            # Parse the code into an AST and check it in a single walk
             tree = ast.parse(code)
+            visitor = CodeVisitor(
+                self.allowed_imports, self.disallowed_modules, self.disallowed_functions
+            )
+            visitor.visit(tree)
             
             # Check for imports
-            import_validator = ImportValidator(self.allowed_imports, self.disallowed_modules)
-            import_validator.visit(tree)
-            
-            if import_validator.disallowed_imports:
+            if visitor.disallowed_imports:
                 return False, {
                     "valid": False,
                     "error": "Disallowed imports detected",
                     "details": {
-                        "disallowed_imports": list(import_validator.disallowed_imports)
+                        "disallowed_imports": list(visitor.disallowed_imports)
                     }
                 }
             
             # Check for dangerous function calls
-            function_validator = FunctionValidator(self.disallowed_functions)
-            function_validator.visit(tree)
-            
-            if function_validator.dangerous_calls:
+            if visitor.dangerous_calls:
                 return False, {
                     "valid": False,
                     "error": "Dangerous function calls detected",
                     "details": {
-                        "dangerous_calls": list(function_validator.dangerous_calls)
+                        "dangerous_calls": list(visitor.dangerous_calls)
                     }
                 }
             
             # Check for process function
-            process_validator = ProcessFunctionValidator()
-            process_validator.visit(tree)
-            
-            if not process_validator.has_process_function:
+            if not visitor.has_process_function:
                 return False, {
                     "valid": False,
                     "error": "No 'process' function found",
@@ -142,7 +152,7 @@ class CodeValidator:
                     }
                 }
             
-            if not process_validator.has_correct_signature:
+            if not visitor.has_correct_signature:
                 return False, {
                     "valid": False,
                     "error": "Invalid 'process' function signature",
@@ -153,7 +163,7 @@ class CodeValidator:
             
             return True, {
                 "valid": True,
-                "imports": list(import_validator.allowed_imports)
+                "imports": list(visitor.allowed_imports_found)
             }
             
         except SyntaxError as e:
@@ -174,40 +184,41 @@ class CodeValidator:
             }
 
 
-class ImportValidator(ast.NodeVisitor):
-    def __init__(self, allowed_imports: Set[str], disallowed_modules: Set[str]):
+class CodeVisitor(ast.NodeVisitor):
+    """Collects imports, dangerous calls and the 'process' function in one AST walk."""
+    
+    def __init__(
+        self,
+        allowed_imports: Set[str],
+        disallowed_modules: Set[str],
+        disallowed_functions: Set[str]
+    ):
         self.allowed_imports = allowed_imports
         self.disallowed_modules = disallowed_modules
+        self.disallowed_functions = disallowed_functions
         self.allowed_imports_found: Set[str] = set()
         self.disallowed_imports: Set[str] = set()
+        self.dangerous_calls: Set[str] = set()
+        self.has_process_function = False
+        self.has_correct_signature = False
+    
+    def _check_module(self, module_name: str) -> None:
+        if module_name in self.disallowed_modules:
+            self.disallowed_imports.add(module_name)
+        elif module_name in self.allowed_imports:
+            self.allowed_imports_found.add(module_name)
+        else:
+            self.disallowed_imports.add(module_name)
     
     def visit_Import(self, node: ast.Import) -> None:
         for name in node.names:
-            module_name = name.name.split('.')[0]
-            if module_name in self.disallowed_modules:
-                self.disallowed_imports.add(module_name)
-            elif module_name in self.allowed_imports:
-                self.allowed_imports_found.add(module_name)
-            else:
-                self.disallowed_imports.add(module_name)
+            self._check_module(name.name.split('.')[0])
         self.generic_visit(node)
     
     def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
         if node.module:
-            module_name = node.module.split('.')[0]
-            if module_name in self.disallowed_modules:
-                self.disallowed_imports.add(module_name)
-            elif module_name in self.allowed_imports:
-                self.allowed_imports_found.add(module_name)
-            else:
-                self.disallowed_imports.add(module_name)
+            self._check_module(node.module.split('.')[0])
         self.generic_visit(node)
-
-
-class FunctionValidator(ast.NodeVisitor):
-    def __init__(self, disallowed_functions: Set[str]):
-        self.disallowed_functions = disallowed_functions
-        self.dangerous_calls: Set[str] = set()
     
     def visit_Call(self, node: ast.Call) -> None:
         if isinstance(node.func, ast.Name):
@@ -220,12 +231,6 @@ class FunctionValidator(ast.NodeVisitor):
                 if full_name in self.disallowed_functions:
                     self.dangerous_calls.add(full_name)
         self.generic_visit(node)
-
-
-class ProcessFunctionValidator(ast.NodeVisitor):
-    def __init__(self):
-        self.has_process_function = False
-        self.has_correct_signature = False
     
     def visit_FunctionDef(self, node: ast.FunctionDef) -> None:
         if node.name == "process":
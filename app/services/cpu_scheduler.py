@@ -0,0 +1,192 @@
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from app.core.config import settings
+
+# Tenant of the jobs that do not name one
+DEFAULT_TENANT = "default"
+
+
+def available_cores() -> List[int]:
+    """The cores the API server process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class _Waiter:
+    """A sandbox run waiting for cores."""
+
+    def __init__(self, tenant: str, cores: int, future: "asyncio.Future[List[int]]"):
+        self.tenant = tenant
+        self.cores = cores
+        self.future = future
+        self.arrival = time.monotonic()
+
+
+class CpuScheduler:
+    """
+    Allocates the cores of the node to sandbox runs by fair share between tenants.
+
+    Every sandbox run (a job, a chunk of a chunked job or a partition of a map job)
+    asks for the whole cores of its max_cpu and is pinned to the cores it gets. When
+    cores are freed, the waiting runs are served in order of the cores their tenant
+    holds, then of the tenant's recent usage in core-seconds, which decays with a
+    half-life of CPU_FAIR_SHARE_HALF_LIFE seconds, then of arrival. A run that asks
+    for more cores than are free does not block smaller runs behind it, so small
+    interactive jobs start while large batch jobs hold most of the node; once a run
+    has waited CPU_STARVATION_SECONDS, no run may overtake it.
+
+    The scheduler runs on the event loop and only sees the jobs of its own API
+    server process.
+    """
+
+    def __init__(self):
+        self.enabled = settings.CPU_SCHEDULER_ENABLED
+        self.cores = available_cores()
+        self.half_life = settings.CPU_FAIR_SHARE_HALF_LIFE
+        self.starvation_seconds = settings.CPU_STARVATION_SECONDS
+        self._free: List[int] = list(self.cores)
+        self._waiting: List[_Waiter] = []
+        self._held: Dict[str, int] = {}
+        self._usage: Dict[str, float] = {}
+        self._charged_at = time.monotonic()
+        self.allocations = 0
+        self.wait_seconds = 0.0
+
+    def cores_for(self, max_cpu: Optional[float]) -> int:
+        """
+        Number of cores a run with a CPU limit is allocated.
+
+        Args:
+            max_cpu: CPU limit of the run in cores (DEFAULT_MAX_CPU if omitted)
+
+        Returns:
+            The limit rounded up to whole cores, between one and the cores of the node
+        """
+        max_cpu = max_cpu or settings.DEFAULT_MAX_CPU
+        return max(1, min(math.ceil(max_cpu), len(self.cores)))
+
+    @asynccontextmanager
+    async def allocate(
+        self, max_cpu: Optional[float], tenant: Optional[str] = None
+    ) -> AsyncIterator[Optional[List[int]]]:
+        """
+        Reserve cores for a sandbox run, waiting for its fair share.
+
+        Args:
+            max_cpu: CPU limit of the run in cores
+            tenant: Tenant the run is accounted to (DEFAULT_TENANT if omitted)
+
+        Yields:
+            The allocated cores, or None if the scheduler is disabled
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(
+            tenant or DEFAULT_TENANT, self.cores_for(max_cpu), loop.create_future()
+        )
+        self._waiting.append(waiter)
+        self._dispatch()
+        try:
+            cores = await waiter.future
+        except asyncio.CancelledError:
+            if waiter in self._waiting:
+                self._waiting.remove(waiter)
+                self._dispatch()
+            elif waiter.future.done() and not waiter.future.cancelled():
+                self._release(waiter.tenant, waiter.future.result())
+            raise
+        self.wait_seconds += time.monotonic() - waiter.arrival
+
+        try:
+            yield cores
+        finally:
+            self._release(waiter.tenant, cores)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the free and allocated cores, the waiting runs and tenant usage."""
+        self._charge()
+        return {
+            "enabled": self.enabled,
+            "cores": len(self.cores),
+            "free": len(self._free),
+            "waiting": len(self._waiting),
+            "allocations": self.allocations,
+            "wait_seconds": round(self.wait_seconds, 3),
+            "tenants": {
+                tenant: {
+                    "cores": self._held.get(tenant, 0),
+                    "core_seconds": round(usage, 3),
+                }
+                for tenant, usage in sorted(self._usage.items())
+            },
+        }
+
+    def _dispatch(self) -> None:
+        """Hand free cores to the waiting runs, in fair-share order."""
+        self._charge()
+        now = time.monotonic()
+        while self._waiting:
+            starving = [
+                waiter for waiter in self._waiting
+                if now - waiter.arrival >= self.starvation_seconds
+            ]
+            if starving:
+                # The oldest starving run goes next, whatever it waits for
+                candidates = [min(starving, key=lambda waiter: waiter.arrival)]
+            else:
+                candidates = sorted(
+                    self._waiting,
+                    key=lambda waiter: (
+                        self._held.get(waiter.tenant, 0),
+                        self._usage.get(waiter.tenant, 0.0),
+                        waiter.arrival,
+                    ),
+                )
+            waiter = next(
+                (waiter for waiter in candidates if waiter.cores <= len(self._free)),
+                None,
+            )
+            if waiter is None:
+                return
+
+            self._waiting.remove(waiter)
+            cores, self._free = self._free[:waiter.cores], self._free[waiter.cores:]
+            self._held[waiter.tenant] = self._held.get(waiter.tenant, 0) + len(cores)
+            self._usage.setdefault(waiter.tenant, 0.0)
+            self.allocations += 1
+            waiter.future.set_result(cores)
+
+    def _release(self, tenant: str, cores: List[int]) -> None:
+        """Return the cores of a finished run and serve the waiting runs."""
+        self._charge()
+        self._held[tenant] -= len(cores)
+        if self._held[tenant] == 0:
+            del self._held[tenant]
+        self._free = sorted(self._free + cores)
+        self._dispatch()
+
+    def _charge(self) -> None:
+        """Decay the tenants' usage and charge the cores held since the last update."""
+        now = time.monotonic()
+        elapsed = now - self._charged_at
+        self._charged_at = now
+        decay = 0.5 ** (elapsed / self.half_life)
+        for tenant in list(self._usage):
+            usage = self._usage[tenant] * decay + self._held.get(tenant, 0) * elapsed
+            if usage < 1e-3 and tenant not in self._held:
+                del self._usage[tenant]
+            else:
+                self._usage[tenant] = usage
+
+
+# Singleton instance
+cpu_scheduler = CpuScheduler()
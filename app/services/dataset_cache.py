@@ -0,0 +1,227 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import pyarrow as pa
+
+from app.core.config import settings
+from app.services.minio_client import Filters, minio_client
+from app.services.minio_file import filter_columns
+from app.services.shared_tables import shared_table_store
+
+# (dataset path, ETag, columns, filters, read options of text and Excel formats)
+DatasetKey = Tuple[str, str, str, str, Optional[str]]
+
+
+class CachedDataset:
+    """A decoded dataset stored as a shared Arrow IPC file."""
+
+    def __init__(
+        self,
+        key: DatasetKey,
+        path: str,
+        schema: pa.Schema,
+        nbytes: int,
+        file_extension: str,
+        read_stats: Dict[str, int],
+    ):
+        self.key = key
+        self.path = path
+        self.schema = schema
+        self.nbytes = nbytes
+        self.file_extension = file_extension
+        self.read_stats = read_stats
+        self.refs = 0
+        self.evicted = False
+
+    @property
+    def is_full(self) -> bool:
+        """Whether the dataset was read without column projection or filters."""
+        return self.key[2] == "null" and self.key[3] == "null"
+
+
+class DatasetCache:
+    """
+    Process-wide cache of decoded datasets, keyed by path, ETag, columns, filters and
+    the options the dataset was parsed with (dtype backend, engine, column types,
+    sheet and cell range).
+
+    Datasets are kept as Arrow IPC files in shared memory, the same files the
+    sandbox workers map, so a cached dataset is handed to a job without being
+    downloaded, decoded or copied again. A lookup costs one stat_object to check
+    that the ETag is still current; entries of older versions are dropped as soon
+    as a newer one is seen. A dataset read in full also serves requests for a
+    subset of it, which the worker selects from the mapped table.
+
+    The total size of the files is bounded by DATASET_CACHE_MAX_MB, evicting the
+    least recently used datasets. Datasets in use by a job are unlinked only once
+    the job releases them.
+    """
+
+    def __init__(self):
+        self.max_bytes = settings.DATASET_CACHE_MAX_MB * 1024 * 1024
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[DatasetKey, CachedDataset]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(
+        path: str,
+        etag: str,
+        columns: Optional[List[str]] = None,
+        filters: Optional[Filters] = None,
+        **read_options: Any,
+    ) -> DatasetKey:
+        # Parquet files are decoded straight into Arrow, whatever the read options
+        options = None
+        if not path.lower().endswith(".parquet"):
+            options = json.dumps(read_options, sort_keys=True)
+        return (
+            path, etag, json.dumps(columns), json.dumps(filters, default=str), options
+        )
+
+    def lookup(
+        self,
+        path: str,
+        columns: Optional[List[str]] = None,
+        filters: Optional[Filters] = None,
+        etag: Optional[str] = None,
+        **read_options: Any,
+    ) -> Tuple[Optional[CachedDataset], str]:
+        """
+        Find a cached dataset that can serve a read, and acquire it.
+
+        Args:
+            path: Path to the dataset in MinIO (bucket/object)
+            columns: Columns to read (all columns if omitted)
+            filters: Row filters in disjunctive normal form
+            etag: Current ETag of the object, if the caller has stat'ed it already
+            read_options: Options the dataset is parsed with (see
+                MinioClient.load_table)
+
+        Returns:
+            Tuple containing the acquired dataset (None on a miss), which must be
+            passed to release, and the current ETag of the object
+        """
+        if etag is None:
+            etag = minio_client.object_stat(path).etag
+        exact_key = self.make_key(path, etag, columns, filters, **read_options)
+        full_key = self.make_key(path, etag, **read_options)
+
+        with self._lock:
+            # Older versions of the object can never be hit again
+            stale = [
+                key for key in self._entries if key[0] == path and key[1] != etag
+            ]
+            for key in stale:
+                self._evict(key)
+
+            entry = self._entries.get(exact_key) or self._entries.get(full_key)
+            if entry is None:
+                self.misses += 1
+                return None, etag
+            if entry.is_full:
+                missing = [
+                    column for column in (columns or []) + filter_columns(filters)
+                    if column not in entry.schema.names
+                ]
+                if missing:
+                    raise ValueError(f"Unknown columns: {', '.join(missing)}")
+            self._entries.move_to_end(entry.key)
+            entry.refs += 1
+            self.hits += 1
+            return entry, etag
+
+    def store(
+        self,
+        path: str,
+        etag: str,
+        table: pa.Table,
+        file_extension: str,
+        read_stats: Dict[str, int],
+        columns: Optional[List[str]] = None,
+        filters: Optional[Filters] = None,
+        **read_options: Any,
+    ) -> CachedDataset:
+        """
+        Share a freshly loaded dataset and cache it if it fits in the budget.
+
+        Args:
+            path: Path to the dataset in MinIO (bucket/object)
+            etag: ETag of the object the table was read from
+            table: The decoded dataset
+            file_extension: Format of the dataset
+            read_stats: Statistics of the read
+            columns: Columns the table was read with
+            filters: Filters the table was read with
+            read_options: Options the table was parsed with (see MinioClient.load_table)
+
+        Returns:
+            The acquired dataset, which must be passed to release
+        """
+        shared_path = shared_table_store.write(table)
+        key = self.make_key(path, etag, columns, filters, **read_options)
+        entry = CachedDataset(
+            key,
+            shared_path,
+            table.schema,
+            os.path.getsize(shared_path),
+            file_extension,
+            read_stats,
+        )
+        entry.refs = 1
+
+        with self._lock:
+            if entry.nbytes > self.max_bytes or key in self._entries:
+                # Not cached: the file only lives as long as the job
+                entry.evicted = True
+                return entry
+            self._entries[key] = entry
+            self.size_bytes += entry.nbytes
+            while self.size_bytes > self.max_bytes:
+                self._evict(next(iter(self._entries)))
+        return entry
+
+    def release(self, entry: Optional[CachedDataset]) -> None:
+        """Release a dataset acquired by lookup or store."""
+        if entry is None:
+            return
+        with self._lock:
+            entry.refs -= 1
+            unlink = entry.evicted and entry.refs == 0
+        if unlink:
+            shared_table_store.unlink(entry.path)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the hit and miss counters and the size of the cache."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "size_mb": round(self.size_bytes / (1024 * 1024), 1),
+        }
+
+    def clear(self) -> None:
+        """Drop all cached datasets."""
+        with self._lock:
+            for key in list(self._entries):
+                self._evict(key)
+
+    def _evict(self, key: DatasetKey) -> None:
+        """Remove an entry, unlinking its file now or once the last job releases it."""
+        entry = self._entries.pop(key)
+        self.size_bytes -= entry.nbytes
+        self.evictions += 1
+        entry.evicted = True
+        if entry.refs == 0:
+            shared_table_store.unlink(entry.path)
+
+
+# Singleton instance
+dataset_cache = DatasetCache()
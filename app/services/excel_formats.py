@@ -0,0 +1,155 @@
+import hashlib
+import json
+import re
+from typing import Any, Dict, Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+
+from app.core.config import settings
+from app.schemas.process import CELL_RANGE_PATTERN
+from app.services.text_formats import arrow_schema, cast_columns
+
+try:
+    import python_calamine  # noqa: F401
+    CALAMINE_AVAILABLE = True
+except ImportError:
+    CALAMINE_AVAILABLE = False
+
+# Workbook formats
+EXCEL_FORMATS = ("xls", "xlsx")
+
+
+def excel_engine() -> Optional[str]:
+    """
+    Reader engine of workbooks.
+
+    With EXCEL_ENGINE set to "auto", workbooks are read by the Rust calamine reader
+    when python-calamine is installed, and by the pandas default (openpyxl or xlrd)
+    otherwise.
+    """
+    if settings.EXCEL_ENGINE != "auto":
+        return settings.EXCEL_ENGINE
+    return "calamine" if CALAMINE_AVAILABLE else None
+
+
+def parse_cell_range(cell_range: str) -> Dict[str, Any]:
+    """
+    Convert a cell range into pandas read_excel options.
+
+    The first row of the range is the header row. Rows may be omitted to read the
+    columns from the first row ("B:F") or to the last one ("B2:F").
+
+    Args:
+        cell_range: Range in A1 notation, e.g. "B2:F1000"
+
+    Returns:
+        The usecols, skiprows and nrows options selecting the range
+    """
+    match = CELL_RANGE_PATTERN.match(cell_range.replace("$", "").upper())
+    if match is None:
+        raise ValueError(f"Invalid cell range: {cell_range}")
+    first_column, first_row, last_column, last_row = match.groups()
+    if _column_index(first_column) > _column_index(last_column):
+        raise ValueError(f"Invalid cell range: {cell_range}")
+
+    first_row = int(first_row or 1)
+    read_options: Dict[str, Any] = {
+        "usecols": f"{first_column}:{last_column}",
+        "skiprows": first_row - 1,
+    }
+    if last_row is not None:
+        if int(last_row) <= first_row:
+            raise ValueError(f"Invalid cell range: {cell_range}")
+        read_options["nrows"] = int(last_row) - first_row
+    return read_options
+
+
+def read_workbook(
+    source: Any,
+    sheet: Optional[Union[str, int]] = None,
+    cell_range: Optional[str] = None,
+    dtype_backend: str = "numpy",
+    column_types: Optional[Dict[str, str]] = None,
+) -> pa.Table:
+    """
+    Parse one sheet of a workbook into an Arrow table.
+
+    Args:
+        source: File object over the workbook
+        sheet: Name or zero-based index of the sheet (the first sheet if omitted)
+        cell_range: Range of cells to read, with the header in its first row
+        dtype_backend: Dtypes the reader produces ("numpy" or "pyarrow")
+        column_types: Explicit Arrow type of some columns, cast after parsing
+
+    Returns:
+        The parsed table
+    """
+    read_options: Dict[str, Any] = {"sheet_name": sheet if sheet is not None else 0}
+    engine = excel_engine()
+    if engine is not None:
+        read_options["engine"] = engine
+    if cell_range is not None:
+        read_options.update(parse_cell_range(cell_range))
+    if dtype_backend == "pyarrow":
+        read_options["dtype_backend"] = "pyarrow"
+    try:
+        df = pd.read_excel(source, **read_options)
+    except (IndexError, KeyError) as e:
+        # Unknown sheet name or index
+        raise ValueError(f"Sheet not found: {sheet} ({str(e)})") from e
+    return cast_columns(pa.Table.from_pandas(df), arrow_schema(column_types))
+
+
+def sidecar_object_name(
+    object_name: str,
+    etag: str,
+    sheet: Optional[Union[str, int]] = None,
+    cell_range: Optional[str] = None,
+    dtype_backend: str = "numpy",
+    column_types: Optional[Dict[str, str]] = None,
+) -> str:
+    """
+    Name of the Parquet sidecar holding a parsed sheet of a workbook.
+
+    Sidecars are stored in a "<workbook>.sidecar/" folder next to the workbook and
+    are named after its ETag, so a sidecar of an older version of the workbook is
+    never read.
+
+    Args:
+        object_name: Name of the workbook object
+        etag: ETag of the workbook
+        sheet: Sheet the sidecar holds
+        cell_range: Range of cells the sidecar holds
+        dtype_backend: Dtype backend the sheet was parsed with
+        column_types: Explicit column types the sheet was parsed with
+
+    Returns:
+        Object name of the sidecar
+    """
+    options = json.dumps(
+        [sheet, cell_range, dtype_backend, column_types], sort_keys=True
+    )
+    digest = hashlib.sha256(options.encode("utf-8")).hexdigest()[:16]
+    return f"{sidecar_prefix(object_name)}{_etag_token(etag)}-{digest}.parquet"
+
+
+def sidecar_prefix(object_name: str) -> str:
+    """Prefix of the sidecars of a workbook."""
+    return f"{object_name}.sidecar/"
+
+
+def is_current_sidecar(sidecar_name: str, etag: str) -> bool:
+    """Whether a sidecar was converted from the given version of its workbook."""
+    return sidecar_name.rsplit("/", 1)[-1].startswith(f"{_etag_token(etag)}-")
+
+
+def _etag_token(etag: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]", "", etag)
+
+
+def _column_index(column: str) -> int:
+    index = 0
+    for letter in column:
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index
@@ -0,0 +1,189 @@
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Optional
+
+from app.core.config import settings
+from app.core.timing import record_stage
+from app.services.cpu_scheduler import cpu_scheduler
+from app.services.dataset_cache import dataset_cache
+from app.services.sandbox_pool import sandbox_pool
+from app.services.shared_tables import shared_table_store
+
+
+class PoolSaturatedError(Exception):
+    """Exception raised when the job queue is full and a new job cannot be admitted."""
+    pass
+
+
+class ExecutionPool:
+    """
+    Runs the blocking parts of a job off the event loop.
+
+    I/O (MinIO transfers, parsing) runs on a thread pool and user code runs in the
+    sandbox worker pool, on the cores the CPU scheduler allocates. Admission
+    control bounds the number of jobs in flight and the number of jobs waiting for
+    a slot, so overload is rejected instead of queued without limit.
+    """
+
+    def __init__(self):
+        self.max_concurrent_jobs = settings.MAX_CONCURRENT_JOBS
+        self.max_queued_jobs = settings.MAX_QUEUED_JOBS
+        self.io_executor = ThreadPoolExecutor(
+            max_workers=settings.IO_WORKERS,
+            thread_name_prefix="io",
+        )
+        # One dispatch thread per sandbox worker waits for that worker's reply
+        self.sandbox_executor = ThreadPoolExecutor(
+            max_workers=sandbox_pool.size,
+            thread_name_prefix="sandbox",
+        )
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.active_jobs = 0
+        self.queued_jobs = 0
+
+    @asynccontextmanager
+    async def admit(self, wait: bool = False) -> AsyncIterator[float]:
+        """
+        Reserve a job slot, waiting in the queue if all slots are busy.
+
+        Args:
+            wait: Wait for a slot even if the queue is at its maximum depth, for
+                callers that bound their own jobs in flight
+
+        Yields:
+            Time in seconds spent waiting for a slot
+
+        Raises:
+            PoolSaturatedError: If the queue is already at its maximum depth and
+                wait is False
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent_jobs)
+
+        if not wait and self.is_saturated():
+            raise PoolSaturatedError(
+                f"Job queue is full ({self.queued_jobs} jobs waiting)"
+            )
+
+        start_time = time.perf_counter()
+        self.queued_jobs += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued_jobs -= 1
+        queue_wait = time.perf_counter() - start_time
+
+        self.active_jobs += 1
+        try:
+            yield queue_wait
+        finally:
+            self.active_jobs -= 1
+            self._slots.release()
+
+    def is_saturated(self) -> bool:
+        """Whether all job slots are busy and the queue is at its maximum depth."""
+        return (
+            self._slots is not None
+            and self._slots.locked()
+            and self.queued_jobs >= self.max_queued_jobs
+        )
+
+    async def run_io(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run a blocking I/O function on the thread pool.
+
+        The caller's context variables are propagated to the worker thread. If the
+        caller is cancelled, the function still runs to completion before the
+        cancellation propagates, so cleanup code never races with it.
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        call = functools.partial(context.run, func, *args, **kwargs)
+        return await self._wait(loop.run_in_executor(self.io_executor, call))
+
+    async def run_cpu(
+        self,
+        func: Callable[..., Any],
+        *args: Any,
+        job_timeout: float,
+        job_cpu: Optional[float] = None,
+        tenant: Optional[str] = None,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Run a CPU-bound function in a sandbox worker.
+
+        The function must be defined at module level and its arguments and
+        return value must be picklable.
+
+        The run first waits for its fair share of cores, recorded as the "cpu_wait"
+        stage of the request, and the worker is pinned to them while it runs the
+        function. Cancelling the caller kills the sandbox worker running the job.
+
+        Args:
+            func: Function to run
+            job_timeout: Time limit of the job in seconds, after which the worker
+                is killed
+            job_cpu: CPU limit of the job in cores (DEFAULT_MAX_CPU if omitted)
+            tenant: Tenant the cores are accounted to
+        """
+        start_time = time.perf_counter()
+        async with cpu_scheduler.allocate(job_cpu, tenant) as cores:
+            record_stage("cpu_wait", time.perf_counter() - start_time)
+            loop = asyncio.get_running_loop()
+            cancel_event = threading.Event()
+            call = functools.partial(
+                sandbox_pool.run,
+                func,
+                args,
+                kwargs,
+                timeout=job_timeout,
+                cancel_event=cancel_event,
+                cores=cores
+            )
+            return await self._wait(
+                loop.run_in_executor(self.sandbox_executor, call), cancel_event.set
+            )
+
+    @staticmethod
+    async def _wait(
+        future: "asyncio.Future[Any]", on_cancel: Optional[Callable[[], None]] = None
+    ) -> Any:
+        """
+        Await an executor future, waiting for it to finish if the caller is cancelled.
+
+        Args:
+            future: Future of a call running on an executor
+            on_cancel: Called on cancellation to make the call return early
+        """
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if on_cancel is not None:
+                on_cancel()
+            try:
+                await future
+            except Exception:
+                pass
+            raise
+
+    def start(self) -> None:
+        """Pre-fork the sandbox workers."""
+        sandbox_pool.start()
+
+    def shutdown(self) -> None:
+        """Shut down the thread pools and the sandbox workers."""
+        self.io_executor.shutdown(wait=False, cancel_futures=True)
+        self.sandbox_executor.shutdown(wait=False, cancel_futures=True)
+        sandbox_pool.shutdown()
+        dataset_cache.clear()
+        shared_table_store.cleanup()
+
+
+# Singleton instance
+execution_pool = ExecutionPool()
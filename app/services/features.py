@@ -0,0 +1,157 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+
+try:
+    import pycatch22
+    CATCH22_AVAILABLE = True
+except ImportError:
+    CATCH22_AVAILABLE = False
+
+# Values converted to Python floats at a time; the C extension only accepts lists
+BATCH_VALUES = 1_000_000
+
+
+def catch22_feature_set(
+    catch24: bool = False, short_names: bool = False
+) -> List[Tuple[str, str, bool]]:
+    """
+    Features computed by catch22_features, in canonical order.
+
+    Args:
+        catch24: Include the mean and standard deviation (catch24)
+        short_names: Name the features by their short names
+
+    Returns:
+        Name of the pycatch22 function, output name and whether the feature is an
+        integer, for each feature
+    """
+    if not CATCH22_AVAILABLE:
+        raise ValueError("pycatch22 is not installed")
+    # Probe a series that is valid for every feature to find the names and types
+    probe = pycatch22.catch22_all(
+        np.sin(np.arange(50, dtype=np.float64)).tolist(),
+        catch24=catch24,
+        short_names=True,
+    )
+    output_names = probe["short_names"] if short_names else probe["names"]
+    return [
+        (name, output_name, isinstance(value, int))
+        for name, output_name, value in zip(
+            probe["names"], output_names, probe["values"], strict=True
+        )
+    ]
+
+
+def catch22_features(
+    df: pd.DataFrame,
+    id_column: str,
+    time_column: Optional[str] = None,
+    value_columns: Optional[List[str]] = None,
+    catch24: bool = False,
+    short_names: bool = False,
+    min_length: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Compute the catch22 features of every series of a long DataFrame.
+
+    The rows are sorted once by series and time, and each value column is packed
+    into one contiguous float64 array with the offsets of the series, without its
+    missing values. The arrays are converted to Python floats BATCH_VALUES at a
+    time and each feature function is called on the slice of each series, so no
+    per-series DataFrame, Series or dict is built. Runs on one core; map mode
+    with partition_by on the id column spreads the series over sandbox workers.
+
+    Args:
+        df: Long DataFrame with one row per series, time step and value columns
+        id_column: Column identifying the series
+        time_column: Column ordering the values of a series (row order if omitted)
+        value_columns: Columns to compute features of (all numeric columns other
+            than the id and time columns if omitted)
+        catch24: Also compute the mean and standard deviation
+        short_names: Name the feature columns by the short feature names
+        min_length: Series with fewer values get missing features
+            (CATCH22_MIN_LENGTH if omitted); pycatch22 crashes on very short series
+
+    Returns:
+        Wide DataFrame with one row per series, in order of first appearance: the
+        id column and a "<value column>__<feature>" column per value column and
+        feature, float64 or nullable Int64 for integer features
+    """
+    features = catch22_feature_set(catch24, short_names)
+    min_length = max(min_length or settings.CATCH22_MIN_LENGTH, 3)
+
+    missing = [
+        column for column in [id_column, time_column, *(value_columns or [])]
+        if column is not None and column not in df.columns
+    ]
+    if missing:
+        raise ValueError(f"Unknown columns: {', '.join(missing)}")
+    if value_columns is None:
+        value_columns = [
+            column for column in df.columns
+            if column not in (id_column, time_column)
+            and pd.api.types.is_numeric_dtype(df[column])
+        ]
+    if not value_columns:
+        raise ValueError("No value columns to compute features of")
+
+    codes, ids = pd.factorize(df[id_column], use_na_sentinel=False)
+    if time_column is None:
+        order = np.argsort(codes, kind="stable")
+    else:
+        time_ranks, _ = pd.factorize(df[time_column], sort=True)
+        order = np.lexsort((time_ranks, codes))
+    sorted_codes = codes[order]
+
+    result: Dict[str, Any] = {id_column: ids}
+    for column in value_columns:
+        try:
+            values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)[order]
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Value column {column} is not numeric") from e
+        present = ~np.isnan(values)
+        values = values[present]
+        offsets = np.searchsorted(sorted_codes[present], np.arange(len(ids) + 1))
+        matrix = _compute_series(values, offsets, features, min_length)
+        for index, (_, output_name, is_integer) in enumerate(features):
+            feature = matrix[:, index]
+            result[f"{column}__{output_name}"] = (
+                pd.array(np.where(np.isnan(feature), None, feature), dtype="Int64")
+                if is_integer else feature
+            )
+    return pd.DataFrame(result)
+
+
+def _compute_series(
+    values: np.ndarray,
+    offsets: np.ndarray,
+    features: List[Tuple[str, str, bool]],
+    min_length: int,
+) -> np.ndarray:
+    """
+    Features of the series values[offsets[i]:offsets[i + 1]], as a series x features
+    matrix.
+    """
+    functions = [getattr(pycatch22, name) for name, _, _ in features]
+    matrix = np.full((len(offsets) - 1, len(features)), np.nan)
+    series = 0
+    while series < len(offsets) - 1:
+        # Convert the values of as many whole series as fit in a batch
+        batch_start = offsets[series]
+        last = max(
+            int(np.searchsorted(offsets, batch_start + BATCH_VALUES, side="right")) - 1,
+            series + 1,
+        )
+        batch = values[batch_start:offsets[last]].tolist()
+        for index in range(series, last):
+            start, end = offsets[index] - batch_start, offsets[index + 1] - batch_start
+            if end - start < min_length:
+                continue
+            data = batch[start:end]
+            matrix[index] = [function(data) for function in functions]
+        series = last
+    return matrix
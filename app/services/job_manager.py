@@ -0,0 +1,232 @@
+import asyncio
+import os
+import socket
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.core.timing import StageTimer
+from app.schemas.process import ProcessRequest
+from app.services.execution_pool import PoolSaturatedError, execution_pool
+from app.services.job_store import FINISHED_STATUSES, JobStore, create_job_store
+from app.services.processing import ProcessingError, processing_service
+
+
+class JobNotFoundError(Exception):
+    """Exception raised when a job does not exist (or has expired)."""
+    pass
+
+
+class JobStateError(Exception):
+    """Exception raised when a job cannot be cancelled in its current state."""
+    pass
+
+
+class JobManager:
+    """
+    Runs processing jobs in the background and tracks them in a job store.
+
+    A submitted job is recorded as queued and runs as an asyncio task of this
+    process, through the same processing service as the synchronous endpoint, so it
+    is subject to the same admission control. Status transitions and results are
+    persisted in the job store; the stage a running job is in and its timings so far
+    are read live from the process running it.
+    """
+
+    def __init__(self):
+        self._store: Optional[JobStore] = None
+        self._tasks: Dict[str, "asyncio.Task[None]"] = {}
+        self._timers: Dict[str, StageTimer] = {}
+        self._last_purge = 0.0
+        self._stopping = False
+
+    @property
+    def store(self) -> JobStore:
+        if self._store is None:
+            self._store = create_job_store()
+        return self._store
+
+    @property
+    def owner(self) -> str:
+        """Identifier of this process in job records."""
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def start(self) -> None:
+        """Fail the jobs left unfinished by processes of this host that are gone."""
+        self._stopping = False
+        hostname = socket.gethostname()
+        for job in self.store.unfinished():
+            host, _, pid = job["owner"].rpartition(":")
+            # A job recorded under our own PID was left by an earlier process that
+            # had it
+            left = job["owner"] == self.owner or not _process_alive(int(pid))
+            if host == hostname and left:
+                self.store.update(
+                    job["job_id"],
+                    status="failed",
+                    finished_at=time.time(),
+                    error={
+                        "status_code": 500,
+                        "error": "The service stopped before the job finished"
+                    }
+                )
+
+    async def submit(self, request: ProcessRequest) -> Dict[str, Any]:
+        """
+        Record a job and start running it in the background.
+
+        Args:
+            request: The process request
+
+        Returns:
+            The job record
+
+        Raises:
+            PoolSaturatedError: If the job queue is already full
+        """
+        if execution_pool.is_saturated():
+            raise PoolSaturatedError(
+                f"Job queue is full ({execution_pool.queued_jobs} jobs waiting)"
+            )
+
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": "queued",
+            "owner": self.owner,
+            "request": request.model_dump(),
+            "created_at": time.time(),
+        }
+        await execution_pool.run_io(self.store.create, job)
+        await self._purge_expired()
+
+        timer = StageTimer()
+        self._timers[job["job_id"]] = timer
+        self._tasks[job["job_id"]] = asyncio.create_task(
+            self._run(job["job_id"], request, timer)
+        )
+        return job
+
+    async def get(self, job_id: str) -> Dict[str, Any]:
+        """
+        Get the current state of a job.
+
+        Args:
+            job_id: Identifier of the job
+
+        Returns:
+            The job record, with the live stage and timings of a running job
+        """
+        job = await execution_pool.run_io(self.store.get, job_id)
+        if job is None:
+            raise JobNotFoundError(f"Job not found: {job_id}")
+        timer = self._timers.get(job_id)
+        if timer is not None and job["status"] not in FINISHED_STATUSES:
+            job["stage"] = timer.current
+            job["timings"] = timer.as_dict()
+        return job
+
+    async def cancel(self, job_id: str) -> Dict[str, Any]:
+        """
+        Cancel a queued or running job and wait until it has stopped.
+
+        A running sandbox worker is killed, and an upload in progress is aborted.
+
+        Args:
+            job_id: Identifier of the job
+
+        Returns:
+            The job record after cancellation
+        """
+        job = await self.get(job_id)
+        if job["status"] in FINISHED_STATUSES:
+            raise JobStateError(f"Job already {job['status']}")
+        task = self._tasks.get(job_id)
+        if task is None:
+            raise JobStateError(f"Job is running in another process ({job['owner']})")
+        task.cancel()
+        await asyncio.wait([task])
+        return await self.get(job_id)
+
+    async def shutdown(self) -> None:
+        """Stop the running jobs; they are recorded as failed."""
+        self._stopping = True
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks)
+
+    async def _run(
+        self, job_id: str, request: ProcessRequest, timer: StageTimer
+    ) -> None:
+        """Run a job and record its outcome."""
+        async def on_admitted() -> None:
+            await execution_pool.run_io(
+                self.store.update, job_id, status="running", started_at=time.time()
+            )
+
+        fields: Dict[str, Any]
+        try:
+            response = await processing_service.run(request, timer, on_admitted)
+            fields = {"status": "succeeded", "result": response.model_dump()}
+        except ProcessingError as e:
+            fields = {
+                "status": "failed",
+                "error": {"status_code": e.status_code, **e.detail}
+            }
+        except asyncio.CancelledError:
+            if self._stopping:
+                fields = {
+                    "status": "failed",
+                    "error": {
+                        "status_code": 500,
+                        "error": "The service stopped before the job finished"
+                    }
+                }
+            else:
+                fields = {"status": "cancelled"}
+        except Exception as e:
+            fields = {
+                "status": "failed",
+                "error": {
+                    "status_code": 500,
+                    "error": f"An unexpected error occurred: {str(e)}"
+                }
+            }
+
+        try:
+            await execution_pool.run_io(
+                self.store.update,
+                job_id,
+                finished_at=time.time(),
+                stage=None,
+                timings=timer.as_dict(),
+                **fields
+            )
+        finally:
+            self._tasks.pop(job_id, None)
+            self._timers.pop(job_id, None)
+
+    async def _purge_expired(self) -> None:
+        """Delete finished jobs older than JOB_TTL, at most once a minute."""
+        now = time.time()
+        if now - self._last_purge < 60:
+            return
+        self._last_purge = now
+        await execution_pool.run_io(self.store.purge, now - settings.JOB_TTL)
+
+
+def _process_alive(pid: int) -> bool:
+    """Whether a process with this PID exists on this host."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# Singleton instance
+job_manager = JobManager()
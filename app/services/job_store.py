@@ -0,0 +1,185 @@
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+# Job states that no longer change
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+# Fields of a job record, in storage order
+JOB_FIELDS = (
+    "job_id",
+    "status",
+    "owner",
+    "request",
+    "created_at",
+    "started_at",
+    "finished_at",
+    "stage",
+    "timings",
+    "result",
+    "error",
+)
+
+# Fields stored as JSON text by the SQLite backend
+JSON_FIELDS = ("request", "timings", "result", "error")
+
+
+class JobStore(ABC):
+    """
+    Storage of asynchronous job records.
+
+    A record is a dictionary with the JOB_FIELDS keys. Subclasses must be safe to
+    call from several threads.
+    """
+
+    @abstractmethod
+    def create(self, job: Dict[str, Any]) -> None:
+        """Record a new job."""
+
+    @abstractmethod
+    def update(self, job_id: str, **fields: Any) -> None:
+        """Update fields of a job; unknown jobs are ignored."""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the record of a job, or None if it is unknown."""
+
+    @abstractmethod
+    def purge(self, finished_before: float) -> int:
+        """Delete finished jobs older than a timestamp and return the number deleted."""
+
+    @abstractmethod
+    def unfinished(self) -> List[Dict[str, Any]]:
+        """Return the jobs that are queued or running."""
+
+
+class MemoryJobStore(JobStore):
+    """In-process job store; jobs are lost when the service restarts."""
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def create(self, job: Dict[str, Any]) -> None:
+        with self._lock:
+            self._jobs[job["job_id"]] = dict(job)
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def purge(self, finished_before: float) -> int:
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job["status"] in FINISHED_STATUSES
+                and job["finished_at"] < finished_before
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+            return len(expired)
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                dict(job) for job in self._jobs.values()
+                if job["status"] not in FINISHED_STATUSES
+            ]
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Job store in a local SQLite file.
+
+    Jobs survive restarts and can be polled from any service process on the host.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, status TEXT NOT NULL, owner TEXT NOT NULL, "
+                "request TEXT NOT NULL, created_at REAL NOT NULL, started_at REAL, "
+                "finished_at REAL, stage TEXT, timings TEXT, result TEXT, error TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    @staticmethod
+    def _encode(field: str, value: Any) -> Any:
+        if field in JSON_FIELDS and value is not None:
+            return json.dumps(value, default=str)
+        return value
+
+    @staticmethod
+    def _decode(row: Tuple[Any, ...]) -> Dict[str, Any]:
+        job = dict(zip(JOB_FIELDS, row, strict=True))
+        for field in JSON_FIELDS:
+            if job[field] is not None:
+                job[field] = json.loads(job[field])
+        return job
+
+    def create(self, job: Dict[str, Any]) -> None:
+        columns = ", ".join(JOB_FIELDS)
+        placeholders = ", ".join("?" for _ in JOB_FIELDS)
+        values = [self._encode(field, job.get(field)) for field in JOB_FIELDS]
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                f"INSERT INTO jobs ({columns}) VALUES ({placeholders})", values
+            )
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        unknown = set(fields) - set(JOB_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown job fields: {', '.join(sorted(unknown))}")
+        assignments = ", ".join(f"{field} = ?" for field in fields)
+        values = [self._encode(field, value) for field, value in fields.items()]
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE job_id = ?", values + [job_id]
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return self._decode(row) if row is not None else None
+
+    def purge(self, finished_before: float) -> int:
+        with self._lock, self._connect() as conn:
+            return conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?, ?) AND finished_at < ?",
+                (*FINISHED_STATUSES, finished_before),
+            ).rowcount
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(JOB_FIELDS)} FROM jobs "
+                "WHERE status NOT IN (?, ?, ?)",
+                FINISHED_STATUSES,
+            ).fetchall()
+        return [self._decode(row) for row in rows]
+
+
+def create_job_store() -> JobStore:
+    """Create the job store selected by JOB_STORE_BACKEND."""
+    if settings.JOB_STORE_BACKEND == "memory":
+        return MemoryJobStore()
+    return SQLiteJobStore(settings.JOB_STORE_PATH)
@@ -0,0 +1,210 @@
+from typing import Any, Dict, Iterator, List, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+from prometheus_client.process_collector import ProcessCollector
+
+from app.core.round_trips import RoundTripCounter
+from app.core.timing import StageTimer
+from app.services.code_validator import code_validator
+from app.services.cpu_scheduler import cpu_scheduler
+from app.services.dataset_cache import dataset_cache
+from app.services.execution_pool import execution_pool
+from app.services.result_cache import result_cache
+from app.services.sandbox_pool import sandbox_pool
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# Buckets of the stage and job durations, in seconds
+DURATION_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0,
+)
+
+# Buckets of the peak resident memory of a job, 16 MB to 32 GB
+MEMORY_BUCKETS = tuple(float(2 ** power * 1024 * 1024) for power in range(4, 16))
+
+
+class ServiceCollector:
+    """Reads the execution pool occupancy and the cache counters at scrape time."""
+
+    def describe(self) -> List[Metric]:
+        # Not collected on registration, before the services are started
+        return []
+
+    def collect(self) -> Iterator[Metric]:
+        jobs = GaugeMetricFamily(
+            "preprocessing_pool_jobs",
+            "Jobs holding or waiting for an execution slot",
+            labels=["state"],
+        )
+        jobs.add_metric(["active"], execution_pool.active_jobs)
+        jobs.add_metric(["queued"], execution_pool.queued_jobs)
+        yield jobs
+        yield GaugeMetricFamily(
+            "preprocessing_job_slots",
+            "Jobs allowed to run at once",
+            value=execution_pool.max_concurrent_jobs,
+        )
+
+        sandbox = sandbox_pool.stats()
+        workers = GaugeMetricFamily(
+            "preprocessing_sandbox_workers",
+            "Sandbox worker processes",
+            labels=["state"],
+        )
+        workers.add_metric(["busy"], sandbox["workers"] - sandbox["idle"])
+        workers.add_metric(["idle"], sandbox["idle"])
+        yield workers
+
+        scheduler = cpu_scheduler.stats()
+        cores = GaugeMetricFamily(
+            "preprocessing_cpu_cores", "Cores of the CPU scheduler", labels=["state"]
+        )
+        cores.add_metric(["free"], scheduler["free"])
+        cores.add_metric(["allocated"], scheduler["cores"] - scheduler["free"])
+        yield cores
+        yield GaugeMetricFamily(
+            "preprocessing_cpu_waiting_runs",
+            "Sandbox runs waiting for cores",
+            value=scheduler["waiting"],
+        )
+        tenant_usage = GaugeMetricFamily(
+            "preprocessing_tenant_core_seconds",
+            "Recent core usage of each tenant, as ranked by the CPU scheduler",
+            labels=["tenant"],
+        )
+        for tenant, usage in scheduler["tenants"].items():
+            tenant_usage.add_metric([tenant], usage["core_seconds"])
+        yield tenant_usage
+
+        caches = {
+            "result": result_cache.stats(),
+            "dataset": dataset_cache.stats(),
+            "validation": code_validator.cache_stats(),
+        }
+        hits = CounterMetricFamily(
+            "preprocessing_cache_hits", "Cache hits", labels=["cache"]
+        )
+        misses = CounterMetricFamily(
+            "preprocessing_cache_misses", "Cache misses", labels=["cache"]
+        )
+        ratios = GaugeMetricFamily(
+            "preprocessing_cache_hit_ratio",
+            "Hits per lookup since the start of the server",
+            labels=["cache"],
+        )
+        for name, stats in caches.items():
+            lookups = stats["hits"] + stats["misses"]
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            ratios.add_metric([name], stats["hits"] / lookups if lookups else 0.0)
+        yield hits
+        yield misses
+        yield ratios
+        yield GaugeMetricFamily(
+            "preprocessing_dataset_cache_bytes",
+            "Shared memory used by the dataset cache",
+            value=dataset_cache.size_bytes,
+        )
+
+
+class Metrics:
+    """
+    Prometheus metrics of the service.
+
+    Each job is observed once it ends, whether it succeeded or failed: its stage
+    timings, bytes and rows in and out, peak memory and MinIO requests. Gauges of
+    the execution pool, the CPU scheduler and the caches are read at scrape time.
+    """
+
+    def __init__(self):
+        self.registry = CollectorRegistry()
+        ProcessCollector(registry=self.registry)
+        self.registry.register(ServiceCollector())
+
+        self.jobs = Counter(
+            "preprocessing_jobs", "Jobs run, by mode and HTTP status",
+            ["mode", "status"], registry=self.registry,
+        )
+        self.job_seconds = Histogram(
+            "preprocessing_job_duration_seconds", "Duration of jobs, by mode",
+            ["mode"], buckets=DURATION_BUCKETS, registry=self.registry,
+        )
+        self.stage_seconds = Histogram(
+            "preprocessing_stage_duration_seconds", "Time a job spent in each stage",
+            ["stage"], buckets=DURATION_BUCKETS, registry=self.registry,
+        )
+        self.bytes = Counter(
+            "preprocessing_bytes",
+            "Bytes downloaded from and uploaded to MinIO by jobs",
+            ["direction"], registry=self.registry,
+        )
+        self.rows = Counter(
+            "preprocessing_rows", "Rows read and returned by jobs",
+            ["direction"], registry=self.registry,
+        )
+        self.peak_memory = Histogram(
+            "preprocessing_job_peak_memory_bytes",
+            "Peak resident memory of the workers of a job",
+            buckets=MEMORY_BUCKETS, registry=self.registry,
+        )
+        self.minio_requests = Counter(
+            "preprocessing_minio_requests",
+            "MinIO requests made by jobs, by HTTP method",
+            ["method"], registry=self.registry,
+        )
+
+    def observe_job(
+        self,
+        mode: str,
+        status: int,
+        seconds: float,
+        timer: StageTimer,
+        round_trips: RoundTripCounter,
+        metadata: Optional[Dict[str, Any]] = None,
+        rows_out: int = 0,
+    ) -> None:
+        """
+        Record a finished job.
+
+        Args:
+            mode: Execution mode of the job
+            status: HTTP status of the outcome (200 on success)
+            seconds: Duration of the job
+            timer: Stage timings of the job
+            round_trips: MinIO requests of the job
+            metadata: Metadata of the response of a successful job
+            rows_out: Rows of the result of a successful job
+        """
+        self.jobs.labels(mode, str(status)).inc()
+        self.job_seconds.labels(mode).observe(seconds)
+        for stage, stage_seconds in timer.as_dict().items():
+            self.stage_seconds.labels(stage).observe(stage_seconds)
+        for method, count in round_trips.as_dict().items():
+            if method != "total":
+                self.minio_requests.labels(method).inc(count)
+        self.bytes.labels("out").inc(round_trips.bytes_sent)
+
+        if metadata is not None:
+            self.bytes.labels("in").inc(metadata.get("bytes_in", 0))
+            self.rows.labels("in").inc(metadata.get("rows_in", 0))
+            self.rows.labels("out").inc(rows_out)
+            if not metadata.get("cache_hit"):
+                peak_memory_mb = metadata.get("peak_memory_mb", 0.0)
+                self.peak_memory.observe(peak_memory_mb * 1024 * 1024)
+
+    def render(self) -> bytes:
+        """Render all metrics in the Prometheus text format."""
+        return generate_latest(self.registry)
+
+
+# Singleton instance
+metrics = Metrics()
@@ -1,10 +1,280 @@
+import contextvars
+import fnmatch
 import io
-from typing import Tuple, Optional
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import certifi
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import urllib3
 from minio import Minio
+from minio.datatypes import Object
 from minio.error import S3Error
+from urllib3.connection import HTTPConnection
 
 from app.core.config import settings
+from app.core.round_trips import current_round_trips
+from app.core.timing import record_stage
+from app.services.excel_formats import (
+    EXCEL_FORMATS,
+    is_current_sidecar,
+    read_workbook,
+    sidecar_object_name,
+    sidecar_prefix,
+)
+from app.services.minio_file import (
+    MinioObjectFile,
+    TimedReader,
+    UploadPipe,
+    filter_columns,
+    iter_parquet_row_groups,
+    read_parquet,
+    select_table,
+)
+from app.services.parquet_encoding import ParquetEncoding
+from app.services.text_formats import (
+    CHUNKED_TEXT_FORMATS,
+    TEXT_FORMATS,
+    iter_text_tables,
+    open_text_stream,
+    read_text_table,
+    split_format,
+)
+
+# Row filters in disjunctive normal form: OR of ANDs of (column, op, value)
+Filters = List[List[Tuple[str, str, Any]]]
+
+
+def record_read_time(seconds: float, wait_seconds: float) -> None:
+    """
+    Record the time of a dataset read on the current request: the time spent
+    waiting for MinIO as the "download" stage, and the rest as the "decode" stage.
+    
+    Args:
+        seconds: Duration of the read
+        wait_seconds: Part of it spent waiting for data from MinIO
+    """
+    record_stage("download", wait_seconds)
+    record_stage("decode", max(seconds - wait_seconds, 0.0))
+
+
+class CountingPoolManager(urllib3.PoolManager):
+    """
+    Connection pool that counts each request, and the bytes uploaded, for the request
+    context it is made in. Object stat requests are timed as the "stat" stage of the
+    request, and bucket existence checks as the "bucket_check" stage.
+    """
+    
+    def urlopen(self, method: str, url: str, redirect: bool = True, **kw: Any):
+        round_trips = current_round_trips.get()
+        if round_trips is not None:
+            round_trips.record(method)
+        start_time = time.perf_counter()
+        response = super().urlopen(method, url, redirect=redirect, **kw)
+        if method == "HEAD":
+            # Requests are path-style: /bucket or /bucket/object
+            is_bucket = "/" not in urllib3.util.parse_url(url).path.strip("/")
+            stage = "bucket_check" if is_bucket else "stat"
+            record_stage(stage, time.perf_counter() - start_time)
+        body = kw.get("body")
+        if (
+            round_trips is not None
+            and method == "PUT"
+            and isinstance(body, (bytes, bytearray))
+            and response.status < 300
+        ):
+            round_trips.record_upload(len(body))
+        return response
+
+
+def create_http_client() -> urllib3.PoolManager:
+    """
+    Create the HTTP connection pool of the MinIO client.
+    
+    The SDK's default pool keeps 10 connections, fewer than the I/O, range request
+    and upload threads that share it, so connections were discarded and reopened
+    under load. The pool size, timeouts and retries are configurable, and idle
+    connections are kept alive with TCP keep-alive probes.
+    """
+    socket_options = list(HTTPConnection.default_socket_options)
+    if settings.MINIO_TCP_KEEPALIVE:
+        socket_options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    return CountingPoolManager(
+        maxsize=settings.MINIO_POOL_MAXSIZE,
+        timeout=urllib3.Timeout(
+            connect=settings.MINIO_CONNECT_TIMEOUT,
+            read=settings.MINIO_READ_TIMEOUT,
+        ),
+        retries=urllib3.Retry(
+            total=settings.MINIO_MAX_RETRIES,
+            backoff_factor=settings.MINIO_RETRY_BACKOFF,
+            status_forcelist=[500, 502, 503, 504],
+        ),
+        socket_options=socket_options,
+        cert_reqs="CERT_REQUIRED",
+        ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+    )
+
+
+class ParquetObjectWriter:
+    """
+    Writes a Parquet object to MinIO incrementally, one table at a time.
+    
+    Tables are encoded as row groups into a bounded in-memory pipe that a background
+    thread uploads as a multipart upload, MINIO_UPLOAD_PARALLELISM parts at a time.
+    Encoding and uploading overlap, and memory use is bounded by a few parts rather
+    than the size of the file. Objects smaller than one part are uploaded with a
+    single request. If the writer is aborted or the upload fails, the multipart
+    upload is aborted and no object is created.
+    
+    The encoding (compression, dictionary columns, row group size) can be set until
+    the first table is written.
+    """
+    
+    def __init__(
+        self,
+        client: Minio,
+        bucket_name: str,
+        object_name: str,
+        encoding: Optional[ParquetEncoding] = None
+    ):
+        self.client = client
+        self.bucket_name = bucket_name
+        self.object_name = object_name
+        self.encoding = encoding or ParquetEncoding()
+        self.schema: Optional[pa.Schema] = None
+        self.rows = 0
+        # ETag of the saved file, once closed
+        self.etag: Optional[str] = None
+        self.part_size = max(settings.MINIO_UPLOAD_PART_SIZE_MB, 5) * 1024 * 1024
+        self._pipe = UploadPipe(max_buffered=2 * self.part_size)
+        self._writer: Optional[pq.ParquetWriter] = None
+        self._error: Optional[BaseException] = None
+        self._round_trips = current_round_trips.get()
+        self._uploader = threading.Thread(
+            target=contextvars.copy_context().run,
+            args=(self._upload,),
+            name="minio-upload",
+            daemon=True
+        )
+        self._uploader.start()
+    
+    def write(self, table: pa.Table) -> None:
+        """
+        Append a table to the Parquet file.
+        
+        Args:
+            table: Table to append; it must have the same columns as the first one
+        """
+        if self._writer is None:
+            self.schema = table.schema
+            self._writer = pq.ParquetWriter(
+                self._pipe, table.schema, **self.encoding.writer_options()
+            )
+        elif not table.schema.equals(self.schema, check_metadata=False):
+            try:
+                table = table.cast(self.schema)
+            except (pa.ArrowException, ValueError) as e:
+                raise ValueError(
+                    "Chunk schema does not match the schema of the first chunk: "
+                    f"{str(e)}"
+                ) from e
+        start_time = time.perf_counter()
+        wait_seconds = self._pipe.wait_seconds
+        try:
+            self._writer.write_table(table, row_group_size=self.encoding.row_group_size)
+        except OSError:
+            self._raise_upload_error()
+            raise
+        self._record_time(
+            time.perf_counter() - start_time, self._pipe.wait_seconds - wait_seconds
+        )
+        self.rows += table.num_rows
+    
+    def close(self) -> str:
+        """
+        Finish the Parquet file and wait for the upload to complete.
+        
+        Returns:
+            Path to the saved file (bucket/object)
+        """
+        if self._writer is None:
+            self.abort()
+            raise ValueError("No data was written")
+        start_time = time.perf_counter()
+        wait_seconds = self._pipe.wait_seconds
+        try:
+            self._writer.close()
+        except OSError:
+            self._raise_upload_error()
+            raise
+        self._pipe.finish()
+        encoded_at = time.perf_counter()
+        self._uploader.join()
+        self._raise_upload_error()
+        end_time = time.perf_counter()
+        self._record_time(
+            end_time - start_time,
+            self._pipe.wait_seconds - wait_seconds + end_time - encoded_at
+        )
+        return f"{self.bucket_name}/{self.object_name}"
+    
+    def abort(self) -> None:
+        """Abort the upload, discarding the data written so far."""
+        self._pipe.fail(ValueError("Writer aborted"))
+        if self._writer is not None:
+            try:
+                self._writer.close()
+            except (pa.ArrowException, ValueError, OSError):
+                pass
+        self._uploader.join()
+    
+    def _upload(self) -> None:
+        """Upload the pipe's content; put_object aborts a failed multipart upload."""
+        try:
+            result = self.client.put_object(
+                bucket_name=self.bucket_name,
+                object_name=self.object_name,
+                data=self._pipe,
+                length=-1,
+                part_size=self.part_size,
+                num_parallel_uploads=settings.MINIO_UPLOAD_PARALLELISM,
+                content_type="application/octet-stream",
+            )
+            self.etag = result.etag
+            parts = -(-self._pipe.tell() // self.part_size)
+            if (
+                self._round_trips is not None
+                and parts > 1
+                and settings.MINIO_UPLOAD_PARALLELISM > 1
+            ):
+                # Parallel parts are uploaded by the SDK's own threads, which do not
+                # run in the request's context
+                self._round_trips.record("PUT", parts)
+                self._round_trips.record_upload(self._pipe.tell())
+        except BaseException as e:
+            self._error = e
+            # Unblock the writer side
+            self._pipe.fail(e)
+    
+    @staticmethod
+    def _record_time(seconds: float, upload_seconds: float) -> None:
+        """
+        Record the time spent waiting for the upload as the "upload" stage and the
+        rest as "encode".
+        """
+        record_stage("encode", max(seconds - upload_seconds, 0.0))
+        record_stage("upload", upload_seconds)
+    
+    def _raise_upload_error(self) -> None:
+        if self._error is not None:
+            raise ValueError(f"Error saving to MinIO: {str(self._error)}")
 
 
 class MinioClient:
@@ -14,97 +284,576 @@ class MinioClient:
             access_key=settings.MINIO_ACCESS_KEY,
             secret_key=settings.MINIO_SECRET_KEY,
             secure=settings.MINIO_SECURE,
+            http_client=create_http_client(),
+        )
+        # Buckets known to exist, with the time their entry expires
+        self._known_buckets: Dict[str, float] = {}
+        self._buckets_lock = threading.Lock()
+        # Range requests of prefetched Parquet column chunks
+        self.range_executor = ThreadPoolExecutor(
+            max_workers=settings.MINIO_RANGE_REQUEST_WORKERS,
+            thread_name_prefix="minio-range",
+        )
+
+    def bucket_exists(self, bucket_name: str, create: bool = False) -> bool:
+        """
+        Check whether a bucket exists, optionally creating it.
+        
+        Buckets known to exist are remembered for MINIO_BUCKET_CACHE_TTL seconds, so
+        loads and saves do not each make a bucket_exists round trip before any data
+        moves. Missing buckets are not remembered.
+        
+        Args:
+            bucket_name: Name of the bucket
+            create: Create the bucket if it does not exist
+            
+        Returns:
+            True if the bucket exists (or was created)
+        """
+        with self._buckets_lock:
+            if self._known_buckets.get(bucket_name, 0.0) > time.monotonic():
+                return True
+        
+        exists = self.client.bucket_exists(bucket_name)
+        if not exists and create:
+            try:
+                self.client.make_bucket(bucket_name)
+            except S3Error as e:
+                # Created concurrently by another job
+                if e.code not in ["BucketAlreadyOwnedByYou", "BucketAlreadyExists"]:
+                    raise
+            exists = True
+        
+        if exists and settings.MINIO_BUCKET_CACHE_TTL > 0:
+            with self._buckets_lock:
+                self._known_buckets[bucket_name] = (
+                    time.monotonic() + settings.MINIO_BUCKET_CACHE_TTL
+                )
+        return exists
+
+    def open_object(
+        self,
+        bucket_name: str,
+        object_name: str,
+        etag: Optional[str] = None,
+        size: Optional[int] = None
+    ) -> MinioObjectFile:
+        """
+        Open a MinIO object as a seekable file backed by range requests.
+        
+        The object is only stat'ed if its ETag or size is not given. Every range
+        request is conditional on the ETag, so reads fail if the object changes.
+        
+        Args:
+            bucket_name: Name of the bucket
+            object_name: Name of the object
+            etag: Expected ETag of the object; opening fails if it has changed
+            size: Size of the object, if already known along with its ETag
+            
+        Returns:
+            A read-only file object over the object
+        """
+        if etag is None or size is None:
+            stat = self.client.stat_object(bucket_name, object_name)
+            if etag is not None and stat.etag != etag:
+                raise ValueError(
+                    f"Object changed while being opened: {bucket_name}/{object_name}"
+                )
+            etag, size = stat.etag, stat.size
+        return MinioObjectFile(
+            self.client,
+            bucket_name,
+            object_name,
+            size=size,
+            etag=etag,
+            executor=self.range_executor,
+        )
+
+    def object_stat(self, path: str) -> Object:
+        """
+        Get the metadata of an object (size, ETag, version) without downloading it.
+        
+        Args:
+            path: Path to the object in MinIO (bucket/object)
+            
+        Returns:
+            The object's metadata
+        """
+        parts = path.split("/", 1)
+        if len(parts) != 2:
+            raise ValueError(
+                f"Invalid path format: {path}. Expected format: bucket/object"
+            )
+        
+        try:
+            return self.client.stat_object(parts[0], parts[1])
+        except S3Error as e:
+            raise ValueError(f"Error accessing MinIO: {str(e)}") from e
+
+    def list_objects(self, pattern: str) -> List[str]:
+        """
+        List the objects whose path matches a glob pattern.
+        
+        The pattern is matched one path segment at a time, so '*' does not cross a
+        '/'. Only the objects under the literal prefix of the pattern are listed.
+        
+        Args:
+            pattern: Glob over object paths (bucket/prefix/*/file-*.parquet)
+            
+        Returns:
+            Sorted paths (bucket/object) of the matching objects
+        """
+        parts = pattern.split("/", 1)
+        if len(parts) != 2 or not parts[1]:
+            raise ValueError(
+                f"Invalid pattern format: {pattern}. Expected format: bucket/pattern"
+            )
+        bucket_name, object_pattern = parts
+        
+        segments = object_pattern.split("/")
+        literal = []
+        for segment in segments:
+            if any(char in segment for char in "*?["):
+                break
+            literal.append(segment)
+        prefix = "/".join(literal)
+        if len(literal) < len(segments):
+            prefix = f"{prefix}/" if prefix else ""
+        
+        try:
+            objects = self.client.list_objects(
+                bucket_name, prefix=prefix, recursive=True
+            )
+            return sorted(
+                f"{bucket_name}/{obj.object_name}" for obj in objects
+                if not obj.is_dir
+                and self._match_segments(obj.object_name.split("/"), segments)
+            )
+        except S3Error as e:
+            raise ValueError(f"Error accessing MinIO: {str(e)}") from e
+
+    @staticmethod
+    def _match_segments(names: List[str], patterns: List[str]) -> bool:
+        return len(names) == len(patterns) and all(
+            fnmatch.fnmatchcase(name, pattern)
+            for name, pattern in zip(names, patterns, strict=True)
         )
 
-    def load_dataset(self, path: str) -> Tuple[pd.DataFrame, str]:
+    def open_table_chunks(
+        self,
+        path: str,
+        chunk_size: int,
+        columns: Optional[List[str]] = None,
+        filters: Optional[Filters] = None,
+        etag: Optional[str] = None,
+        size: Optional[int] = None,
+        dtype_backend: str = "numpy",
+        engine: str = "pandas",
+        column_types: Optional[Dict[str, str]] = None
+    ) -> Tuple[Iterator[pa.Table], str, Dict[str, int]]:
         """
-        Load a dataset from MinIO and convert it to a pandas DataFrame.
+        Open a dataset in MinIO for reading one chunk at a time.
+        
+        Parquet files are read one row group at a time, and CSV and newline-delimited
+        JSON files chunk_size rows at a time as they are streamed and decompressed,
+        so only one chunk is decoded in memory at once.
         
         Args:
             path: Path to the dataset in MinIO (bucket/object)
+            chunk_size: Number of rows per chunk for text files
+            columns: Columns to read (all columns if omitted)
+            filters: Row filters in disjunctive normal form
+            etag: Expected ETag of the object; the read fails if the object has changed
+            size: Size of the object, if already known along with its ETag
+            dtype_backend: Dtypes the pandas parser produces ("numpy" or "pyarrow")
+            engine: Parser of text files ("pandas" or "pyarrow")
+            column_types: Explicit Arrow types of some columns of text files
             
         Returns:
-            Tuple containing the DataFrame and the file extension
+            Tuple containing an iterator over the chunks as Arrow tables, the file
+            extension and a dictionary of read statistics that is updated as the
+            chunks are read
+        """
+        parts = path.split("/", 1)
+        if len(parts) != 2:
+            raise ValueError(
+                f"Invalid path format: {path}. Expected format: bucket/object"
+            )
+        
+        bucket_name, object_name = parts
+        file_extension, compression = split_format(object_name)
+        if file_extension != "parquet" and file_extension not in CHUNKED_TEXT_FORMATS:
+            raise ValueError(
+                f"Chunked mode does not support the {file_extension} format"
+            )
+        
+        try:
+            # An object whose ETag is known was found in its bucket
+            if etag is None and not self.bucket_exists(bucket_name):
+                raise ValueError(f"Bucket does not exist: {bucket_name}")
+            if file_extension == "parquet":
+                source = self.open_object(bucket_name, object_name, etag, size)
+            else:
+                source = self.client.get_object(
+                    bucket_name,
+                    object_name,
+                    request_headers={"If-Match": etag} if etag else None,
+                )
+        except S3Error as e:
+            raise ValueError(f"Error accessing MinIO: {str(e)}") from e
+        
+        stats: Dict[str, int] = {}
+        chunks = self._iter_chunks(
+            source,
+            file_extension,
+            compression,
+            chunk_size,
+            columns,
+            filters,
+            stats,
+            {
+                "dtype_backend": dtype_backend,
+                "engine": engine,
+                "column_types": column_types
+            }
+        )
+        return chunks, file_extension, stats
+
+    def _iter_chunks(
+        self,
+        source,
+        file_extension: str,
+        compression: Optional[str],
+        chunk_size: int,
+        columns: Optional[List[str]],
+        filters: Optional[Filters],
+        stats: Dict[str, int],
+        read_options: Dict[str, Any]
+    ) -> Iterator[pa.Table]:
+        try:
+            if file_extension == "parquet":
+                reader = source
+                tables = iter_parquet_row_groups(source, columns, filters, stats)
+            else:
+                stats["bytes_transferred"] = int(
+                    source.headers.get("Content-Length", 0)
+                )
+                reader = TimedReader(source)
+                tables = (
+                    select_table(table, columns, filters, stats)
+                    for table in iter_text_tables(
+                        open_text_stream(reader, compression),
+                        file_extension,
+                        chunk_size,
+                        usecols=self._csv_columns(columns, filters),
+                        **read_options
+                    )
+                )
+            while True:
+                # Each chunk is timed on the request that reads it
+                start_time = time.perf_counter()
+                wait_seconds = reader.wait_seconds
+                table = next(tables, None)
+                if table is None:
+                    break
+                record_read_time(
+                    time.perf_counter() - start_time,
+                    reader.wait_seconds - wait_seconds
+                )
+                yield table
+        except S3Error as e:
+            raise ValueError(f"Error accessing MinIO: {str(e)}") from e
+        except pa.ArrowKeyError as e:
+            raise ValueError(str(e)) from e
+        finally:
+            source.close()
+            if file_extension != "parquet":
+                source.release_conn()
+
+    def load_table(
+        self,
+        path: str,
+        columns: Optional[List[str]] = None,
+        filters: Optional[Filters] = None,
+        etag: Optional[str] = None,
+        size: Optional[int] = None,
+        dtype_backend: str = "numpy",
+        engine: str = "pandas",
+        column_types: Optional[Dict[str, str]] = None,
+        sheet: Optional[Union[str, int]] = None,
+        cell_range: Optional[str] = None
+    ) -> Tuple[pa.Table, str, Dict[str, int]]:
+        """
+        Load a dataset from MinIO as an Arrow table.
+        
+        Parquet files are decoded straight into Arrow without a pandas round trip,
+        and are read with range requests instead of being buffered whole. Column
+        projection and filters are pushed down to the Parquet reader, so unused
+        columns and row groups ruled out by their statistics are never fetched.
+        CSV and JSON files are parsed as they are streamed, and decompressed on the
+        fly if their name ends in .gz or .zst; CSV parsers skip the unused columns.
+        The pyarrow engine parses CSV and newline-delimited JSON files on all cores
+        straight into Arrow; the pyarrow dtype backend makes the pandas parsers produce
+        Arrow-backed columns, so strings never become Python objects. Excel sheets are
+        read from their Parquet sidecar once they have been converted.
+        
+        Args:
+            path: Path to the dataset in MinIO (bucket/object)
+            columns: Columns to read (all columns if omitted)
+            filters: Row filters in disjunctive normal form, in pyarrow filter syntax
+            etag: Expected ETag of the object; the read fails if the object has changed
+            size: Size of the object, if already known along with its ETag
+            dtype_backend: Dtypes the pandas parsers produce ("numpy" or "pyarrow")
+            engine: Parser of CSV and JSON lines files ("pandas" or "pyarrow")
+            column_types: Explicit Arrow types of some columns of text and Excel files
+            sheet: Sheet of an Excel file, by name or index (the first sheet if omitted)
+            cell_range: Cells of an Excel file to read, in A1 notation
+            
+        Returns:
+            Tuple containing the Arrow table, the file extension and a dictionary with
+            bytes_transferred, rows_read, rows_skipped and row_groups_skipped
         """
         try:
             # Split the path into bucket and object name
             parts = path.split("/", 1)
             if len(parts) != 2:
-                raise ValueError(f"Invalid path format: {path}. Expected format: bucket/object")
+                raise ValueError(
+                f"Invalid path format: {path}. Expected format: bucket/object"
+            )
             
             bucket_name, object_name = parts
             
-            # Check if bucket exists
-            if not self.client.bucket_exists(bucket_name):
+            # Check if bucket exists, unless the object was found in it already
+            if etag is None and not self.bucket_exists(bucket_name):
                 raise ValueError(f"Bucket does not exist: {bucket_name}")
             
             # Determine file type from extension
-            file_extension = object_name.split(".")[-1].lower()
-            
-            # Get the object
-            response = self.client.get_object(bucket_name, object_name)
-            
-            # Read the data into a DataFrame based on file type
-            if file_extension == "csv":
-                df = pd.read_csv(response)
-            elif file_extension == "parquet":
-                # For Parquet files, we need to read the entire content first
-                content = response.read()
-                df = pd.read_parquet(io.BytesIO(content))
-            elif file_extension in ["xls", "xlsx"]:
-                df = pd.read_excel(response)
-            elif file_extension == "json":
-                df = pd.read_json(response)
-            else:
+            file_extension, compression = split_format(object_name)
+            
+            stats: Dict[str, int] = {}
+            
+            if file_extension == "parquet":
+                # Read the footer first, then only the column chunks, with
+                # concurrent range requests that overlap decoding
+                with self.open_object(
+                    bucket_name, object_name, etag, size
+                ) as parquet_object:
+                    start_time = time.perf_counter()
+                    table = read_parquet(parquet_object, columns, filters, stats)
+                    record_read_time(
+                        time.perf_counter() - start_time, parquet_object.wait_seconds
+                    )
+                return table, file_extension, stats
+            
+            if file_extension in EXCEL_FORMATS and compression is None:
+                table = self._load_workbook(
+                    bucket_name,
+                    object_name,
+                    etag,
+                    columns,
+                    filters,
+                    stats,
+                    sheet=sheet,
+                    cell_range=cell_range,
+                    dtype_backend=dtype_backend,
+                    column_types=column_types
+                )
+                return table, file_extension, stats
+            
+            if file_extension not in TEXT_FORMATS:
                 raise ValueError(f"Unsupported file format: {file_extension}")
             
-            return df, file_extension
+            # Get the object, and parse it as it is streamed
+            start_time = time.perf_counter()
+            response = self.client.get_object(
+                bucket_name,
+                object_name,
+                request_headers={"If-Match": etag} if etag else None,
+            )
+            stats["bytes_transferred"] = int(response.headers.get("Content-Length", 0))
+            source = TimedReader(response)
+            source.wait_seconds = time.perf_counter() - start_time
+            table = read_text_table(
+                open_text_stream(source, compression),
+                file_extension,
+                engine=engine,
+                dtype_backend=dtype_backend,
+                usecols=self._csv_columns(columns, filters),
+                column_types=column_types
+            )
+            table = select_table(table, columns, filters, stats)
+            record_read_time(time.perf_counter() - start_time, source.wait_seconds)
+            return table, file_extension, stats
             
         except S3Error as e:
-            raise ValueError(f"Error accessing MinIO: {str(e)}")
+            raise ValueError(f"Error accessing MinIO: {str(e)}") from e
+        except pa.ArrowKeyError as e:
+            # A requested column is missing from a CSV file
+            raise ValueError(str(e)) from e
         finally:
             if 'response' in locals():
                 response.close()
                 response.release_conn()
 
-    def save_dataframe(self, df: pd.DataFrame, bucket_name: str, object_name: str) -> str:
+    def _load_workbook(
+        self,
+        bucket_name: str,
+        object_name: str,
+        etag: Optional[str],
+        columns: Optional[List[str]],
+        filters: Optional[Filters],
+        stats: Dict[str, int],
+        sheet: Optional[Union[str, int]] = None,
+        cell_range: Optional[str] = None,
+        dtype_backend: str = "numpy",
+        column_types: Optional[Dict[str, str]] = None
+    ) -> pa.Table:
+        """
+        Load a sheet of a workbook, from its Parquet sidecar if it has one.
+        
+        Parsing a workbook is much slower than reading Parquet, so with EXCEL_SIDECAR
+        the parsed sheet is saved as a Parquet sidecar next to the workbook, named
+        after the workbook's ETag. Later reads of the same version of the sheet read
+        the sidecar instead, with column projection and filters pushed down.
+        Sidecars of older versions are deleted when a new one is saved.
+        
+        Returns:
+            The selected table; stats reports whether the sidecar was hit
+        """
+        if etag is None:
+            etag = self.client.stat_object(bucket_name, object_name).etag
+        sidecar_name = sidecar_object_name(
+            object_name, etag, sheet, cell_range, dtype_backend, column_types
+        )
+        
+        if settings.EXCEL_SIDECAR:
+            try:
+                with self.open_object(bucket_name, sidecar_name) as sidecar:
+                    start_time = time.perf_counter()
+                    table = read_parquet(sidecar, columns, filters, stats)
+                    record_read_time(
+                        time.perf_counter() - start_time, sidecar.wait_seconds
+                    )
+                stats["excel_sidecar_hit"] = True
+                return table
+            except S3Error as e:
+                if e.code != "NoSuchKey":
+                    raise
+        
+        start_time = time.perf_counter()
+        response = self.client.get_object(
+            bucket_name, object_name, request_headers={"If-Match": etag}
+        )
+        try:
+            stats["bytes_transferred"] = int(response.headers.get("Content-Length", 0))
+            # Workbooks are zip or OLE containers, which cannot be parsed as a stream
+            workbook = io.BytesIO(response.read())
+        finally:
+            response.close()
+            response.release_conn()
+        download_seconds = time.perf_counter() - start_time
+        table = read_workbook(workbook, sheet, cell_range, dtype_backend, column_types)
+        del workbook
+        record_read_time(time.perf_counter() - start_time, download_seconds)
+        
+        stats["excel_sidecar_hit"] = False
+        if settings.EXCEL_SIDECAR:
+            self._save_sidecar(table, bucket_name, object_name, sidecar_name, etag)
+        return select_table(table, columns, filters, stats)
+
+    def _save_sidecar(
+        self,
+        table: pa.Table,
+        bucket_name: str,
+        object_name: str,
+        sidecar_name: str,
+        etag: str
+    ) -> None:
+        """Save the Parquet sidecar of a workbook and delete those of older versions."""
+        try:
+            self.save_dataframe(table, bucket_name, sidecar_name)
+            for sidecar in self.client.list_objects(
+                bucket_name, prefix=sidecar_prefix(object_name), recursive=True
+            ):
+                if not is_current_sidecar(sidecar.object_name, etag):
+                    self.client.remove_object(bucket_name, sidecar.object_name)
+        except (S3Error, ValueError):
+            # The sidecar only speeds up later reads; a job must not fail without it
+            pass
+
+    @staticmethod
+    def _csv_columns(
+        columns: Optional[List[str]], filters: Optional[Filters]
+    ) -> Optional[List[str]]:
+        """Columns a CSV reader must parse: the requested and the filter columns."""
+        if not columns:
+            return None
+        extra_columns = [
+            column for column in filter_columns(filters) if column not in columns
+        ]
+        return list(columns) + extra_columns
+
+    def save_dataframe(
+        self,
+        df: Union[pd.DataFrame, pa.Table],
+        bucket_name: str,
+        object_name: str,
+        encoding: Optional[ParquetEncoding] = None
+    ) -> str:
         """
-        Save a DataFrame as a Parquet file in MinIO.
+        Save a DataFrame (or Arrow table) as a Parquet file in MinIO.
+        
+        The file is written in row groups of PARQUET_ROW_GROUP_SIZE rows (unless the
+        encoding says otherwise) and uploaded while it is being encoded.
         
         Args:
-            df: DataFrame to save
+            df: DataFrame or Arrow table to save
             bucket_name: Name of the bucket
             object_name: Name of the object (should end with .parquet)
+            encoding: Encoding of the file (the Parquet writer defaults if omitted)
             
         Returns:
             Path to the saved file (bucket/object)
         """
+        table = df if isinstance(df, pa.Table) else pa.Table.from_pandas(df)
+        
+        # Stream the row groups into a multipart upload
+        writer = self.open_parquet_writer(bucket_name, object_name, encoding)
+        try:
+            writer.write(table)
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.close()
+
+    def open_parquet_writer(
+        self,
+        bucket_name: str,
+        object_name: str,
+        encoding: Optional[ParquetEncoding] = None
+    ) -> ParquetObjectWriter:
+        """
+        Create a writer that saves a Parquet file in MinIO incrementally.
+        
+        Args:
+            bucket_name: Name of the bucket (created if it does not exist)
+            object_name: Name of the object (should end with .parquet)
+            encoding: Encoding of the file; it can also be set on the writer until
+                the first table is written
+            
+        Returns:
+            A writer accepting Arrow tables
+        """
         try:
-            # Ensure the object name ends with .parquet
             if not object_name.endswith(".parquet"):
                 object_name = f"{object_name}.parquet"
             
-            # Check if bucket exists, create if not
-            if not self.client.bucket_exists(bucket_name):
-                self.client.make_bucket(bucket_name)
-            
-            # Convert DataFrame to Parquet and save to MinIO
-            parquet_buffer = io.BytesIO()
-            df.to_parquet(parquet_buffer)
-            parquet_buffer.seek(0)
-            
-            self.client.put_object(
-                bucket_name=bucket_name,
-                object_name=object_name,
-                data=parquet_buffer,
-                length=parquet_buffer.getbuffer().nbytes,
-                content_type="application/octet-stream",
-            )
+            self.bucket_exists(bucket_name, create=True)
             
-            return f"{bucket_name}/{object_name}"
+            return ParquetObjectWriter(self.client, bucket_name, object_name, encoding)
             
         except S3Error as e:
-            raise ValueError(f"Error saving to MinIO: {str(e)}")
+            raise ValueError(f"Error saving to MinIO: {str(e)}") from e
 
 
 # Singleton instance
@@ -0,0 +1,560 @@
+import collections
+import contextvars
+import io
+import threading
+import time
+from concurrent.futures import Executor, Future
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from minio import Minio
+
+from app.core.config import settings
+
+# Column chunks separated by less than this are fetched with a single request
+COALESCE_GAP = 1024 * 1024
+
+
+class MinioObjectFile(io.RawIOBase):
+    """
+    Read-only, seekable file object over a MinIO object.
+
+    Reads are served by HTTP range requests, so a reader such as pyarrow.parquet
+    only transfers the byte ranges it actually needs. Ranges that will be needed
+    soon can be prefetched with concurrent requests; every request is conditional
+    on the ETag seen when the file was opened, so a concurrent overwrite of the
+    object makes the read fail instead of mixing two versions. The time reads spend
+    waiting for data is summed in wait_seconds.
+    """
+
+    def __init__(
+        self,
+        client: Minio,
+        bucket_name: str,
+        object_name: str,
+        size: int,
+        etag: str,
+        executor: Executor,
+    ):
+        self.client = client
+        self.bucket_name = bucket_name
+        self.object_name = object_name
+        self.size = size
+        self.etag = etag
+        self.executor = executor
+        self.range_size = settings.MINIO_RANGE_SIZE_MB * 1024 * 1024
+        self.bytes_fetched = 0
+        self.requests = 0
+        self.wait_seconds = 0.0
+        self._position = 0
+        self._blocks: Dict[int, Tuple[int, "Future[bytes]"]] = {}
+        self._lock = threading.Lock()
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if position < 0:
+            raise ValueError(f"Negative seek position: {position}")
+        self._position = position
+        return position
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self.size - self._position
+        end = min(self._position + size, self.size)
+        if end <= self._position:
+            return b""
+
+        parts = []
+        position = self._position
+        start_time = time.perf_counter()
+        while position < end:
+            block = self._find_block(position)
+            if block is None:
+                # Not prefetched: fetch the rest of the read directly
+                parts.append(self._fetch(position, end))
+                position = end
+                break
+            block_start, block_end, data = block
+            chunk_end = min(end, block_end)
+            parts.append(data[position - block_start:chunk_end - block_start])
+            position = chunk_end
+
+        with self._lock:
+            self.wait_seconds += time.perf_counter() - start_time
+        self._position = position
+        return parts[0] if len(parts) == 1 else b"".join(parts)
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def prefetch(self, ranges: List[Tuple[int, int]]) -> List[int]:
+        """
+        Start fetching byte ranges in the background.
+
+        Nearby ranges are coalesced and large ranges are split into
+        MINIO_RANGE_SIZE_MB requests, which run concurrently on the executor.
+
+        Args:
+            ranges: List of (start, end) byte ranges, end exclusive
+
+        Returns:
+            Keys of the prefetched blocks, to be passed to discard once consumed
+        """
+        keys = []
+        for start, end in _coalesce(ranges):
+            for block_start in range(start, end, self.range_size):
+                block_end = min(block_start + self.range_size, end)
+                with self._lock:
+                    if block_start in self._blocks:
+                        continue
+                    # Requests are counted for the request that prefetched them
+                    future = self.executor.submit(
+                        contextvars.copy_context().run,
+                        self._fetch,
+                        block_start,
+                        block_end
+                    )
+                    self._blocks[block_start] = (block_end, future)
+                keys.append(block_start)
+        return keys
+
+    def discard(self, keys: List[int]) -> None:
+        """Drop prefetched blocks that are no longer needed."""
+        with self._lock:
+            for key in keys:
+                self._blocks.pop(key, None)
+
+    def close(self) -> None:
+        with self._lock:
+            for _, future in self._blocks.values():
+                future.cancel()
+            self._blocks.clear()
+        super().close()
+
+    def _find_block(self, position: int) -> Optional[Tuple[int, int, bytes]]:
+        with self._lock:
+            block = next(
+                (
+                    (block_start, block_end, future)
+                    for block_start, (block_end, future) in self._blocks.items()
+                    if block_start <= position < block_end
+                ),
+                None
+            )
+        if block is None:
+            return None
+        # Wait for the fetch outside the lock so that other reads can go on
+        block_start, block_end, future = block
+        return block_start, block_end, future.result()
+
+    def _fetch(self, start: int, end: int) -> bytes:
+        response = self.client.get_object(
+            self.bucket_name,
+            self.object_name,
+            offset=start,
+            length=end - start,
+            request_headers={"If-Match": self.etag},
+        )
+        try:
+            data = response.read()
+        finally:
+            response.close()
+            response.release_conn()
+        with self._lock:
+            self.bytes_fetched += len(data)
+            self.requests += 1
+        return data
+
+
+class TimedReader(io.RawIOBase):
+    """
+    Readable stream that sums the time spent waiting on the stream it wraps in
+    wait_seconds. Closing it leaves the wrapped stream open.
+    """
+
+    def __init__(self, source: Any):
+        self.source = source
+        self.wait_seconds = 0.0
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        start_time = time.perf_counter()
+        data = self.source.read(size if size is not None and size >= 0 else None)
+        self.wait_seconds += time.perf_counter() - start_time
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class UploadPipe(io.RawIOBase):
+    """
+    Bounded in-memory pipe between a writer thread and an uploading thread.
+
+    The writer side is append-only but reports its position, which is all that
+    pyarrow.parquet.ParquetWriter needs from a sink. The reader side is consumed by
+    Minio.put_object, which cuts it into multipart upload parts. Writes block while
+    max_buffered bytes or more are waiting, so the writer cannot outrun the upload;
+    max_buffered must be at least the size of the reads, or the reader never gets
+    enough data. The time writes spend blocked is summed in wait_seconds.
+    """
+
+    def __init__(self, max_buffered: int):
+        self.max_buffered = max_buffered
+        self._chunks: "collections.deque[bytes]" = collections.deque()
+        self._buffered = 0
+        self._position = 0
+        self._finished = False
+        self._error: Optional[BaseException] = None
+        self._condition = threading.Condition()
+        self.wait_seconds = 0.0
+
+    def writable(self) -> bool:
+        return True
+
+    def readable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        with self._condition:
+            start_time = time.perf_counter()
+            while self._buffered >= self.max_buffered and self._error is None:
+                self._condition.wait()
+            self.wait_seconds += time.perf_counter() - start_time
+            if self._error is not None:
+                raise IOError(f"Upload failed: {str(self._error)}")
+            if self._finished:
+                raise ValueError("Write to a finished upload pipe")
+            self._chunks.append(data)
+            self._buffered += len(data)
+            self._position += len(data)
+            self._condition.notify_all()
+        return len(data)
+
+    def read(self, size: int = -1) -> bytes:
+        with self._condition:
+            while (
+                (size is None or size < 0 or self._buffered < size)
+                and not self._finished
+                and self._error is None
+            ):
+                self._condition.wait()
+            if self._error is not None:
+                raise IOError(f"Upload aborted: {str(self._error)}")
+            if size is None or size < 0:
+                size = self._buffered
+            parts = []
+            remaining = size
+            while remaining > 0 and self._chunks:
+                chunk = self._chunks.popleft()
+                if len(chunk) > remaining:
+                    self._chunks.appendleft(chunk[remaining:])
+                    chunk = chunk[:remaining]
+                parts.append(chunk)
+                remaining -= len(chunk)
+            data = b"".join(parts)
+            self._buffered -= len(data)
+            self._condition.notify_all()
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def finish(self) -> None:
+        """Signal the end of the data; the reader gets the rest and then EOF."""
+        with self._condition:
+            self._finished = True
+            self._condition.notify_all()
+
+    def fail(self, error: BaseException) -> None:
+        """Make pending and future reads and writes on both sides raise."""
+        with self._condition:
+            if self._error is None:
+                self._error = error
+            self._chunks.clear()
+            self._buffered = 0
+            self._condition.notify_all()
+
+    def close(self) -> None:
+        # Closing the writer side (ParquetWriter closes its sink) must not end the
+        # stream for the reader, so only finish() and fail() do that
+        pass
+
+
+def _coalesce(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Merge overlapping ranges and ranges separated by less than COALESCE_GAP."""
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start - merged[-1][1] < COALESCE_GAP:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def filters_to_expression(
+    filters: List[List[Tuple[str, str, Any]]], schema: pa.Schema
+) -> ds.Expression:
+    """
+    Build a pyarrow expression from filters in disjunctive normal form.
+
+    Filter values are cast to the type of their column first, so for example
+    an ISO date string can be compared with a timestamp column.
+
+    Args:
+        filters: List of conjunctions, each a list of (column, op, value) predicates
+        schema: Schema of the table the filters apply to
+
+    Returns:
+        Expression usable for row group pruning and row filtering
+    """
+    conjunctions = []
+    for conjunction in filters:
+        predicates = []
+        for column, op, value in conjunction:
+            if column not in schema.names:
+                raise ValueError(f"Unknown filter column: {column}")
+            column_type = schema.field(column).type
+            if op in ["in", "not in"]:
+                value = [_cast_value(item, column_type) for item in value]
+            else:
+                value = _cast_value(value, column_type)
+            predicates.append((column, op, value))
+        conjunctions.append(predicates)
+    return pq.filters_to_expression(conjunctions)
+
+
+def filter_columns(filters: Optional[List[List[Tuple[str, str, Any]]]]) -> List[str]:
+    """Names of the columns referenced by filters, in order of appearance."""
+    names: List[str] = []
+    for conjunction in filters or []:
+        for column, _, _ in conjunction:
+            if column not in names:
+                names.append(column)
+    return names
+
+
+def select_table(
+    table: pa.Table,
+    columns: Optional[List[str]] = None,
+    filters: Optional[List[List[Tuple[str, str, Any]]]] = None,
+    stats: Optional[Dict[str, int]] = None,
+) -> pa.Table:
+    """
+    Apply filters and column projection to a table that was read without pushdown.
+
+    Stored pandas index columns are kept, as the Parquet reader does. Selecting
+    columns does not copy any data.
+
+    Args:
+        table: Table to select from
+        columns: Columns to keep (all columns if omitted)
+        filters: Row filters in disjunctive normal form
+        stats: Dictionary updated with rows_read and rows_skipped
+
+    Returns:
+        The selected table
+    """
+    rows = table.num_rows
+    if filters:
+        table = table.filter(filters_to_expression(filters, table.schema))
+    if columns:
+        missing = [column for column in columns if column not in table.column_names]
+        if missing:
+            raise ValueError(f"Unknown columns: {', '.join(missing)}")
+        pandas_metadata = table.schema.pandas_metadata or {}
+        index_columns = [
+            index for index in pandas_metadata.get("index_columns", [])
+            if isinstance(index, str)
+            and index in table.column_names
+            and index not in columns
+        ]
+        table = table.select(list(columns) + index_columns)
+    if stats is not None:
+        stats["rows_read"] = stats.get("rows_read", 0) + table.num_rows
+        stats["rows_skipped"] = stats.get("rows_skipped", 0) + rows - table.num_rows
+    return table
+
+
+def _cast_value(value: Any, column_type: pa.DataType) -> Any:
+    if pa.types.is_dictionary(column_type):
+        column_type = column_type.value_type
+    try:
+        return pa.array([value]).cast(column_type)[0].as_py()
+    except (pa.ArrowException, ValueError, TypeError):
+        return value
+
+
+def _row_group_ranges(
+    metadata: pq.FileMetaData, row_group: int, columns: Optional[Set[str]] = None
+) -> List[Tuple[int, int]]:
+    """Byte ranges of the column chunks of a row group, optionally of some columns."""
+    ranges = []
+    row_group_metadata = metadata.row_group(row_group)
+    for column in range(row_group_metadata.num_columns):
+        column_metadata = row_group_metadata.column(column)
+        column_name = column_metadata.path_in_schema.split(".")[0]
+        if columns is not None and column_name not in columns:
+            continue
+        start = column_metadata.data_page_offset
+        if (
+            column_metadata.has_dictionary_page
+            and column_metadata.dictionary_page_offset
+        ):
+            start = min(start, column_metadata.dictionary_page_offset)
+        ranges.append((start, start + column_metadata.total_compressed_size))
+    return ranges
+
+
+def iter_parquet_row_groups(
+    file: MinioObjectFile,
+    columns: Optional[List[str]] = None,
+    filters: Optional[List[List[Tuple[str, str, Any]]]] = None,
+    stats: Optional[Dict[str, int]] = None,
+) -> Iterator[pa.Table]:
+    """
+    Read a Parquet object one row group at a time.
+
+    Only the footer is read up front. Row groups whose statistics rule out the
+    filters are skipped, and only the column chunks of the requested columns (plus
+    the filter and index columns) are fetched. The chunks of the next
+    MINIO_READAHEAD_ROW_GROUPS row groups are prefetched while the current one is
+    decoded, so network transfer overlaps decoding.
+
+    Args:
+        file: MinIO object to read
+        columns: Columns to read (all columns if omitted)
+        filters: Row filters in disjunctive normal form
+        stats: Dictionary updated with bytes_transferred, rows_read, rows_skipped
+            and row_groups_skipped as the file is read
+
+    Returns:
+        Iterator over the row groups as Arrow tables
+    """
+    stats = stats if stats is not None else {}
+    parquet_file = pq.ParquetFile(file)
+    metadata = parquet_file.metadata
+    schema = parquet_file.schema_arrow
+
+    read_columns = None
+    needed_columns = None
+    extra_columns: List[str] = []
+    if columns:
+        missing = [column for column in columns if column not in schema.names]
+        if missing:
+            raise ValueError(f"Unknown columns: {', '.join(missing)}")
+        extra_columns = [
+            column for column in filter_columns(filters) if column not in columns
+        ]
+        read_columns = list(columns) + extra_columns
+        index_columns = [
+            index for index in (schema.pandas_metadata or {}).get("index_columns", [])
+            if isinstance(index, str)
+        ]
+        needed_columns = set(read_columns) | set(index_columns)
+
+    row_groups = list(range(metadata.num_row_groups))
+    expression = None
+    if filters:
+        expression = filters_to_expression(filters, schema)
+        fragment = ds.ParquetFileFormat().make_fragment(file)
+        row_groups = [
+            row_group_fragment.row_groups[0].id
+            for row_group_fragment in fragment.split_by_row_group(expression)
+        ]
+
+    # Rows of the row groups pruned by their statistics are never fetched
+    skipped_row_groups = metadata.num_row_groups - len(row_groups)
+    skipped_rows = metadata.num_rows - sum(
+        metadata.row_group(i).num_rows for i in row_groups
+    )
+    stats["row_groups_skipped"] = (
+        stats.get("row_groups_skipped", 0) + skipped_row_groups
+    )
+    stats["rows_skipped"] = stats.get("rows_skipped", 0) + skipped_rows
+    stats.setdefault("rows_read", 0)
+
+    readahead = settings.MINIO_READAHEAD_ROW_GROUPS
+    prefetched: Dict[int, List[int]] = {}
+
+    for position, row_group in enumerate(row_groups):
+        for upcoming in row_groups[position:position + readahead + 1]:
+            if upcoming not in prefetched:
+                prefetched[upcoming] = file.prefetch(
+                    _row_group_ranges(metadata, upcoming, needed_columns)
+                )
+
+        table = parquet_file.read_row_group(
+            row_group, columns=read_columns, use_pandas_metadata=True
+        )
+        file.discard(prefetched.pop(row_group))
+
+        rows = table.num_rows
+        if expression is not None:
+            table = table.filter(expression)
+            if extra_columns:
+                table = table.drop_columns(extra_columns)
+        stats["rows_read"] += table.num_rows
+        stats["rows_skipped"] += rows - table.num_rows
+        stats["bytes_transferred"] = file.bytes_fetched
+        yield table
+
+    stats["bytes_transferred"] = file.bytes_fetched
+
+
+def read_parquet(
+    file: MinioObjectFile,
+    columns: Optional[List[str]] = None,
+    filters: Optional[List[List[Tuple[str, str, Any]]]] = None,
+    stats: Optional[Dict[str, int]] = None,
+) -> pa.Table:
+    """
+    Read a whole Parquet object, streaming its row groups.
+
+    Args:
+        file: MinIO object to read
+        columns: Columns to read (all columns if omitted)
+        filters: Row filters in disjunctive normal form
+        stats: Dictionary updated with the read statistics
+
+    Returns:
+        Arrow table with the selected content of the file
+    """
+    tables = list(iter_parquet_row_groups(file, columns, filters, stats))
+    if tables:
+        return pa.concat_tables(tables)
+    empty_table = pq.ParquetFile(file).schema_arrow.empty_table()
+    return empty_table.select(columns) if columns else empty_table
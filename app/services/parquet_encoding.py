@@ -0,0 +1,135 @@
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from app.core.config import settings
+from app.schemas.process import OutputOptions
+
+
+class ParquetEncoding:
+    """Compression, dictionary encoding and row group size of a Parquet file."""
+
+    def __init__(
+        self,
+        compression: str = settings.PARQUET_COMPRESSION,
+        compression_level: Optional[int] = None,
+        use_dictionary: Union[bool, List[str]] = True,
+        row_group_size: int = settings.PARQUET_ROW_GROUP_SIZE,
+    ):
+        self.compression = compression
+        self.compression_level = compression_level
+        self.use_dictionary = use_dictionary
+        self.row_group_size = row_group_size
+
+    def writer_options(self) -> Dict[str, Any]:
+        """Keyword arguments of pyarrow.parquet.ParquetWriter."""
+        return {
+            "compression": self.compression,
+            "compression_level": self.compression_level,
+            "use_dictionary": self.use_dictionary,
+        }
+
+    def describe(self) -> Dict[str, Any]:
+        """Summary of the encoding for the response metadata."""
+        return {
+            "compression": self.compression,
+            "row_group_size": self.row_group_size,
+            "dictionary_columns": (
+                self.use_dictionary if isinstance(self.use_dictionary, list) else "all"
+            ),
+        }
+
+
+def estimate_distinct_ratios(table: pa.Table, sample_rows: int) -> Dict[str, float]:
+    """
+    Estimate the share of distinct values of each column from a sample of rows.
+
+    The sample is spread evenly over the table, so sorted or clustered data does not
+    skew it, and its size is bounded, so the cost does not grow with the table.
+
+    Args:
+        table: Table to inspect
+        sample_rows: Maximum number of rows in the sample
+
+    Returns:
+        Distinct values per sampled row, by column name
+    """
+    if table.num_rows > sample_rows:
+        indices = np.linspace(0, table.num_rows - 1, num=sample_rows, dtype=np.int64)
+        table = table.take(pa.array(indices))
+    if table.num_rows == 0:
+        return {name: 0.0 for name in table.column_names}
+    return {
+        name: pc.count_distinct(column, mode="all").as_py() / table.num_rows
+        for name, column in zip(table.column_names, table.columns, strict=True)
+    }
+
+
+def choose_encoding(
+    table: pa.Table,
+    options: Optional[OutputOptions] = None,
+    check_columns: bool = True,
+) -> ParquetEncoding:
+    """
+    Choose how a result table is encoded as Parquet.
+
+    Columns whose estimated share of distinct values is at most
+    DICTIONARY_MAX_DISTINCT_RATIO are dictionary encoded and the others are written
+    plain, so the writer neither converts the data nor builds dictionaries that it
+    would abandon. Columns that are already dictionaries (pandas categoricals) keep
+    their dictionary encoding.
+
+    Args:
+        table: The result table
+        options: Encoding options of the request
+        check_columns: Whether column_encodings may only name columns of the table
+
+    Returns:
+        The encoding of the file
+    """
+    options = options or OutputOptions()
+    overrides = {
+        name: encoding for name, encoding in (options.column_encodings or {}).items()
+        if name in table.column_names
+    }
+    unknown = set(options.column_encodings or {}) - set(overrides)
+    if unknown and check_columns:
+        raise ValueError(
+            f"Unknown columns in column_encodings: {', '.join(sorted(unknown))}"
+        )
+
+    if options.optimize:
+        flat_columns = [
+            field.name for field in table.schema
+            if not pa.types.is_nested(field.type)
+            and not pa.types.is_dictionary(field.type)
+        ]
+        ratios = estimate_distinct_ratios(
+            table.select([name for name in flat_columns if name not in overrides]),
+            settings.ENCODING_SAMPLE_ROWS,
+        )
+        dictionary_columns = [
+            field.name for field in table.schema
+            if overrides.get(field.name) == "dictionary"
+            or (field.name not in overrides and (
+                pa.types.is_dictionary(field.type)
+                or ratios.get(field.name, 1.0) <= settings.DICTIONARY_MAX_DISTINCT_RATIO
+            ))
+        ]
+        use_dictionary: Union[bool, List[str]] = dictionary_columns
+    elif overrides:
+        use_dictionary = [
+            name for name in table.column_names
+            if overrides.get(name, "dictionary") == "dictionary"
+        ]
+    else:
+        use_dictionary = True
+
+    return ParquetEncoding(
+        compression=options.compression or settings.PARQUET_COMPRESSION,
+        compression_level=options.compression_level,
+        use_dictionary=use_dictionary,
+        row_group_size=options.row_group_size or settings.PARQUET_ROW_GROUP_SIZE,
+    )
@@ -0,0 +1,1352 @@
+import asyncio
+import os
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+import pyarrow as pa
+from minio.datatypes import Object
+
+from app.core.config import settings
+from app.core.round_trips import count_round_trips
+from app.core.timing import StageTimer, use_timer
+from app.schemas.process import (
+    InputOptions,
+    PipelineStep,
+    ProcessOptions,
+    ProcessRequest,
+    ProcessResponse,
+)
+from app.services.async_minio_client import async_minio_client
+from app.services.code_executor import code_executor
+from app.services.code_validator import code_validator
+from app.services.dataset_cache import CachedDataset, dataset_cache
+from app.services.execution_pool import PoolSaturatedError, execution_pool
+from app.services.metrics import metrics
+from app.services.minio_client import Filters, minio_client
+from app.services.parquet_encoding import ParquetEncoding, choose_encoding
+from app.services.profiling import merge_profiles
+from app.services.result_cache import result_cache
+from app.services.sandbox_pool import SandboxError, sandbox_pool
+from app.services.shared_tables import shared_table_store
+
+# Metadata describing what a job read, zeroed on result cache hits
+READ_STATS = (
+    "bytes_transferred",
+    "bytes_from_cache",
+    "rows_read",
+    "rows_skipped",
+    "row_groups_skipped",
+    "rows_in",
+)
+
+
+class ProcessingError(Exception):
+    """
+    Exception raised when a job fails, carrying the HTTP status that describes the
+    failure.
+    
+    Args:
+        status_code: HTTP status code of the failure
+        detail: Error details returned to the client
+        headers: Extra HTTP headers, e.g. Retry-After
+    """
+    
+    def __init__(
+        self,
+        status_code: int,
+        detail: Dict[str, Any],
+        headers: Optional[Dict[str, str]] = None
+    ):
+        super().__init__(detail.get("error", str(detail)))
+        self.status_code = status_code
+        self.detail = detail
+        self.headers = headers
+
+
+class ProcessingService:
+    """
+    Runs processing jobs: validation, result cache lookup, admission, load, execution
+    and save.
+    
+    Used by the synchronous process endpoint and by the asynchronous job manager,
+    which only differ in how they hand the outcome to the client.
+    """
+    
+    async def run(
+        self,
+        request: ProcessRequest,
+        timer: StageTimer,
+        on_admitted: Optional[Callable[[], Awaitable[None]]] = None,
+        output_object: Optional[Tuple[str, str]] = None,
+        validated: bool = False,
+        wait_for_slot: bool = False
+    ) -> ProcessResponse:
+        """
+        Run a job to completion.
+        
+        Args:
+            request: The process request
+            timer: Timer collecting the per-stage durations of the job
+            on_admitted: Awaited once the job has left the queue and starts running, or
+                once its result has been found in the result cache
+            output_object: Bucket and object name to save the result to, instead of
+                a new object next to the dataset
+            validated: Whether the code was already validated by the caller
+            wait_for_slot: Wait for a job slot even if the queue is full, instead of
+                failing with 503
+            
+        Returns:
+            The response for the processed dataset
+            
+        Raises:
+            ProcessingError: If the job cannot be run or fails
+        """
+        start_time = time.perf_counter()
+        # Every MinIO request of the job is counted, including those of I/O threads,
+        # and the transfers record their stages on the job's timer
+        with count_round_trips() as round_trips, use_timer(timer):
+            try:
+                response = await self._run(
+                    request, timer, on_admitted, output_object, validated, wait_for_slot
+                )
+            except ProcessingError as e:
+                metrics.observe_job(
+                    request.mode,
+                    e.status_code,
+                    time.perf_counter() - start_time,
+                    timer,
+                    round_trips
+                )
+                raise
+        
+        metadata = response.metadata
+        metadata["minio_requests"] = round_trips.as_dict()
+        metadata["bytes_in"] = metadata.get("bytes_transferred", 0) + sum(
+            input_metadata.get("bytes_transferred", 0)
+            for input_metadata in metadata.get("inputs", {}).values()
+        )
+        metadata["bytes_out"] = round_trips.bytes_sent
+        metrics.observe_job(
+            request.mode,
+            200,
+            time.perf_counter() - start_time,
+            timer,
+            round_trips,
+            metadata,
+            response.rows
+        )
+        return response
+    
+    async def _run(
+        self,
+        request: ProcessRequest,
+        timer: StageTimer,
+        on_admitted: Optional[Callable[[], Awaitable[None]]],
+        output_object: Optional[Tuple[str, str]],
+        validated: bool,
+        wait_for_slot: bool
+    ) -> ProcessResponse:
+        """Run a job to completion; see run."""
+        # Validate the code
+        if not validated:
+            with timer.stage("validate"):
+                is_valid, validation_result = self.validate(request)
+            
+            if not is_valid:
+                raise ProcessingError(
+                    status_code=400,
+                    detail=validation_result
+                )
+        
+        # Stat the datasets once; the cache key, the dataset cache and the reads all
+        # use these versions
+        objects = await self._stat_datasets(request)
+        
+        # Return the result of an identical earlier job without loading anything;
+        # profiled jobs always run
+        cache_key = None
+        if request.use_cache and result_cache.enabled and not request.profile:
+            with timer.stage("cache_lookup"):
+                cache_key, cached = await execution_pool.run_io(
+                    self._lookup_cached_result, request, objects
+                )
+            if cached is not None:
+                # Cached results skip the queue but still go through the running state
+                if on_admitted is not None:
+                    await on_admitted()
+                parquet_path = cached["parquet_path"]
+                if (
+                    output_object is not None
+                    and parquet_path != "/".join(output_object)
+                ):
+                    # Server-side copy of the earlier result to the requested location
+                    try:
+                        with timer.stage("save"):
+                            parquet_path = await async_minio_client.copy_object(
+                                parquet_path, *output_object
+                            )
+                    except ValueError as e:
+                        raise ProcessingError(
+                            status_code=500,
+                            detail={"error": str(e)}
+                        ) from e
+                metadata = {
+                    **self._without_reads(cached["metadata"]),
+                    "cache_hit": True,
+                    "timings": timer.as_dict()
+                }
+                return ProcessResponse(
+                    **{**cached, "parquet_path": parquet_path, "metadata": metadata}
+                )
+        
+        try:
+            async with execution_pool.admit(wait_for_slot) as queue_wait:
+                timer.record("queue_wait", queue_wait)
+                if on_admitted is not None:
+                    await on_admitted()
+                if request.mode == "chunked":
+                    response, result_etag = await self._run_chunked_job(
+                        request, timer, objects, output_object
+                    )
+                else:
+                    response, result_etag = await self._run_job(
+                        request, timer, objects, output_object
+                    )
+            
+            response.metadata["cache_hit"] = False
+            if cache_key is not None:
+                await execution_pool.run_io(
+                    self._store_result, cache_key, response, result_etag
+                )
+            return response
+        except PoolSaturatedError as e:
+            raise ProcessingError(
+                status_code=503,
+                detail={"error": str(e)},
+                headers={"Retry-After": str(settings.QUEUE_FULL_RETRY_AFTER)}
+            ) from e
+        except SandboxError as e:
+            raise ProcessingError(
+                status_code=500,
+                detail={"error": str(e)}
+            ) from e
+        except ProcessingError:
+            raise
+        except Exception as e:
+            raise ProcessingError(
+                status_code=500,
+                detail={"error": f"An unexpected error occurred: {str(e)}"}
+            ) from e
+    
+    async def _stat_datasets(self, request: ProcessRequest) -> Dict[str, Object]:
+        """
+        Stat the dataset and the additional inputs of a job, concurrently.
+        
+        Each object is stat'ed once per job. The cache key is built from these
+        versions, and the dataset cache and the reads use their ETags, so a job
+        whose dataset changes after this point fails instead of mixing versions.
+        
+        Args:
+            request: The process request
+            
+        Returns:
+            The metadata of each object found, by path; missing objects are left
+            out and reported by the load stage
+        """
+        paths = list(dict.fromkeys(self._dataset_paths(request)))
+        stats = await asyncio.gather(
+            *(async_minio_client.object_stat(path) for path in paths),
+            return_exceptions=True
+        )
+        objects = {}
+        for path, stat in zip(paths, stats, strict=True):
+            if isinstance(stat, ValueError):
+                continue
+            if isinstance(stat, BaseException):
+                raise stat
+            objects[path] = stat
+        return objects
+    
+    def _dataset_paths(self, request: ProcessRequest) -> List[str]:
+        """Paths of the dataset and the additional inputs of a job."""
+        return [request.dataset_path, *(request.inputs or {}).values()]
+    
+    def _without_reads(self, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Metadata of a cached job for a cache hit, which reads nothing: the read
+        statistics of the dataset and of the additional inputs are zeroed.
+        """
+        def zeroed(stats: Dict[str, Any]) -> Dict[str, Any]:
+            return {
+                **stats,
+                **{field: 0 for field in READ_STATS if field in stats},
+                **(
+                    {"dataset_cache_hit": False} if "dataset_cache_hit" in stats else {}
+                ),
+            }
+        
+        metadata = zeroed(metadata)
+        if "inputs" in metadata:
+            metadata["inputs"] = {
+                name: zeroed(input_metadata)
+                for name, input_metadata in metadata["inputs"].items()
+            }
+        return metadata
+    
+    def validate(self, options: ProcessOptions) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Validate the code of every step of a job.
+        
+        Args:
+            options: The code and options of the job
+            
+        Returns:
+            Tuple containing a boolean indicating if the code is valid and the
+            validation details of the first invalid step, naming the step in pipelines
+        """
+        for step in options.pipeline():
+            if step.code is None:
+                # Built-in steps run no user code
+                continue
+            is_valid, validation_result = code_validator.validate_code(step.code)
+            if not is_valid:
+                if options.steps is not None:
+                    validation_result = {**validation_result, "step": step.name}
+                return False, validation_result
+        return True, {"valid": True}
+    
+    async def _run_job(
+        self,
+        request: ProcessRequest,
+        timer: StageTimer,
+        objects: Dict[str, Object],
+        output_object: Optional[Tuple[str, str]] = None
+    ) -> Tuple[ProcessResponse, Optional[str]]:
+        """
+        Load, execute and save a job once it has been admitted to the execution pool.
+        
+        Args:
+            request: The process request
+            timer: Timer collecting the per-stage durations of the request
+            objects: Metadata of the datasets, by path (see _stat_datasets)
+            output_object: Bucket and object name to save the result to
+            
+        Returns:
+            Tuple containing the response for the processed dataset and the ETag of
+            the result file
+        """
+        # Load the dataset and the additional inputs concurrently, unless they are
+        # already cached in shared memory
+        input_names = list(request.inputs or {})
+        read_options = self._read_options(request)
+        loaded = await self._load_datasets(
+            [(request.dataset_path, request.columns, request.filters, read_options)]
+            + [
+                (
+                    request.inputs[name],
+                    None,
+                    None,
+                    self._read_options(request, dataset=False)
+                )
+                for name in input_names
+            ],
+            timer,
+            objects
+        )
+        (dataset, read_stats, dataset_cache_hit), inputs = loaded[0], loaded[1:]
+        
+        # Map jobs run one partition of the dataset per sandbox worker
+        partitions = self._partitions(request)
+        partition_cpu = (request.max_cpu or settings.DEFAULT_MAX_CPU) / partitions
+        output_paths = [shared_table_store.allocate() for _ in range(partitions)]
+        checkpoint_paths = [
+            {
+                step.name: shared_table_store.allocate()
+                for step in request.pipeline()
+                if step.checkpoint
+            }
+            for _ in range(partitions)
+        ]
+        try:
+            # Execute the steps in sandbox workers; a full cached dataset serving a
+            # projected request is narrowed down by the workers
+            timeout = request.timeout or settings.DEFAULT_TIMEOUT
+            with timer.stage("sandbox"):
+                outcomes = await asyncio.gather(*(
+                    execution_pool.run_cpu(
+                        code_executor.execute_pipeline,
+                        job_timeout=timeout,
+                        job_cpu=partition_cpu,
+                        tenant=request.tenant,
+                        steps=self._executor_steps(request.pipeline()),
+                        input_path=dataset.path,
+                        output_path=output_paths[index],
+                        timeout=timeout,
+                        max_memory=request.max_memory,
+                        columns=request.columns if dataset.is_full else None,
+                        filters=request.filters if dataset.is_full else None,
+                        checkpoint_paths=checkpoint_paths[index],
+                        input_paths={
+                            name: input_dataset.path
+                            for name, (input_dataset, _, _) in zip(
+                                input_names, inputs, strict=True
+                            )
+                        },
+                        dtype_backend=read_options["dtype_backend"],
+                        partition=(index, partitions) if partitions > 1 else None,
+                        partition_by=request.partition_by,
+                        max_cpu=partition_cpu,
+                        profile=request.profile
+                    )
+                    for index in range(partitions)
+                ))
+            success, execution_result = self._merge_partitions(outcomes)
+            
+            if not success:
+                raise ProcessingError(
+                    status_code=500,
+                    detail=self._execution_error(execution_result)
+                )
+            self._record_worker_stages(timer, execution_result)
+            if execution_result.get("selection") is not None:
+                # The columns and rows were selected from a full cached dataset, by
+                # the workers rather than by the reader
+                read_stats = {**read_stats, **execution_result["selection"]}
+            
+            response, result_etag = await self._save_result(
+                request,
+                execution_result,
+                dataset.file_extension,
+                read_stats,
+                timer,
+                output_object
+            )
+            response.metadata["dataset_cache_hit"] = dataset_cache_hit
+            if input_names:
+                response.metadata["inputs"] = self._input_metadata(
+                    request, input_names, inputs
+                )
+            if request.profile:
+                response.metadata["profile"] = execution_result["profile"]
+            if request.mode == "map":
+                response.metadata["partitions"] = partitions
+                response.metadata["partition_rows"] = execution_result.get(
+                    "partition_rows", [response.rows]
+                )
+            return response, result_etag
+        finally:
+            for loaded_dataset, _, _ in loaded:
+                dataset_cache.release(loaded_dataset)
+            for output_path in output_paths:
+                shared_table_store.unlink(output_path)
+            for paths in checkpoint_paths:
+                for checkpoint_path in paths.values():
+                    shared_table_store.unlink(checkpoint_path)
+    
+    def _executor_steps(
+        self, steps: List[PipelineStep]
+    ) -> List[Tuple[str, Union[str, Dict[str, Any]]]]:
+        """Steps as execute_pipeline takes them: code or built-in step options."""
+        return [
+            (
+                step.name,
+                step.code if step.catch22 is None else step.catch22.model_dump()
+            )
+            for step in steps
+        ]
+    
+    def _partitions(self, request: ProcessRequest) -> int:
+        """
+        Number of partitions of a job: one per core of max_cpu in map mode, up to
+        the number of sandbox workers, and one otherwise. The partitions share the
+        cores of max_cpu evenly.
+        """
+        if request.mode != "map":
+            return 1
+        max_cpu = request.max_cpu or settings.DEFAULT_MAX_CPU
+        return max(1, min(int(max_cpu), sandbox_pool.size))
+    
+    def _merge_partitions(
+        self, outcomes: List[Tuple[bool, Dict[str, Any]]]
+    ) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Combine the execution results of the partitions of a map job.
+        
+        The result paths of the job and of its checkpoint steps become lists of the
+        partitions' paths, in order, which _save_result concatenates. Row counts
+        and memory are summed; the execution, conversion and write times are those
+        of the slowest partition. Profiles are merged.
+        
+        Args:
+            outcomes: Success flag and execution details of each partition
+            
+        Returns:
+            Tuple containing a boolean indicating if every partition succeeded and the
+            combined execution details, or the details of the first failed partition
+        """
+        if len(outcomes) == 1:
+            return outcomes[0]
+        for index, (success, result) in enumerate(outcomes):
+            if not success:
+                return False, {
+                    **result,
+                    "error": f"Partition {index}: {result['error']}",
+                    "partition": index
+                }
+        
+        results = [
+            result for _, result in outcomes if result["result_path"] is not None
+        ]
+        steps = []
+        for step_index, step in enumerate(results[0]["steps"]):
+            partition_steps = [result["steps"][step_index] for result in results]
+            merged_step = {
+                "name": step["name"],
+                "execution_time": max(
+                    partition_step["execution_time"]
+                    for partition_step in partition_steps
+                ),
+                "rows": sum(
+                    partition_step["rows"] for partition_step in partition_steps
+                ),
+                "columns": step["columns"],
+            }
+            if "result_path" in step:
+                merged_step["result_path"] = [
+                    partition_step["result_path"] for partition_step in partition_steps
+                ]
+            steps.append(merged_step)
+        
+        merged = {
+            "success": True,
+            "execution_time": max(result["execution_time"] for result in results),
+            "convert_time": max(result["convert_time"] for _, result in outcomes),
+            "write_time": max(result["write_time"] for _, result in outcomes),
+            "input_rows": sum(result["input_rows"] for _, result in outcomes),
+            "rows": sum(result["rows"] for result in results),
+            "columns": results[0]["columns"],
+            "steps": steps,
+            "result_path": [result["result_path"] for result in results],
+            # Each worker's high-water mark includes its idle footprint, so a sum
+            # would count that once per partition; max_memory is per partition too
+            "peak_memory": max(result["peak_memory"] for _, result in outcomes),
+            "partition_rows": [result["rows"] for _, result in outcomes],
+            # Every partition selects from the whole table before partitioning it
+            "selection": outcomes[0][1].get("selection"),
+        }
+        profiles = [result["profile"] for _, result in outcomes if "profile" in result]
+        if profiles:
+            merged["profile"] = merge_profiles(profiles)
+        return True, merged
+    
+    def _read_result(self, result_path: Union[str, List[str]]) -> pa.Table:
+        """Read a shared result table, joining the partitions of a map job in order."""
+        if isinstance(result_path, str):
+            return shared_table_store.read(result_path)
+        tables = [shared_table_store.read(path) for path in result_path]
+        try:
+            return pa.concat_tables(tables, promote_options="permissive")
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            raise ProcessingError(
+                status_code=500,
+                detail={
+                    "error": (
+                        "The partitions returned DataFrames that cannot be "
+                        f"concatenated: {str(e)}"
+                    )
+                }
+            ) from e
+    
+    async def _load_datasets(
+        self,
+        sources: List[
+            Tuple[str, Optional[List[str]], Optional[Filters], Dict[str, Any]]
+        ],
+        timer: StageTimer,
+        objects: Dict[str, Object]
+    ) -> List[Tuple[CachedDataset, Dict[str, int], bool]]:
+        """
+        Load datasets concurrently and share them with the sandbox workers.
+        
+        Datasets found in the dataset cache are neither downloaded nor decoded again.
+        
+        Args:
+            sources: Path, columns, filters and read options of each dataset
+            timer: Timer collecting the per-stage durations of the request
+            objects: Metadata of the datasets, by path (see _stat_datasets)
+            
+        Returns:
+            The shared dataset, the read statistics and whether the dataset cache was
+            hit, for each source. Every dataset must be passed to dataset_cache.release
+            
+        Raises:
+            ProcessingError: If a dataset cannot be loaded
+        """
+        with timer.stage("load"):
+            fetched = await asyncio.gather(
+                *(
+                    self._fetch_dataset(*source, objects.get(source[0]))
+                    for source in sources
+                ),
+                return_exceptions=True
+            )
+        
+        errors = [result for result in fetched if isinstance(result, BaseException)]
+        if errors:
+            for result in fetched:
+                if not isinstance(result, BaseException):
+                    dataset_cache.release(result[0])
+            if isinstance(errors[0], ValueError):
+                raise ProcessingError(
+                    status_code=404,
+                    detail={"error": str(errors[0])}
+                )
+            raise errors[0]
+        
+        # Cached datasets report the statistics of the read that filled the cache,
+        # with the bytes mapped from the cache instead of downloaded
+        loaded = [
+            (
+                dataset,
+                {
+                    **dataset.read_stats,
+                    "bytes_transferred": 0,
+                    "bytes_from_cache": dataset.nbytes
+                },
+                True,
+            )
+            if dataset is not None else None
+            for dataset, *_ in fetched
+        ]
+        try:
+            for index, (path, columns, filters, read_options) in enumerate(sources):
+                if loaded[index] is not None:
+                    continue
+                
+                # Hand the table to the sandbox through shared memory
+                _, etag, table, file_extension, read_stats = fetched[index]
+                fetched[index] = None
+                with timer.stage("share"):
+                    dataset = await execution_pool.run_io(
+                        dataset_cache.store,
+                        path,
+                        etag,
+                        table,
+                        file_extension,
+                        read_stats,
+                        columns=columns,
+                        filters=filters,
+                        **read_options
+                    )
+                del table
+                loaded[index] = (dataset, read_stats, False)
+        except BaseException:
+            for result in loaded:
+                if result is not None:
+                    dataset_cache.release(result[0])
+            raise
+        return loaded
+    
+    async def _fetch_dataset(
+        self,
+        path: str,
+        columns: Optional[List[str]] = None,
+        filters: Optional[Filters] = None,
+        read_options: Optional[Dict[str, Any]] = None,
+        stat: Optional[Object] = None
+    ) -> Tuple[
+        Optional[CachedDataset],
+        str,
+        Optional[pa.Table],
+        Optional[str],
+        Optional[Dict[str, int]]
+    ]:
+        """
+        Find a dataset in the dataset cache, or download and decode it.
+        
+        Args:
+            path: Path to the dataset in MinIO (bucket/object)
+            columns: Columns to load (all columns if omitted)
+            filters: Row filters in disjunctive normal form
+            read_options: Dtype backend, engine and column types of text datasets
+            stat: Metadata of the object, stat'ed again if omitted
+            
+        Returns:
+            Tuple containing the acquired cached dataset (None on a miss), the ETag of
+            the object and, on a miss, the table, its format and the read statistics
+        """
+        read_options = read_options or {}
+        dataset, etag = await execution_pool.run_io(
+            dataset_cache.lookup,
+            path,
+            columns=columns,
+            filters=filters,
+            etag=stat.etag if stat is not None else None,
+            **read_options
+        )
+        if dataset is not None:
+            return dataset, etag, None, None, None
+        table, file_extension, read_stats = await execution_pool.run_io(
+            minio_client.load_table,
+            path,
+            columns=columns,
+            filters=filters,
+            etag=etag,
+            size=stat.size if stat is not None else None,
+            **read_options
+        )
+        return None, etag, table, file_extension, read_stats
+    
+    def _input_metadata(
+        self,
+        request: ProcessRequest,
+        input_names: List[str],
+        inputs: List[Tuple[CachedDataset, Dict[str, int], bool]]
+    ) -> Dict[str, Dict[str, Any]]:
+        """Path, format, read statistics and cache hit of each additional input."""
+        return {
+            name: {
+                "path": request.inputs[name],
+                "input_format": dataset.file_extension,
+                **read_stats,
+                "dataset_cache_hit": cache_hit,
+            }
+            for name, (dataset, read_stats, cache_hit) in zip(
+                input_names, inputs, strict=True
+            )
+        }
+    
+    async def _run_chunked_job(
+        self,
+        request: ProcessRequest,
+        timer: StageTimer,
+        objects: Dict[str, Object],
+        output_object: Optional[Tuple[str, str]] = None
+    ) -> Tuple[ProcessResponse, Optional[str]]:
+        """
+        Process a dataset one chunk at a time and append the results to a single
+        Parquet file.
+        
+        Only one chunk is held in memory at a time, so the 'process' function must be
+        row-wise: its result for a chunk cannot depend on rows of other chunks.
+        
+        Args:
+            request: The process request
+            timer: Timer collecting the per-stage durations of the request
+            objects: Metadata of the datasets, by path (see _stat_datasets)
+            output_object: Bucket and object name to save the result to
+            
+        Returns:
+            Tuple containing the response for the processed dataset and the ETag of
+            the result file
+        """
+        chunk_size = request.chunk_size or settings.DEFAULT_CHUNK_SIZE
+        read_options = self._read_options(request)
+        dtype_backend = read_options["dtype_backend"]
+        stat = objects.get(request.dataset_path)
+        try:
+            with timer.stage("load"):
+                chunks, file_extension, read_stats = await execution_pool.run_io(
+                    minio_client.open_table_chunks,
+                    request.dataset_path,
+                    chunk_size,
+                    columns=request.columns,
+                    filters=request.filters,
+                    etag=stat.etag if stat is not None else None,
+                    size=stat.size if stat is not None else None,
+                    dtype_backend=dtype_backend,
+                    engine=read_options["engine"],
+                    column_types=read_options["column_types"]
+                )
+        except ValueError as e:
+            raise ProcessingError(
+                status_code=404,
+                detail={"error": str(e)}
+            ) from e
+        
+        (
+            input_bucket, result_object_name, input_filename, timestamp
+        ) = self._result_location(request.dataset_path, output_object)
+        timeout = request.timeout or settings.DEFAULT_TIMEOUT
+        steps = request.pipeline()
+        checkpoints = [step.name for step in steps if step.checkpoint]
+        step_results = {
+            step.name: {
+                "name": step.name, "execution_time": 0.0, "rows": 0, "columns": []
+            }
+            for step in steps
+        }
+        num_chunks = 0
+        rows_in = 0
+        profiles: List[Dict[str, Any]] = []
+        execution_time = 0.0
+        peak_memory = 0
+        columns: List[str] = []
+        input_names = list(request.inputs or {})
+        inputs: List[Tuple[CachedDataset, Dict[str, int], bool]] = []
+        
+        try:
+            # Additional inputs are loaded in full once and passed to every chunk
+            if input_names:
+                inputs = await self._load_datasets(
+                    [
+                        (
+                            request.inputs[name],
+                            None,
+                            None,
+                            self._read_options(request, dataset=False)
+                        )
+                        for name in input_names
+                    ],
+                    timer,
+                    objects
+                )
+            input_paths = {
+                name: input_dataset.path
+                for name, (input_dataset, _, _) in zip(
+                    input_names, inputs, strict=True
+                )
+            }
+            
+            writer = await execution_pool.run_io(
+                minio_client.open_parquet_writer, input_bucket, result_object_name
+            )
+            checkpoint_writers = {}
+            try:
+                for name in checkpoints:
+                    checkpoint_writers[name] = await execution_pool.run_io(
+                        minio_client.open_parquet_writer,
+                        input_bucket,
+                        self._checkpoint_object(result_object_name, name)
+                    )
+                
+                while True:
+                    with timer.stage("load"):
+                        table = await execution_pool.run_io(next, chunks, None)
+                    if table is None:
+                        break
+                    
+                    input_path = None
+                    output_path = shared_table_store.allocate()
+                    checkpoint_paths = {
+                        name: shared_table_store.allocate() for name in checkpoints
+                    }
+                    try:
+                        with timer.stage("share"):
+                            input_path = await execution_pool.run_io(
+                                shared_table_store.write, table
+                            )
+                        del table
+                        
+                        with timer.stage("sandbox"):
+                            success, execution_result = await execution_pool.run_cpu(
+                                code_executor.execute_pipeline,
+                                job_timeout=timeout,
+                                job_cpu=request.max_cpu,
+                                tenant=request.tenant,
+                                steps=self._executor_steps(steps),
+                                input_path=input_path,
+                                output_path=output_path,
+                                timeout=timeout,
+                                max_memory=request.max_memory,
+                                checkpoint_paths=checkpoint_paths,
+                                input_paths=input_paths,
+                                dtype_backend=dtype_backend,
+                                max_cpu=request.max_cpu,
+                                profile=request.profile
+                            )
+                        
+                        if not success:
+                            detail = self._execution_error(execution_result)
+                            detail["error"] = f"Chunk {num_chunks}: {detail['error']}"
+                            if "profile" in detail:
+                                detail["profile"] = merge_profiles(
+                                    profiles + [detail["profile"]]
+                                )
+                            raise ProcessingError(
+                                status_code=500,
+                                detail=detail
+                            )
+                        self._record_worker_stages(timer, execution_result)
+                        
+                        result_table = shared_table_store.read(
+                            execution_result["result_path"]
+                        )
+                        checkpoint_tables = [
+                            shared_table_store.read(checkpoint_paths[name])
+                            for name in checkpoint_writers
+                        ]
+                        
+                        # The encoding of each file is chosen from the first chunk
+                        if num_chunks == 0:
+                            with timer.stage("encode"):
+                                encodings = await execution_pool.run_io(
+                                    self._choose_encodings,
+                                    request,
+                                    result_table,
+                                    checkpoint_tables
+                                )
+                            writer.encoding = encodings[0]
+                            for checkpoint_writer, encoding in zip(
+                                checkpoint_writers.values(), encodings[1:], strict=True
+                            ):
+                                checkpoint_writer.encoding = encoding
+                        
+                        # Append the chunk result to the output file, and the chunk
+                        # outputs of checkpoint steps to their files
+                        with timer.stage("save"):
+                            await execution_pool.run_io(writer.write, result_table)
+                            for checkpoint_writer, checkpoint_table in zip(
+                                checkpoint_writers.values(),
+                                checkpoint_tables,
+                                strict=True
+                            ):
+                                await execution_pool.run_io(
+                                    checkpoint_writer.write, checkpoint_table
+                                )
+                        del result_table, checkpoint_tables
+                    finally:
+                        shared_table_store.unlink(input_path)
+                        shared_table_store.unlink(output_path)
+                        for checkpoint_path in checkpoint_paths.values():
+                            shared_table_store.unlink(checkpoint_path)
+                    
+                    for step_result in execution_result["steps"]:
+                        totals = step_results[step_result["name"]]
+                        totals["execution_time"] += step_result["execution_time"]
+                        totals["rows"] += step_result["rows"]
+                        totals["columns"] = step_result["columns"]
+                    num_chunks += 1
+                    rows_in += execution_result["input_rows"]
+                    if "profile" in execution_result:
+                        profiles.append(execution_result["profile"])
+                    execution_time += execution_result["execution_time"]
+                    peak_memory = max(peak_memory, execution_result["peak_memory"])
+                    columns = execution_result["columns"]
+                
+                if num_chunks == 0:
+                    raise ProcessingError(
+                        status_code=400,
+                        detail={"error": "The dataset has no data to process"}
+                    )
+                
+                with timer.stage("save"):
+                    result_path = await execution_pool.run_io(writer.close)
+                    for name, checkpoint_writer in checkpoint_writers.items():
+                        step_results[name]["parquet_path"] = (
+                            await execution_pool.run_io(checkpoint_writer.close)
+                        )
+            except BaseException:
+                writer.abort()
+                for checkpoint_writer in checkpoint_writers.values():
+                    checkpoint_writer.abort()
+                raise
+        except ValueError as e:
+            raise ProcessingError(
+                status_code=500,
+                detail={"error": str(e)}
+            ) from e
+        finally:
+            await execution_pool.run_io(chunks.close)
+            for input_dataset, _, _ in inputs:
+                dataset_cache.release(input_dataset)
+        
+        metadata = {
+            "input_path": request.dataset_path,
+            "input_format": file_extension,
+            "timestamp": timestamp,
+            "original_filename": input_filename,
+            "mode": "chunked",
+            "chunks": num_chunks,
+            "rows_in": rows_in,
+            "peak_memory_mb": round(peak_memory / (1024 * 1024), 1),
+            "dtype_backend": dtype_backend,
+            "encoding": writer.encoding.describe(),
+            **read_stats,
+            "timings": timer.as_dict()
+        }
+        if request.steps is not None:
+            metadata["steps"] = self._step_metadata(list(step_results.values()))
+        if request.profile:
+            metadata["profile"] = merge_profiles(profiles)
+        if input_names:
+            metadata["inputs"] = self._input_metadata(request, input_names, inputs)
+        
+        return ProcessResponse(
+            status="success",
+            parquet_path=result_path,
+            rows=writer.rows,
+            columns=columns,
+            execution_time=execution_time,
+            metadata=metadata
+        ), writer.etag
+    
+    async def _save_result(
+        self,
+        request: ProcessRequest,
+        execution_result: Dict[str, Any],
+        file_extension: str,
+        read_stats: Dict[str, int],
+        timer: StageTimer,
+        output_object: Optional[Tuple[str, str]] = None
+    ) -> Tuple[ProcessResponse, Optional[str]]:
+        """
+        Save the shared result table of a job to MinIO and build the response.
+        
+        Args:
+            request: The process request
+            execution_result: Execution details returned by the sandbox worker
+            file_extension: Format of the input dataset
+            read_stats: Statistics of the dataset read
+            timer: Timer collecting the per-stage durations of the request
+            output_object: Bucket and object name to save the result to
+            
+        Returns:
+            Tuple containing the response for the processed dataset and the ETag of
+            the result file
+        """
+        (
+            input_bucket, result_object_name, input_filename, timestamp
+        ) = self._result_location(request.dataset_path, output_object)
+        
+        step_results = execution_result["steps"]
+        checkpoint_steps = [step for step in step_results if "result_path" in step]
+        result_table = self._read_result(execution_result["result_path"])
+        checkpoint_tables = [
+            self._read_result(step["result_path"]) for step in checkpoint_steps
+        ]
+        
+        # Choose the Parquet encoding of each file from a sample of its rows
+        with timer.stage("encode"):
+            encoding, *checkpoint_encodings = await execution_pool.run_io(
+                self._choose_encodings, request, result_table, checkpoint_tables
+            )
+        
+        # Save the result table, and the outputs of checkpoint steps, to MinIO; the
+        # uploads run on the event loop, only the encoding takes a thread
+        with timer.stage("save"):
+            result, *checkpoint_results = await asyncio.gather(
+                async_minio_client.save_table(
+                    result_table,
+                    bucket_name=input_bucket,
+                    object_name=result_object_name,
+                    encoding=encoding
+                ),
+                *(
+                    async_minio_client.save_table(
+                        checkpoint_table,
+                        bucket_name=input_bucket,
+                        object_name=self._checkpoint_object(
+                            result_object_name, step["name"]
+                        ),
+                        encoding=checkpoint_encoding
+                    )
+                    for step, checkpoint_table, checkpoint_encoding in zip(
+                        checkpoint_steps,
+                        checkpoint_tables,
+                        checkpoint_encodings,
+                        strict=True
+                    )
+                )
+            )
+        for step, checkpoint_result in zip(
+            checkpoint_steps, checkpoint_results, strict=True
+        ):
+            step["parquet_path"] = (
+                f"{checkpoint_result.bucket_name}/{checkpoint_result.object_name}"
+            )
+        
+        # Create the response
+        metadata = {
+            "input_path": request.dataset_path,
+            "input_format": file_extension,
+            "timestamp": timestamp,
+            "original_filename": input_filename,
+            "rows_in": execution_result["input_rows"],
+            "peak_memory_mb": round(execution_result["peak_memory"] / (1024 * 1024), 1),
+            "dtype_backend": self._dtype_backend(request),
+            "encoding": encoding.describe(),
+            **read_stats,
+            "timings": timer.as_dict()
+        }
+        if request.steps is not None:
+            metadata["steps"] = self._step_metadata(step_results)
+        
+        return ProcessResponse(
+            status="success",
+            parquet_path=f"{result.bucket_name}/{result.object_name}",
+            rows=execution_result["rows"],
+            columns=execution_result["columns"],
+            execution_time=execution_result["execution_time"],
+            metadata=metadata
+        ), result.etag
+    
+    def _choose_encodings(
+        self,
+        request: ProcessRequest,
+        result_table: pa.Table,
+        checkpoint_tables: List[pa.Table]
+    ) -> List[ParquetEncoding]:
+        """
+        Choose the encoding of the result file and of the checkpoint files of a job.
+        
+        column_encodings must name columns of the result; checkpoints apply the
+        entries for the columns they have.
+        
+        Args:
+            request: The process request
+            result_table: The result table
+            checkpoint_tables: The outputs of the checkpoint steps
+            
+        Returns:
+            The encoding of the result file, followed by those of the checkpoints
+            
+        Raises:
+            ProcessingError: If column_encodings names unknown columns
+        """
+        try:
+            encoding = choose_encoding(result_table, request.output)
+        except ValueError as e:
+            raise ProcessingError(
+                status_code=400,
+                detail={"error": str(e)}
+            ) from e
+        return [encoding] + [
+            choose_encoding(table, request.output, check_columns=False)
+            for table in checkpoint_tables
+        ]
+    
+    def _record_worker_stages(
+        self, timer: StageTimer, execution_result: Dict[str, Any]
+    ) -> None:
+        """
+        Record the stages of a successful sandbox run: converting the inputs to
+        DataFrames, running the user code and writing the outputs to shared memory.
+        """
+        timer.record("convert", execution_result["convert_time"])
+        timer.record("execute", execution_result["execution_time"])
+        timer.record("write", execution_result["write_time"])
+    
+    def _execution_error(self, execution_result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Error details of a failed execution, naming the failed step of a pipeline
+        and with the profile of a profiled job up to the failure.
+        """
+        detail = {"error": execution_result["error"]}
+        if "step" in execution_result:
+            detail["step"] = execution_result["step"]
+        if "profile" in execution_result:
+            detail["profile"] = execution_result["profile"]
+        return detail
+    
+    def _step_metadata(
+        self, step_results: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Per-step execution time, output size and checkpoint file of a pipeline."""
+        return [
+            {
+                "name": step["name"],
+                "execution_time": round(step["execution_time"], 6),
+                "rows": step["rows"],
+                "columns": step["columns"],
+                **(
+                    {"parquet_path": step["parquet_path"]}
+                    if "parquet_path" in step else {}
+                )
+            }
+            for step in step_results
+        ]
+    
+    def _checkpoint_object(self, result_object_name: str, step_name: str) -> str:
+        """Object the output of a checkpoint step is saved to, next to the result."""
+        stem = result_object_name
+        if stem.endswith(".parquet"):
+            stem = stem[:-len(".parquet")]
+        return f"{stem}_checkpoints/{step_name}.parquet"
+    
+    def _dtype_backend(self, request: ProcessRequest) -> str:
+        """Dtype backend of a job: the requested one or the server default."""
+        return request.dtype_backend or settings.DTYPE_BACKEND
+    
+    def _read_options(
+        self, request: ProcessRequest, dataset: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Options text and Excel datasets of a job are parsed with.
+        
+        Args:
+            request: The process request
+            dataset: Whether the options are for the dataset rather than an additional
+                input; explicit column types, sheet and cell range only apply to the
+                dataset
+            
+        Returns:
+            Keyword arguments dtype_backend, engine, column_types, sheet and cell_range
+            of the readers
+        """
+        dtype_backend = self._dtype_backend(request)
+        input_options = request.input or InputOptions()
+        engine = input_options.engine or (
+            "pyarrow" if dtype_backend == "pyarrow" else settings.TEXT_ENGINE
+        )
+        return {
+            "dtype_backend": dtype_backend,
+            "engine": engine,
+            "column_types": input_options.column_types if dataset else None,
+            "sheet": input_options.sheet if dataset else None,
+            "cell_range": input_options.cell_range if dataset else None,
+        }
+    
+    def _cache_options(self, request: ProcessRequest) -> Dict[str, Any]:
+        """Request options that change the result of a job, as part of its cache key."""
+        options = {
+            "mode": request.mode,
+            "chunk_size": (
+                request.chunk_size or settings.DEFAULT_CHUNK_SIZE
+                if request.mode == "chunked" else None
+            ),
+            "columns": request.columns,
+            "filters": request.filters,
+            "partition_by": request.partition_by,
+            **self._read_options(request),
+            "output": (
+                request.output.model_dump() if request.output is not None else None
+            ),
+        }
+        if request.steps is not None:
+            # Step names and checkpoints appear in the response
+            options["steps"] = [
+                [
+                    step.name,
+                    step.checkpoint,
+                    step.catch22.model_dump() if step.catch22 else None
+                ]
+                for step in request.steps
+            ]
+        if request.catch22 is not None:
+            options["catch22"] = request.catch22.model_dump()
+        return options
+    
+    def _cache_key(
+        self, request: ProcessRequest, objects: Dict[str, Object]
+    ) -> Optional[str]:
+        """
+        Build the cache key of a request from the versions of its datasets.
+        
+        Args:
+            request: The process request
+            objects: Metadata of the datasets, by path (see _stat_datasets)
+            
+        Returns:
+            The cache key, or None if a dataset cannot be found
+        """
+        def version(path: str) -> str:
+            return objects[path].version_id or objects[path].etag
+        
+        if any(path not in objects for path in self._dataset_paths(request)):
+            # Missing datasets are reported by the load stage
+            return None
+        options = self._cache_options(request)
+        if request.inputs:
+            options["inputs"] = {
+                name: [path, version(path)] for name, path in request.inputs.items()
+            }
+        # Built-in steps have no code; their options are part of the cache options
+        if request.steps is not None:
+            code = [step.code or "" for step in request.steps]
+        else:
+            code = request.code or ""
+        return result_cache.make_key(
+            request.dataset_path, version(request.dataset_path), code, options
+        )
+    
+    def _lookup_cached_result(
+        self, request: ProcessRequest, objects: Dict[str, Object]
+    ) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """
+        Find the result of an earlier identical job.
+        
+        Cached results whose file has been deleted or overwritten since are dropped.
+        
+        Args:
+            request: The process request
+            objects: Metadata of the datasets, by path (see _stat_datasets)
+            
+        Returns:
+            Tuple containing the cache key and the cached response, or None if there is
+            no usable cached result
+        """
+        cache_key = self._cache_key(request, objects)
+        if cache_key is None:
+            return None, None
+        cached = result_cache.get(cache_key, validate=self._result_unchanged)
+        return cache_key, cached
+    
+    def _result_unchanged(self, cached: Dict[str, Any]) -> bool:
+        """Check that the file of a cached result still holds that result."""
+        try:
+            etag = minio_client.object_stat(cached["parquet_path"]).etag
+        except ValueError:
+            return False
+        return cached.get("result_etag") in (None, etag)
+    
+    def _store_result(
+        self, cache_key: str, response: ProcessResponse, result_etag: Optional[str]
+    ) -> None:
+        """
+        Cache the response of a job.
+        
+        The datasets are only read at the ETags the cache key was built from, so the
+        result is always stored under the key of the versions it was computed from.
+        
+        Args:
+            cache_key: Cache key computed before the job ran
+            response: The response of the job
+            result_etag: ETag of the result file; results saved to a requested
+                location can be overwritten by later jobs, which the ETag detects
+        """
+        result_cache.put(
+            cache_key, {**response.model_dump(), "result_etag": result_etag}
+        )
+    
+    def _result_location(
+        self, dataset_path: str, output_object: Optional[Tuple[str, str]] = None
+    ) -> Tuple[str, str, str, int]:
+        """
+        Choose where the result of a job is saved.
+        
+        Args:
+            dataset_path: Path to the input dataset in MinIO (bucket/object)
+            output_object: Bucket and object name requested by the caller, if any
+            
+        Returns:
+            Tuple containing the bucket name, the result object name, the input file
+            name and the timestamp
+        """
+        # Generate a unique name for the result file
+        timestamp = int(time.time())
+        unique_id = str(uuid.uuid4())[:8]
+        
+        # Extract bucket name and object name from the input path
+        input_bucket, input_object = dataset_path.split("/", 1)
+        
+        # Create a directory structure similar to the input path
+        input_dir = os.path.dirname(input_object)
+        input_filename = os.path.basename(input_object).split(".")[0]
+        
+        if output_object is not None:
+            return output_object[0], output_object[1], input_filename, timestamp
+        
+        # Create the output path
+        result_filename = f"{input_filename}_{timestamp}_{unique_id}.parquet"
+        if input_dir:
+            result_object_name = f"{input_dir}/processed/{result_filename}"
+        else:
+            result_object_name = f"processed/{result_filename}"
+        
+        return input_bucket, result_object_name, input_filename, timestamp
+
+
+# Singleton instance
+processing_service = ProcessingService()
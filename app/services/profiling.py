@@ -0,0 +1,225 @@
+import cProfile
+import pstats
+import sysconfig
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+
+# File name of compiled user code, distinct from the "<string>" of code that
+# libraries generate with exec and eval
+USER_CODE_FILENAME = "<user code>"
+
+# Directories trimmed from the file names of the report
+_PATH_PREFIXES = sorted(
+    {path for path in sysconfig.get_paths().values() if path},
+    key=len,
+    reverse=True,
+)
+
+# Fields of the functions of a profile summed over steps and runs
+_FUNCTION_TOTALS = ("calls", "primitive_calls", "total_time", "cumulative_time")
+
+# Step (user code only), file, line and name of a profiled function
+_FunctionKey = Tuple[Optional[str], str, int, str]
+
+
+class CallProfiler:
+    """
+    Profiles the user code of the steps of a pipeline in a sandbox worker.
+
+    Each step is run under cProfile, which times every function call, and
+    tracemalloc, which records the Python and NumPy allocations with their
+    tracebacks. Functions and allocation sites in user code are reported by
+    step, since every step defines its own process function; those in libraries
+    are summed over the steps. Both tools slow the code down, allocation-heavy
+    code the most, so the times are only meaningful relative to each other.
+    Allocations made by Arrow are not traced.
+    """
+
+    def __init__(self):
+        self._profiles: Dict[str, cProfile.Profile] = {}
+        self._allocations: Dict[Tuple[Optional[str], str, int], List[int]] = {}
+        self.peak_bytes = 0
+
+    @contextmanager
+    def step(self, name: str) -> Iterator[None]:
+        """
+        Profile the code run within the context as the step name.
+
+        Timeouts, CPU and memory limits raise through the context; the profile up
+        to that point is kept.
+        """
+        profile = self._profiles.setdefault(name, cProfile.Profile())
+        tracemalloc.start(settings.PROFILE_TRACEMALLOC_FRAMES)
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            try:
+                _, peak = tracemalloc.get_traced_memory()
+                self.peak_bytes = max(self.peak_bytes, peak)
+                snapshot = tracemalloc.take_snapshot()
+            except MemoryError:
+                snapshot = None
+            finally:
+                tracemalloc.stop()
+            if snapshot is not None:
+                self._add_allocations(name, snapshot)
+
+    def _add_allocations(self, step: str, snapshot: tracemalloc.Snapshot) -> None:
+        """Add the blocks still allocated at the end of a step, by allocation site."""
+        for trace in snapshot.traces:
+            site = _allocation_site(trace.traceback)
+            if site is None:
+                continue
+            filename, line = site
+            key = (step if filename == USER_CODE_FILENAME else None, filename, line)
+            totals = self._allocations.setdefault(key, [0, 0])
+            totals[0] += trace.size
+            totals[1] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Summarize the profile.
+
+        Returns:
+            The top PROFILE_TOP_FUNCTIONS functions by cumulative time, the top
+            PROFILE_TOP_ALLOCATIONS allocation sites by size of the blocks still
+            allocated when the steps returned, and the peak traced memory
+        """
+        functions: Dict[_FunctionKey, Dict[str, Any]] = {}
+        for step, profile in self._profiles.items():
+            for (filename, line, name), totals in pstats.Stats(profile).stats.items():
+                primitive_calls, calls, total_time, cumulative_time, _ = totals
+                if name == "<method 'disable' of '_lsprof.Profiler' objects>":
+                    continue
+                function = {
+                    "function": name,
+                    "file": _short_path(filename),
+                    "line": line,
+                    "calls": calls,
+                    "primitive_calls": primitive_calls,
+                    "total_time": total_time,
+                    "cumulative_time": cumulative_time,
+                }
+                if filename == USER_CODE_FILENAME:
+                    function["step"] = step
+                _add_function(functions, function)
+        allocations = []
+        for (step, filename, line), (size, count) in self._allocations.items():
+            allocation = {
+                "file": _short_path(filename),
+                "line": line,
+                "size_bytes": size,
+                "count": count,
+            }
+            if step is not None:
+                allocation["step"] = step
+            allocations.append(allocation)
+        return _summary(list(functions.values()), allocations, self.peak_bytes)
+
+
+def merge_profiles(profiles: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Combine the profile summaries of the sandbox runs of a job.
+
+    The runs of map and chunked jobs are profiled separately. Their functions and
+    allocation sites are summed, so a function that is not among the top
+    functions of every run is undercounted. The peak is that of the largest run.
+
+    Args:
+        profiles: Summaries returned by CallProfiler.summary
+
+    Returns:
+        The combined summary, or None if there is none
+    """
+    if not profiles:
+        return None
+    if len(profiles) == 1:
+        return profiles[0]
+
+    functions: Dict[_FunctionKey, Dict[str, Any]] = {}
+    allocations: Dict[Tuple[Optional[str], str, int], Dict[str, Any]] = {}
+    for profile in profiles:
+        for function in profile["functions"]:
+            _add_function(functions, function)
+        for allocation in profile["allocations"]:
+            key = (allocation.get("step"), allocation["file"], allocation["line"])
+            merged = allocations.setdefault(
+                key, {**allocation, "size_bytes": 0, "count": 0}
+            )
+            merged["size_bytes"] += allocation["size_bytes"]
+            merged["count"] += allocation["count"]
+    return {
+        **_summary(
+            list(functions.values()),
+            list(allocations.values()),
+            max(profile["peak_traced_bytes"] for profile in profiles),
+        ),
+        "runs": len(profiles),
+    }
+
+
+def _add_function(
+    functions: Dict[_FunctionKey, Dict[str, Any]], function: Dict[str, Any]
+) -> None:
+    """Add the calls and times of a function to those of the same function."""
+    key = (
+        function.get("step"), function["file"], function["line"], function["function"]
+    )
+    merged = functions.setdefault(
+        key, {**function, **dict.fromkeys(_FUNCTION_TOTALS, 0)}
+    )
+    for field in _FUNCTION_TOTALS:
+        merged[field] += function[field]
+
+
+def _summary(
+    functions: List[Dict[str, Any]], allocations: List[Dict[str, Any]], peak_bytes: int
+) -> Dict[str, Any]:
+    """The top functions and allocation sites of a profile."""
+    functions = _top(functions, "cumulative_time", settings.PROFILE_TOP_FUNCTIONS)
+    for function in functions:
+        function["total_time"] = round(function["total_time"], 6)
+        function["cumulative_time"] = round(function["cumulative_time"], 6)
+    return {
+        "functions": functions,
+        "allocations": _top(
+            allocations, "size_bytes", settings.PROFILE_TOP_ALLOCATIONS
+        ),
+        "peak_traced_bytes": peak_bytes,
+    }
+
+
+def _allocation_site(traceback: tracemalloc.Traceback) -> Optional[Tuple[str, int]]:
+    """
+    The line an allocation is attributed to: the innermost line of user code in
+    its traceback, or else the innermost line that is not part of the profiler.
+    """
+    site = None
+    # Frames are ordered from the oldest to the most recent
+    for frame in traceback:
+        if frame.filename == USER_CODE_FILENAME:
+            site = (frame.filename, frame.lineno)
+    if site is not None:
+        return site
+    frame = traceback[-1] if len(traceback) else None
+    if frame is None or frame.filename in (tracemalloc.__file__, __file__):
+        return None
+    return frame.filename, frame.lineno
+
+
+def _short_path(filename: str) -> str:
+    """File name relative to the installation directories of Python and its packages."""
+    for prefix in _PATH_PREFIXES:
+        if filename.startswith(prefix + "/"):
+            return filename[len(prefix) + 1:]
+    return filename
+
+
+def _top(entries: List[Dict[str, Any]], field: str, count: int) -> List[Dict[str, Any]]:
+    """The count entries with the largest field."""
+    return sorted(entries, key=lambda entry: entry[field], reverse=True)[:count]
@@ -0,0 +1,293 @@
+import ast
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from app.core.config import settings
+
+
+def code_fingerprint(code: str) -> str:
+    """
+    Hash the normalized AST of a piece of code.
+
+    Comments, blank lines and formatting do not change the AST, so code that only
+    differs in those gets the same fingerprint.
+
+    Args:
+        code: Python source code
+
+    Returns:
+        Hex SHA-256 digest of the AST dump
+    """
+    tree = ast.parse(code)
+    normalized = ast.dump(tree, annotate_fields=False, include_attributes=False)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class CacheBackend(ABC):
+    """
+    Storage of cache entries with LRU and TTL eviction.
+
+    Subclasses store JSON-serializable values under string keys. Entries older than
+    ttl seconds are dropped when they are read, and the least recently used entries
+    are evicted once there are more than max_entries.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the value stored under a key, or None if it is missing or expired."""
+
+    @abstractmethod
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Store a value under a key, evicting the least recently used entries."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove the entry of a key, if any."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove every entry."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of entries stored."""
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl > 0 and time.time() - created_at > self.ttl
+
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process cache backend; entries are lost when the service restarts."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        super().__init__(max_entries, ttl)
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created_at, value = entry
+            if self._expired(created_at):
+                del self._entries[key]
+                self.evictions += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Cache backend indexed in a local SQLite file.
+
+    Entries survive restarts and are shared by all service processes on the host.
+    """
+
+    def __init__(self, path: str, max_entries: int, ttl: float):
+        super().__init__(max_entries, ttl)
+        self.path = path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS results_accessed_at "
+                "ON results (accessed_at)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, created_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self._expired(created_at):
+                conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                self.evictions += 1
+                return None
+            conn.execute(
+                "UPDATE results SET accessed_at = ? WHERE key = ?", (time.time(), key)
+            )
+            return json.loads(value)
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            evicted = conn.execute(
+                "DELETE FROM results WHERE key IN ("
+                "SELECT key FROM results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+            self.evictions += max(evicted, 0)
+
+    def delete(self, key: str) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM results WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM results")
+
+    def __len__(self) -> int:
+        with self._lock, self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+class ResultCache:
+    """
+    Content-addressed cache of job results.
+
+    A result is keyed by the dataset path and version (ETag, or version ID on
+    versioned buckets), the fingerprint of the code and the request options that
+    change the result. The cached value is the response of the job, whose
+    parquet_path points at the result file that was already written.
+    """
+
+    def __init__(self):
+        self.enabled = settings.RESULT_CACHE_BACKEND != "none"
+        self.hits = 0
+        self.misses = 0
+        self._backend: Optional[CacheBackend] = None
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self) -> CacheBackend:
+        with self._lock:
+            if self._backend is None:
+                if settings.RESULT_CACHE_BACKEND == "sqlite":
+                    self._backend = SQLiteCacheBackend(
+                        settings.RESULT_CACHE_PATH,
+                        settings.RESULT_CACHE_MAX_ENTRIES,
+                        settings.RESULT_CACHE_TTL,
+                    )
+                else:
+                    self._backend = MemoryCacheBackend(
+                        settings.RESULT_CACHE_MAX_ENTRIES,
+                        settings.RESULT_CACHE_TTL,
+                    )
+            return self._backend
+
+    @staticmethod
+    def make_key(
+        dataset_path: str,
+        version: str,
+        code: Union[str, List[str]],
+        options: Dict[str, Any],
+    ) -> str:
+        """
+        Build the cache key of a job.
+
+        Args:
+            dataset_path: Path of the input dataset (bucket/object)
+            version: Version of the input object (ETag or version ID)
+            code: Code of the job, or the code of each step of a pipeline
+            options: Request options that affect the result
+
+        Returns:
+            Hex SHA-256 digest identifying the job
+        """
+        if isinstance(code, str):
+            fingerprint: Union[str, List[str]] = code_fingerprint(code)
+        else:
+            fingerprint = [code_fingerprint(step_code) for step_code in code]
+        material = json.dumps(
+            [dataset_path, version, fingerprint, options],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(
+        self,
+        key: str,
+        validate: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Look up a result, counting the hit or miss.
+
+        Args:
+            key: Cache key from make_key
+            validate: Optional check of a cached value; values that fail it are
+                dropped and counted as a miss
+
+        Returns:
+            The cached response, or None
+        """
+        value = self.backend.get(key)
+        if value is not None and validate is not None and not validate(value):
+            self.invalidate(key)
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        """Store the response of a job."""
+        self.backend.set(key, value)
+
+    def invalidate(self, key: str) -> None:
+        """Drop a result, e.g. because its file no longer exists."""
+        self.backend.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the hit and miss counters and the size of the cache."""
+        lookups = self.hits + self.misses
+        return {
+            "backend": settings.RESULT_CACHE_BACKEND,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.backend.evictions if self.enabled else 0,
+            "entries": len(self.backend) if self.enabled else 0,
+        }
+
+
+# Singleton instance
+result_cache = ResultCache()
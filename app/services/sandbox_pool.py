@@ -0,0 +1,300 @@
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+import traceback
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.services.code_executor import code_executor, cpu_affinity, current_memory_usage
+from app.services.shared_tables import enable_copy_on_write
+
+# Modules imported once by the fork server, so every worker starts warm
+PRELOAD_MODULES = [
+    "pandas",
+    "numpy",
+    "pyarrow",
+    "pycatch22",
+    "app.services.code_executor",
+]
+
+# Seconds between checks of the cancellation event of a running job
+CANCEL_POLL_INTERVAL = 0.1
+
+
+class SandboxError(Exception):
+    """Exception raised when a sandbox worker fails to complete a job."""
+    pass
+
+
+def _warm_up() -> None:
+    """Run a trivial job so that lazily imported pandas internals load before jobs."""
+    import pandas as pd
+
+    code_executor.execute_code(
+        code="def process(df):\n    return df\n",
+        df=pd.DataFrame({"value": [1.0], "label": ["a"]}),
+    )
+
+
+def _worker_main(conn: Connection) -> None:
+    """
+    Main loop of a sandbox worker process.
+
+    Receives (function, args, kwargs, cores) messages, runs them in the main thread
+    so that signal-based limits work, pinned to the cores if any, and replies with
+    the outcome and the current resident set size of the worker.
+
+    Args:
+        conn: Connection to the parent process
+    """
+    # Interrupts are handled by the API server, which stops the workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    enable_copy_on_write()
+    _warm_up()
+    conn.send("ready")
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+
+        func, args, kwargs, cores = message
+        try:
+            with cpu_affinity(cores):
+                outcome: Tuple[Any, ...] = ("ok", func(*args, **kwargs))
+        except Exception as e:
+            outcome = ("error", f"{type(e).__name__}: {str(e)}", traceback.format_exc())
+
+        rss_bytes = current_memory_usage()[1]
+        try:
+            conn.send((outcome, rss_bytes))
+        except Exception as e:
+            # The result could not be pickled
+            error = f"Could not return the job result: {str(e)}"
+            conn.send((("error", error, ""), rss_bytes))
+
+
+class SandboxWorker:
+    """A pre-warmed worker process that runs one job at a time."""
+
+    def __init__(self, context: multiprocessing.context.BaseContext):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn,),
+            name="sandbox-worker",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.jobs_run = 0
+        self.rss_bytes = 0
+        self.ready = False
+
+    def wait_ready(self) -> None:
+        """Block until the worker has finished warming up."""
+        if not self.ready:
+            try:
+                self.conn.recv()
+            except (EOFError, OSError) as e:
+                raise SandboxError(
+                    "Sandbox worker failed to start "
+                    f"(exit code {self.process.exitcode})"
+                ) from e
+            self.ready = True
+
+    def run(
+        self,
+        func: Callable[..., Any],
+        args: Tuple[Any, ...],
+        kwargs: Dict[str, Any],
+        timeout: float,
+        cancel_event: Optional[threading.Event] = None,
+        cores: Optional[List[int]] = None,
+    ) -> Any:
+        """
+        Run a function in the worker and wait for its result.
+
+        Args:
+            func: Module-level function to run (pickled by reference)
+            args: Positional arguments
+            kwargs: Keyword arguments
+            timeout: Seconds to wait before the worker is killed
+            cancel_event: Event that, when set, kills the worker and abandons the job
+            cores: Cores the worker is pinned to while it runs the function
+
+        Returns:
+            The return value of the function
+
+        Raises:
+            SandboxError: If the job raised, timed out, was cancelled or the worker died
+        """
+        self.wait_ready()
+        self.jobs_run += 1
+        try:
+            self.conn.send((func, args, kwargs, cores))
+            deadline = time.monotonic() + timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if cancel_event is not None:
+                    remaining = min(remaining, CANCEL_POLL_INTERVAL)
+                if self.conn.poll(max(remaining, 0)):
+                    break
+                if cancel_event is not None and cancel_event.is_set():
+                    self.kill()
+                    raise SandboxError(
+                        "Job was cancelled and its sandbox worker was killed"
+                    )
+                if time.monotonic() >= deadline:
+                    self.kill()
+                    raise SandboxError(
+                        f"Sandbox worker did not respond within {timeout:g} seconds "
+                        "and was killed"
+                    )
+            outcome, self.rss_bytes = self.conn.recv()
+        except (EOFError, OSError, BrokenPipeError) as e:
+            self.process.join(timeout=1)
+            raise SandboxError(
+                "Sandbox worker exited unexpectedly "
+                f"(exit code {self.process.exitcode})"
+            ) from e
+
+        if outcome[0] == "error":
+            raise SandboxError(outcome[1])
+        return outcome[1]
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+
+    def stop(self) -> None:
+        """Ask the worker to exit, killing it if it does not."""
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.kill()
+        self.conn.close()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join(timeout=1)
+
+
+class SandboxPool:
+    """
+    Pool of pre-forked sandbox worker processes.
+
+    Workers are forked from a fork server that has already imported pandas, numpy
+    and pycatch22, so the import cost is paid once rather than per job. Each job
+    runs in a single worker, which applies that job's resource limits and restores
+    them afterwards. A worker is replaced after SANDBOX_MAX_JOBS_PER_WORKER jobs,
+    when its RSS grows past SANDBOX_MAX_WORKER_RSS_MB, or when it dies or times out.
+    """
+
+    def __init__(self):
+        self.size = settings.EXECUTION_WORKERS
+        self.max_jobs_per_worker = settings.SANDBOX_MAX_JOBS_PER_WORKER
+        self.max_worker_rss_bytes = settings.SANDBOX_MAX_WORKER_RSS_MB * 1024 * 1024
+        self._context: Optional[multiprocessing.context.BaseContext] = None
+        self._idle: "queue.Queue[SandboxWorker]" = queue.Queue()
+        self._workers: Set[SandboxWorker] = set()
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start the fork server and pre-fork the workers, if not already done."""
+        with self._lock:
+            if self._context is not None:
+                return
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(PRELOAD_MODULES)
+            self._context = context
+            workers = [self._spawn() for _ in range(self.size)]
+            for worker in workers:
+                worker.wait_ready()
+                self._idle.put(worker)
+
+    def run(
+        self,
+        func: Callable[..., Any],
+        args: Tuple[Any, ...] = (),
+        kwargs: Optional[Dict[str, Any]] = None,
+        timeout: float = settings.DEFAULT_TIMEOUT,
+        cancel_event: Optional[threading.Event] = None,
+        cores: Optional[List[int]] = None,
+    ) -> Any:
+        """
+        Run a function in the next idle worker, blocking until it completes.
+
+        Args:
+            func: Module-level function to run (pickled by reference)
+            args: Positional arguments
+            kwargs: Keyword arguments
+            timeout: Time limit of the job in seconds; the worker is killed if it
+                has not replied SANDBOX_KILL_GRACE seconds after it
+            cancel_event: Event that, when set, kills the worker and abandons the job
+            cores: Cores the worker is pinned to while it runs the function (see
+                app.services.cpu_scheduler)
+
+        Returns:
+            The return value of the function
+        """
+        self.start()
+        worker = self._idle.get()
+        try:
+            return worker.run(
+                func,
+                args,
+                kwargs or {},
+                timeout + settings.SANDBOX_KILL_GRACE,
+                cancel_event,
+                cores,
+            )
+        finally:
+            self._release(worker)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of workers and how many of them are idle."""
+        return {"workers": len(self._workers), "idle": self._idle.qsize()}
+
+    def shutdown(self) -> None:
+        """Stop all workers."""
+        with self._lock:
+            for worker in list(self._workers):
+                worker.stop()
+            self._workers.clear()
+            self._idle = queue.Queue()
+            self._context = None
+
+    def _spawn(self) -> SandboxWorker:
+        worker = SandboxWorker(self._context)
+        self._workers.add(worker)
+        return worker
+
+    def _release(self, worker: SandboxWorker) -> None:
+        """Return a worker to the pool, replacing it if it must be recycled."""
+        recycle = (
+            not worker.is_alive()
+            or worker.jobs_run >= self.max_jobs_per_worker
+            or worker.rss_bytes > self.max_worker_rss_bytes
+        )
+        if not recycle and self._context is not None:
+            self._idle.put(worker)
+            return
+
+        with self._lock:
+            self._workers.discard(worker)
+            worker.stop()
+            if self._context is not None:
+                self._idle.put(self._spawn())
+
+
+# Singleton instance
+sandbox_pool = SandboxPool()
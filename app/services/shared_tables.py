@@ -0,0 +1,147 @@
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from typing import Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+
+from app.core.config import settings
+
+
+def enable_copy_on_write() -> None:
+    """
+    Enable pandas copy-on-write (always on from pandas 3.0).
+
+    DataFrames built from memory-mapped tables wrap read-only buffers, so they
+    must only be copied when a column is actually modified.
+    """
+    if int(pd.__version__.split(".")[0]) < 3:
+        pd.set_option("mode.copy_on_write", True)
+
+
+def table_to_dataframe(table: pa.Table, dtype_backend: str = "numpy") -> pd.DataFrame:
+    """
+    Convert an Arrow table to a DataFrame, sharing memory where possible.
+
+    With the numpy backend each column gets its own block, so numeric columns
+    without nulls are zero-copy views of the Arrow buffers. With the pyarrow
+    backend every column is a pd.ArrowDtype column wrapping the Arrow array, so
+    strings and nullable columns are not converted to Python objects either.
+
+    Args:
+        table: Arrow table to convert
+        dtype_backend: "numpy" or "pyarrow"
+
+    Returns:
+        DataFrame backed by the table's buffers where possible
+    """
+    if dtype_backend == "pyarrow":
+        return table.to_pandas(types_mapper=pd.ArrowDtype, split_blocks=True)
+    return table.to_pandas(split_blocks=True)
+
+
+def dataframe_to_table(df: pd.DataFrame) -> pa.Table:
+    """
+    Convert a DataFrame to an Arrow table, keeping the pandas metadata.
+
+    Args:
+        df: DataFrame to convert
+
+    Returns:
+        Arrow table with the same data
+    """
+    return pa.Table.from_pandas(df)
+
+
+class SharedTableStore:
+    """
+    Exchanges Arrow tables between processes through memory-mapped IPC files.
+
+    Files live in a private directory under SHARED_MEMORY_DIR (/dev/shm by default,
+    so they are backed by RAM). Readers map a file read-only and get a table whose
+    buffers point into the mapping, so no process has to copy or unpickle the data.
+    """
+
+    def __init__(self):
+        self._directory: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self) -> str:
+        with self._lock:
+            if self._directory is None:
+                base_dir = settings.SHARED_MEMORY_DIR
+                if not os.path.isdir(base_dir):
+                    base_dir = tempfile.gettempdir()
+                self._directory = tempfile.mkdtemp(prefix="dataproc-", dir=base_dir)
+            return self._directory
+
+    def allocate(self) -> str:
+        """
+        Reserve a path for a new shared table.
+
+        Returns:
+            Path of a file that does not exist yet
+        """
+        return os.path.join(self.directory, f"{uuid.uuid4().hex}.arrow")
+
+    def write(
+        self, data: Union[pa.Table, pd.DataFrame], path: Optional[str] = None
+    ) -> str:
+        """
+        Write a table (or DataFrame) as an uncompressed Arrow IPC file.
+
+        Args:
+            data: Table or DataFrame to share
+            path: Destination path (a new one is allocated if omitted)
+
+        Returns:
+            Path of the written file
+        """
+        table = dataframe_to_table(data) if isinstance(data, pd.DataFrame) else data
+        path = path or self.allocate()
+        with pa.OSFile(path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        return path
+
+    @staticmethod
+    def read(path: str) -> pa.Table:
+        """
+        Map a shared table read-only.
+
+        The returned table references the mapping directly; it stays valid after
+        the file is unlinked.
+
+        Args:
+            path: Path of the Arrow IPC file
+
+        Returns:
+            Memory-mapped Arrow table
+        """
+        source = pa.memory_map(path, "r")
+        return pa.ipc.open_file(source).read_all()
+
+    @staticmethod
+    def unlink(path: Optional[str]) -> None:
+        """Remove a shared table file, ignoring files that are already gone."""
+        if path is None:
+            return
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def cleanup(self) -> None:
+        """Remove the shared table directory and any files left in it."""
+        with self._lock:
+            if self._directory is not None:
+                shutil.rmtree(self._directory, ignore_errors=True)
+                self._directory = None
+
+
+# Singleton instance
+shared_table_store = SharedTableStore()
@@ -0,0 +1,229 @@
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.json as pa_json
+
+from app.core.config import settings
+
+# Compression codecs of text datasets, by file suffix
+COMPRESSION_SUFFIXES = {"gz": "gzip", "gzip": "gzip", "zst": "zstd", "zstd": "zstd"}
+
+# Formats the text readers handle; jsonl and ndjson are newline-delimited JSON
+TEXT_FORMATS = ("csv", "json", "jsonl", "ndjson")
+
+# Formats that can be read one chunk at a time
+CHUNKED_TEXT_FORMATS = ("csv", "jsonl", "ndjson")
+
+
+def split_format(object_name: str) -> Tuple[str, Optional[str]]:
+    """
+    Find the format and compression of a dataset from its object name.
+
+    Args:
+        object_name: Name of the object, e.g. "exports/orders.csv.gz"
+
+    Returns:
+        Tuple containing the file extension and the compression codec of the
+        object, None if it is not compressed
+    """
+    suffixes = object_name.rsplit("/", 1)[-1].lower().split(".")
+    compression = COMPRESSION_SUFFIXES.get(suffixes[-1]) if len(suffixes) > 2 else None
+    if compression is not None:
+        suffixes.pop()
+    return suffixes[-1], compression
+
+
+def open_text_stream(source: Any, compression: Optional[str]) -> Any:
+    """Wrap an object response so that it is decompressed as it is read."""
+    if compression is None:
+        return source
+    return pa.CompressedInputStream(pa.PythonFile(source, mode="r"), compression)
+
+
+def arrow_schema(column_types: Optional[Dict[str, str]]) -> Optional[pa.Schema]:
+    """
+    Build the schema of explicit column types.
+
+    Args:
+        column_types: Arrow type name of each column, e.g. {"day": "date32"}
+
+    Returns:
+        The schema of the listed columns, or None if there are none
+    """
+    if not column_types:
+        return None
+    fields = []
+    for column, type_name in column_types.items():
+        try:
+            fields.append(pa.field(column, pa.type_for_alias(type_name)))
+        except (KeyError, ValueError) as e:
+            raise ValueError(f"Unknown type of column {column}: {type_name}") from e
+    return pa.schema(fields)
+
+
+def read_text_table(
+    stream: Any,
+    file_extension: str,
+    engine: str = "pandas",
+    dtype_backend: str = "numpy",
+    usecols: Optional[List[str]] = None,
+    column_types: Optional[Dict[str, str]] = None,
+) -> pa.Table:
+    """
+    Parse a whole CSV or JSON dataset into an Arrow table.
+
+    The pyarrow engine parses blocks of TEXT_BLOCK_SIZE_MB on all cores and infers
+    the type of each column from all of its values. JSON documents that are not
+    newline-delimited are always parsed by pandas.
+
+    Args:
+        stream: File object over the (decompressed) content of the dataset
+        file_extension: Format of the dataset
+        engine: Parser to use ("pandas" or "pyarrow")
+        dtype_backend: Dtypes the pandas parser produces ("numpy" or "pyarrow")
+        usecols: Columns to parse (all columns if omitted); only CSV parsers skip
+            the other columns
+        column_types: Explicit type of some columns, instead of the inferred one
+
+    Returns:
+        The parsed table
+    """
+    schema = arrow_schema(column_types)
+    if engine == "pyarrow" and file_extension == "csv":
+        return pa_csv.read_csv(stream, **_arrow_csv_options(usecols, schema))
+    if engine == "pyarrow" and file_extension in ["jsonl", "ndjson"]:
+        return cast_columns(pa_json.read_json(stream, **_arrow_json_options()), schema)
+
+    read_options = _pandas_options(dtype_backend, schema)
+    if file_extension == "csv":
+        df = pd.read_csv(stream, usecols=usecols, **read_options)
+    elif file_extension in ["jsonl", "ndjson"]:
+        df = pd.read_json(stream, lines=True, **read_options)
+    else:
+        df = pd.read_json(stream, **read_options)
+    return pa.Table.from_pandas(df)
+
+
+def iter_text_tables(
+    stream: Any,
+    file_extension: str,
+    chunk_size: int,
+    engine: str = "pandas",
+    dtype_backend: str = "numpy",
+    usecols: Optional[List[str]] = None,
+    column_types: Optional[Dict[str, str]] = None,
+) -> Iterator[pa.Table]:
+    """
+    Parse a CSV or newline-delimited JSON dataset chunk_size rows at a time.
+
+    The pyarrow engine infers the schema once, from the first block of
+    TEXT_BLOCK_SIZE_MB, and every chunk has that schema; columns whose first values
+    are not representative need an explicit type. The pandas engine infers the
+    types of every chunk separately.
+
+    Args:
+        stream: File object over the (decompressed) content of the dataset
+        file_extension: Format of the dataset ("csv", "jsonl" or "ndjson")
+        chunk_size: Number of rows per chunk
+        engine: Parser to use ("pandas" or "pyarrow")
+        dtype_backend: Dtypes the pandas parser produces ("numpy" or "pyarrow")
+        usecols: Columns to parse (all columns if omitted); only CSV parsers skip
+            the other columns
+        column_types: Explicit type of some columns, instead of the inferred one
+
+    Returns:
+        Iterator over the chunks as Arrow tables
+    """
+    schema = arrow_schema(column_types)
+    if engine == "pyarrow":
+        if file_extension == "csv":
+            reader = pa_csv.open_csv(stream, **_arrow_csv_options(usecols, schema))
+            yield from _rechunk(reader, chunk_size)
+        else:
+            reader = pa_json.open_json(stream, **_arrow_json_options())
+            for table in _rechunk(reader, chunk_size):
+                yield cast_columns(table, schema)
+        return
+
+    read_options = _pandas_options(dtype_backend, schema)
+    if file_extension == "csv":
+        reader = pd.read_csv(
+            stream, chunksize=chunk_size, usecols=usecols, **read_options
+        )
+    else:
+        reader = pd.read_json(
+            stream, lines=True, chunksize=chunk_size, **read_options
+        )
+    with reader:
+        for chunk in reader:
+            yield pa.Table.from_pandas(chunk, preserve_index=False)
+
+
+def _arrow_csv_options(
+    usecols: Optional[List[str]], schema: Optional[pa.Schema]
+) -> Dict[str, Any]:
+    return {
+        "read_options": pa_csv.ReadOptions(
+            block_size=settings.TEXT_BLOCK_SIZE_MB * 1024 * 1024
+        ),
+        "convert_options": pa_csv.ConvertOptions(
+            column_types=schema,
+            include_columns=usecols,
+        ),
+    }
+
+
+def _arrow_json_options() -> Dict[str, Any]:
+    return {
+        "read_options": pa_json.ReadOptions(
+            block_size=settings.TEXT_BLOCK_SIZE_MB * 1024 * 1024
+        ),
+    }
+
+
+def cast_columns(table: pa.Table, schema: Optional[pa.Schema]) -> pa.Table:
+    """
+    Cast columns of a parsed table to their explicit types.
+
+    Used where the parser cannot take the types itself: the pyarrow JSON parser
+    rejects values that do not match an explicit schema (e.g. numbers in a string
+    column) instead of converting them.
+    """
+    for field in schema or []:
+        index = table.schema.get_field_index(field.name)
+        if index >= 0 and table.schema.field(index).type != field.type:
+            table = table.set_column(index, field, table.column(index).cast(field.type))
+    return table
+
+
+def _pandas_options(dtype_backend: str, schema: Optional[pa.Schema]) -> Dict[str, Any]:
+    """Keyword arguments of the pandas readers."""
+    read_options: Dict[str, Any] = {}
+    if dtype_backend == "pyarrow":
+        read_options["dtype_backend"] = "pyarrow"
+    if schema is not None:
+        read_options["dtype"] = {
+            field.name: pd.ArrowDtype(field.type) for field in schema
+        }
+    return read_options
+
+
+def _rechunk(
+    batches: Iterator[pa.RecordBatch], chunk_size: int
+) -> Iterator[pa.Table]:
+    """Regroup the record batches of a streaming reader into chunk_size row tables."""
+    pending: List[pa.RecordBatch] = []
+    pending_rows = 0
+    for batch in batches:
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        while pending_rows >= chunk_size:
+            table = pa.Table.from_batches(pending)
+            yield table.slice(0, chunk_size)
+            rest = table.slice(chunk_size)
+            pending = rest.to_batches()
+            pending_rows = rest.num_rows
+    if pending_rows:
+        yield pa.Table.from_batches(pending)
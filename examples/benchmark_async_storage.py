@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Compare the blocking and asyncio MinIO clients of the Data Preprocessing Microservice.
+Each variant stats, downloads and uploads the same objects with a given concurrency:
+the blocking client from a thread pool of that size, the async client from one event
+loop. The results of both clients are checked to be identical.
+
+By default the MinIO server of the settings is used (MINIO_ENDPOINT etc.). With
+--fake, an in-process S3 server (moto) is started instead, so the script also runs
+without MinIO.
+
+Usage:
+    python examples/benchmark_async_storage.py [--objects 64] [--size-mb 4] \
+        [--concurrency 32] [--fake]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+BUCKET = "benchmark-async"
+
+
+def start_fake_s3() -> None:
+    """Start moto's S3 server in this process and point the settings at it."""
+    from moto.server import ThreadedMotoServer
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = ThreadedMotoServer(port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    os.environ["MINIO_ENDPOINT"] = f"{host}:{port}"
+    os.environ["MINIO_SECURE"] = "false"
+
+
+def run_blocking(client, names, payload: bytes, concurrency: int) -> dict:
+    """Stat, download and upload every object from a thread pool."""
+
+    def stat(name: str) -> str:
+        return client.object_stat(f"{BUCKET}/{name}").etag
+
+    def download(name: str) -> int:
+        response = client.client.get_object(BUCKET, name)
+        try:
+            return sum(len(chunk) for chunk in response.stream(1024 * 1024))
+        finally:
+            response.close()
+            response.release_conn()
+
+    timings = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        etags = list(executor.map(stat, names))
+        timings["stat"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        sizes = list(executor.map(download, names))
+        timings["download"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        list(executor.map(
+            lambda name: client.client.put_object(
+                BUCKET, f"blocking/{name}", _BytesReader(payload), len(payload)
+            ),
+            names,
+        ))
+        timings["upload"] = time.perf_counter() - start
+    return {"timings": timings, "etags": etags, "sizes": sizes}
+
+
+async def run_async(client, names, payload: bytes, concurrency: int) -> dict:
+    """Stat, download and upload every object from one event loop."""
+    slots = asyncio.Semaphore(concurrency)
+
+    async def bounded(coroutine):
+        async with slots:
+            return await coroutine
+
+    async def download(name: str) -> int:
+        size = 0
+        async for chunk in await client.stream_object(f"{BUCKET}/{name}"):
+            size += len(chunk)
+        return size
+
+    timings = {}
+    start = time.perf_counter()
+    stats = await asyncio.gather(*(
+        bounded(client.object_stat(f"{BUCKET}/{name}")) for name in names
+    ))
+    timings["stat"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sizes = await asyncio.gather(*(bounded(download(name)) for name in names))
+    timings["download"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        bounded(client.put_object(BUCKET, f"async/{name}", payload)) for name in names
+    ))
+    timings["upload"] = time.perf_counter() - start
+    await client.aclose()
+    return {
+        "timings": timings,
+        "etags": [stat.etag for stat in stats],
+        "sizes": list(sizes),
+    }
+
+
+class _BytesReader:
+    """Minimal file object for Minio.put_object."""
+
+    def __init__(self, data: bytes):
+        self._data = memoryview(data)
+        self._position = 0
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._data) if size < 0 else self._position + size
+        chunk = self._data[self._position:end].tobytes()
+        self._position += len(chunk)
+        return chunk
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--objects", type=int, default=64, help="Number of objects")
+    parser.add_argument("--size-mb", type=float, default=4, help="Size of each object")
+    parser.add_argument(
+        "--concurrency", type=int, default=32, help="Transfers in flight"
+    )
+    parser.add_argument(
+        "--fake", action="store_true", help="Use an in-process fake S3 server"
+    )
+    args = parser.parse_args()
+
+    if args.fake:
+        start_fake_s3()
+
+    # Imported after the endpoint is set
+    from app.services.async_minio_client import async_minio_client
+    from app.services.minio_client import minio_client
+
+    payload = os.urandom(int(args.size_mb * 1024 * 1024))
+    names = [f"object-{index:05d}.bin" for index in range(args.objects)]
+    print(f"Uploading {args.objects} objects of {args.size_mb} MB...")
+    minio_client.bucket_exists(BUCKET, create=True)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(
+            lambda name: minio_client.client.put_object(
+                BUCKET, name, _BytesReader(payload), len(payload)
+            ),
+            names,
+        ))
+
+    threads_before = threading.active_count()
+    blocking = run_blocking(minio_client, names, payload, args.concurrency)
+    asynchronous = asyncio.run(
+        run_async(async_minio_client, names, payload, args.concurrency)
+    )
+
+    if (
+        blocking["etags"] != asynchronous["etags"]
+        or blocking["sizes"] != asynchronous["sizes"]
+    ):
+        sys.exit("The clients returned different results")
+
+    stages = ["stat", "download", "upload"]
+    print(f"\n{'client':<10} " + " ".join(f"{stage:>10}" for stage in stages))
+    for name, run in (("blocking", blocking), ("async", asynchronous)):
+        timings = " ".join(f"{run['timings'][stage]:>9.3f}s" for stage in stages)
+        print(f"{name:<10} {timings}")
+    print(
+        f"\nThe blocking client used {args.concurrency} threads "
+        f"(plus {threads_before - 1} already running); the async client used one."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Compare the numpy and pyarrow dtype backends of the Data Preprocessing Microservice.
+Each variant reads a sample dataset, converts it to a DataFrame, runs a string-heavy
+process function and writes the result back to Parquet, the same path a job takes
+through the service. Every run happens in a fresh subprocess so that its peak
+resident memory can be measured on its own.
+
+Usage:
+    python examples/benchmark_dtype_backend.py [--rows 1000000] [--repeat 3]
+"""
+
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+DATA_DIR = "examples/data"
+
+
+def generate(rows: int) -> None:
+    """Write the benchmark dataset as Parquet and CSV."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    rng = np.random.default_rng(42)
+    df = pd.DataFrame({
+        "id": np.arange(rows),
+        "value": rng.normal(100, 15, rows),
+        "category": rng.choice(["alpha", "beta", "gamma", "delta"], rows),
+        "comment": [f"order {i} shipped to customer {i % 9973}" for i in range(rows)],
+        "day": pd.Timestamp("2024-01-01")
+        + pd.to_timedelta(rng.integers(0, 365, rows), unit="D"),
+    })
+    df.to_parquet(f"{DATA_DIR}/benchmark.parquet", index=False)
+    df.to_csv(f"{DATA_DIR}/benchmark.csv", index=False)
+
+
+def process(df: pd.DataFrame) -> pd.DataFrame:
+    """A typical string-heavy cleaning step."""
+    df = df[df["value"] > 90]
+    df["comment"] = df["comment"].str.upper()
+    df["customer"] = df["comment"].str.extract(r"(?P<customer>\d+)$", expand=False)
+    df["category_length"] = df["category"].str.len()
+    return df.groupby(["category", "customer"], as_index=False)["value"].mean()
+
+
+def run_variant(file_format: str, dtype_backend: str) -> dict:
+    """Run one read/process/write cycle and return its timings and peak memory."""
+    path = f"{DATA_DIR}/benchmark.{file_format}"
+    timings = {}
+
+    start = time.perf_counter()
+    if file_format == "parquet":
+        table = pq.read_table(path)
+    elif dtype_backend == "pyarrow":
+        table = pa_csv.read_csv(path)
+    else:
+        table = pa.Table.from_pandas(pd.read_csv(path), preserve_index=False)
+    timings["read"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if dtype_backend == "pyarrow":
+        df = table.to_pandas(types_mapper=pd.ArrowDtype)
+    else:
+        df = table.to_pandas()
+    del table
+    timings["to_pandas"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = process(df)
+    timings["process"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result_table = pa.Table.from_pandas(result, preserve_index=False)
+    timings["from_pandas"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pq.write_table(result_table, io.BytesIO())
+    timings["write"] = time.perf_counter() - start
+
+    timings["total"] = sum(timings.values())
+    # ru_maxrss is reported in kilobytes on Linux
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {"timings": timings, "peak_memory_mb": peak_memory}
+
+
+def measure(file_format: str, dtype_backend: str, repeat: int) -> dict:
+    """Run a variant in fresh subprocesses and keep the fastest run."""
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, __file__, "--run", file_format, dtype_backend],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        runs.append(json.loads(output))
+    return min(runs, key=lambda run: run["timings"]["total"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--rows", type=int, default=1_000_000, help="Rows of the dataset"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of each variant")
+    parser.add_argument(
+        "--run", nargs=2, metavar=("FORMAT", "BACKEND"), help=argparse.SUPPRESS
+    )
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_variant(*args.run)))
+        return
+
+    print(f"Generating {args.rows} rows...")
+    generate(args.rows)
+
+    stages = ["read", "to_pandas", "process", "from_pandas", "write", "total"]
+    header = " ".join(f"{stage:>11}" for stage in stages)
+    print(f"\n{'format':<8} {'backend':<8} {header} {'peak MB':>9}")
+    for file_format in ("parquet", "csv"):
+        for dtype_backend in ("numpy", "pyarrow"):
+            run = measure(file_format, dtype_backend, args.repeat)
+            print(
+                f"{file_format:<8} {dtype_backend:<8} "
+                + " ".join(f"{run['timings'][stage]:>10.3f}s" for stage in stages)
+                + f" {run['peak_memory_mb']:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
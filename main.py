@@ -1,14 +1,34 @@
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.api.metrics import router as metrics_router
 from app.api.router import router as api_router
 from app.core.config import settings
+from app.services.async_minio_client import async_minio_client
+from app.services.execution_pool import execution_pool
+from app.services.job_manager import job_manager
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pre-fork the sandbox workers before accepting requests
+    execution_pool.start()
+    job_manager.start()
+    yield
+    # Stop the background jobs, then the execution pool workers on shutdown
+    await job_manager.shutdown()
+    execution_pool.shutdown()
+    await async_minio_client.aclose()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description=settings.PROJECT_DESCRIPTION,
     version=settings.VERSION,
+    lifespan=lifespan,
 )
 
 # Set CORS middleware
@@ -22,6 +42,8 @@ app.add_middleware(
 
 # Include API router
 app.include_router(api_router, prefix="/api")
+# Prometheus scrapes /metrics at the root
+app.include_router(metrics_router, tags=["metrics"])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,28 @@
+import logging
+from typing import Iterator
+
+import pytest
+
+from app.core.config import settings
+
+
+@pytest.fixture(scope="session")
+def s3_endpoint() -> Iterator[str]:
+    """Endpoint (host:port) of an in-process fake S3 server (moto)."""
+    from moto.server import ThreadedMotoServer
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = ThreadedMotoServer(port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    yield f"{host}:{port}"
+    server.stop()
+
+
+@pytest.fixture
+def s3_settings(monkeypatch: pytest.MonkeyPatch, s3_endpoint: str) -> str:
+    """Point the MinIO settings at the fake S3 server for one test."""
+    monkeypatch.setattr(settings, "MINIO_ENDPOINT", s3_endpoint)
+    monkeypatch.setattr(settings, "MINIO_SECURE", False)
+    monkeypatch.setattr(settings, "MINIO_RETRY_BACKOFF", 0.01)
+    return s3_endpoint
@@ -0,0 +1,342 @@
+import asyncio
+import io
+import uuid
+from typing import AsyncIterator, Awaitable, Callable, List, TypeVar
+
+import boto3
+import httpx
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from app.core.config import settings
+from app.core.round_trips import count_round_trips
+from app.services.async_minio_client import AsyncMinioClient, AsyncS3Error
+from app.services.parquet_encoding import ParquetEncoding
+
+T = TypeVar("T")
+
+# Smallest part of a multipart upload that S3 accepts, other than the last
+PART_SIZE = 5 * 1024 * 1024
+
+
+@pytest.fixture
+def client(s3_settings: str) -> AsyncMinioClient:
+    return AsyncMinioClient()
+
+
+@pytest.fixture
+def s3(s3_settings: str):
+    """boto3 client of the fake S3 server, to check what the async client did."""
+    return boto3.client(
+        "s3",
+        endpoint_url=f"http://{s3_settings}",
+        aws_access_key_id=settings.MINIO_ACCESS_KEY,
+        aws_secret_access_key=settings.MINIO_SECRET_KEY,
+        region_name=settings.MINIO_REGION,
+    )
+
+
+@pytest.fixture
+def bucket(s3) -> str:
+    name = f"test-{uuid.uuid4().hex[:12]}"
+    s3.create_bucket(Bucket=name)
+    return name
+
+
+def run(client: AsyncMinioClient, coroutine: Callable[[], Awaitable[T]]) -> T:
+    """Run a coroutine on a new event loop, closing the client's connections after."""
+
+    async def main() -> T:
+        try:
+            return await coroutine()
+        finally:
+            await client.aclose()
+
+    return asyncio.run(main())
+
+
+async def iterate(parts: List[bytes]) -> AsyncIterator[bytes]:
+    for part in parts:
+        yield part
+
+
+def etag_of(s3, bucket: str, key: str) -> str:
+    return s3.head_object(Bucket=bucket, Key=key)["ETag"].strip('"')
+
+
+def body_of(s3, bucket: str, key: str) -> bytes:
+    return s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+
+
+def test_put_and_get_object(client, s3, bucket):
+    result = run(client, lambda: client.put_object(bucket, "a/b c.bin", b"hello world"))
+
+    assert (result.bucket_name, result.object_name) == (bucket, "a/b c.bin")
+    assert result.etag == etag_of(s3, bucket, "a/b c.bin")
+    assert body_of(s3, bucket, "a/b c.bin") == b"hello world"
+    path = f"{bucket}/a/b c.bin"
+    assert run(client, lambda: client.get_object(path)) == b"hello world"
+
+
+def test_put_object_creates_bucket(client, s3):
+    name = f"test-{uuid.uuid4().hex[:12]}"
+
+    run(client, lambda: client.put_object(name, "object", b"data"))
+
+    assert body_of(s3, name, "object") == b"data"
+
+
+def test_object_stat(client, s3, bucket):
+    s3.put_object(Bucket=bucket, Key="object", Body=b"x" * 100)
+    etag = etag_of(s3, bucket, "object")
+
+    stat = run(client, lambda: client.object_stat(f"{bucket}/object"))
+
+    assert stat.size == 100
+    assert stat.etag == etag
+    assert stat.last_modified is not None
+    assert run(client, lambda: client.object_exists(f"{bucket}/object"))
+    assert not run(client, lambda: client.object_exists(f"{bucket}/missing"))
+
+
+def test_ranged_reads(client, s3, bucket):
+    data = bytes(range(256)) * 4
+    s3.put_object(Bucket=bucket, Key="object", Body=data)
+    path = f"{bucket}/object"
+
+    assert run(client, lambda: client.get_object(path, 10, 5)) == data[10:15]
+    assert run(client, lambda: client.get_object(path, 1000)) == data[1000:]
+    ranges = [(0, 4), (512, 16), (1020, 4)]
+    assert run(client, lambda: client.read_ranges(path, ranges)) == [
+        data[offset:offset + length] for offset, length in ranges
+    ]
+
+
+def test_conditional_read(client, s3, bucket):
+    s3.put_object(Bucket=bucket, Key="object", Body=b"version 1")
+    path = f"{bucket}/object"
+    etag = run(client, lambda: client.object_stat(path)).etag
+
+    assert run(client, lambda: client.get_object(path, etag=etag)) == b"version 1"
+
+    s3.put_object(Bucket=bucket, Key="object", Body=b"version 2")
+    with pytest.raises(AsyncS3Error) as error:
+        run(client, lambda: client.get_object(path, 0, 4, etag=etag))
+    assert error.value.code == "PreconditionFailed"
+    assert error.value.status_code == 412
+
+
+def test_stream_object(client, s3, bucket):
+    data = np.random.default_rng(0).bytes(3 * 1024 * 1024 + 17)
+    s3.put_object(Bucket=bucket, Key="object", Body=data)
+
+    async def read() -> bytes:
+        chunks = await client.stream_object(f"{bucket}/object", 1024 * 1024)
+        return b"".join([chunk async for chunk in chunks])
+
+    assert run(client, read) == data
+
+
+def test_errors(client, bucket):
+    with pytest.raises(AsyncS3Error) as error:
+        run(client, lambda: client.object_stat(f"{bucket}/missing"))
+    assert error.value.code == "NoSuchKey"
+    assert error.value.status_code == 404
+    assert isinstance(error.value, ValueError)
+
+    with pytest.raises(AsyncS3Error) as error:
+        run(client, lambda: client.get_object(f"{bucket}/missing"))
+    assert error.value.code == "NoSuchKey"
+
+    with pytest.raises(AsyncS3Error) as error:
+        run(client, lambda: client.stream_object("missing-bucket-0/object"))
+    assert error.value.code == "NoSuchBucket"
+
+    with pytest.raises(ValueError, match="Invalid path format"):
+        run(client, lambda: client.object_stat("no-object"))
+
+
+def test_unreachable_server(monkeypatch, s3_settings):
+    monkeypatch.setattr(settings, "MINIO_ENDPOINT", "127.0.0.1:1")
+    monkeypatch.setattr(settings, "MINIO_MAX_RETRIES", 1)
+    client = AsyncMinioClient()
+
+    with pytest.raises(AsyncS3Error, match="Cannot reach MinIO"):
+        run(client, lambda: client.object_stat("bucket/object"))
+
+
+def test_multipart_upload(client, s3, bucket):
+    rng = np.random.default_rng(0)
+    parts = [rng.bytes(PART_SIZE), rng.bytes(PART_SIZE), rng.bytes(1000)]
+
+    result = run(client, lambda: client.upload(bucket, "object", iterate(parts)))
+
+    assert (result.bucket_name, result.object_name) == (bucket, "object")
+    # Taken from the completion response, without a stat
+    assert result.etag == etag_of(s3, bucket, "object")
+    assert body_of(s3, bucket, "object") == b"".join(parts)
+    assert s3.list_multipart_uploads(Bucket=bucket).get("Uploads", []) == []
+
+
+def test_single_part_upload(client, s3, bucket):
+    result = run(
+        client, lambda: client.upload(bucket, "object", iterate([b"only part"]))
+    )
+    run(client, lambda: client.upload(bucket, "empty", iterate([])))
+
+    assert result.etag == etag_of(s3, bucket, "object")
+    assert body_of(s3, bucket, "object") == b"only part"
+    assert body_of(s3, bucket, "empty") == b""
+
+
+def test_multipart_upload_aborts_on_failed_part(client, s3, bucket, monkeypatch):
+    request = client._request
+
+    async def failing_request(method, bucket_name, object_name=None, query=None, **kw):
+        if (query or {}).get("partNumber") == "2":
+            raise AsyncS3Error("InternalError: part rejected", "InternalError", 500)
+        return await request(method, bucket_name, object_name, query=query, **kw)
+
+    monkeypatch.setattr(client, "_request", failing_request)
+    rng = np.random.default_rng(0)
+    parts = [rng.bytes(PART_SIZE), rng.bytes(PART_SIZE), rng.bytes(1000)]
+
+    with pytest.raises(AsyncS3Error, match="part rejected"):
+        run(client, lambda: client.upload(bucket, "object", iterate(parts)))
+
+    assert s3.list_multipart_uploads(Bucket=bucket).get("Uploads", []) == []
+    assert "Contents" not in s3.list_objects_v2(Bucket=bucket)
+
+
+def test_multipart_upload_aborts_on_failed_source(client, s3, bucket):
+    async def failing_parts() -> AsyncIterator[bytes]:
+        yield b"x" * PART_SIZE
+        yield b"y" * PART_SIZE
+        raise ValueError("Error encoding Parquet")
+
+    with pytest.raises(ValueError, match="Error encoding Parquet"):
+        run(client, lambda: client.upload(bucket, "object", failing_parts()))
+
+    assert s3.list_multipart_uploads(Bucket=bucket).get("Uploads", []) == []
+    assert "Contents" not in s3.list_objects_v2(Bucket=bucket)
+
+
+def test_multipart_upload_aborts_on_failed_completion(client, s3, bucket, monkeypatch):
+    request = client._request
+
+    async def fail_completion(method, bucket_name, object_name=None, query=None, **kw):
+        response = await request(method, bucket_name, object_name, query=query, **kw)
+        if method == "POST" and "uploadId" in (query or {}):
+            # S3 can report a failed completion in the body of a 200 response
+            error = b"<Error><Code>InternalError</Code><Message>late</Message></Error>"
+            return httpx.Response(200, content=error)
+        return response
+
+    monkeypatch.setattr(client, "_request", fail_completion)
+    parts = [b"x" * PART_SIZE, b"y" * 10]
+
+    with pytest.raises(AsyncS3Error, match="InternalError: late"):
+        run(client, lambda: client.upload(bucket, "object", iterate(parts)))
+
+    assert s3.list_multipart_uploads(Bucket=bucket).get("Uploads", []) == []
+
+
+def flaky_send(monkeypatch, failures: int, status_code: int = 503) -> List[str]:
+    """Answer the first requests with an error status; returns their methods."""
+    send = httpx.AsyncClient.send
+    failed: List[str] = []
+
+    async def send_or_fail(self, request, **kwargs):
+        if len(failed) < failures:
+            failed.append(request.method)
+            return httpx.Response(status_code, request=request)
+        return await send(self, request, **kwargs)
+
+    monkeypatch.setattr(httpx.AsyncClient, "send", send_or_fail)
+    return failed
+
+
+def test_retries_server_errors(client, s3, bucket, monkeypatch):
+    s3.put_object(Bucket=bucket, Key="object", Body=b"data")
+    failed = flaky_send(monkeypatch, failures=2)
+
+    with count_round_trips() as round_trips:
+        data = run(client, lambda: client.get_object(f"{bucket}/object"))
+
+    assert data == b"data"
+    assert failed == ["GET", "GET"]
+    # Every attempt is a round trip
+    assert round_trips.as_dict()["GET"] == 3
+
+
+def test_retries_uploads(client, s3, bucket, monkeypatch):
+    # Known buckets are not checked again before the upload
+    assert run(client, lambda: client.bucket_exists(bucket))
+    failed = flaky_send(monkeypatch, failures=1, status_code=500)
+
+    run(client, lambda: client.put_object(bucket, "object", b"data"))
+
+    assert failed == ["PUT"]
+    assert body_of(s3, bucket, "object") == b"data"
+
+
+def test_gives_up_after_max_retries(client, bucket, monkeypatch):
+    monkeypatch.setattr(settings, "MINIO_MAX_RETRIES", 2)
+    failed = flaky_send(monkeypatch, failures=10, status_code=502)
+
+    with pytest.raises(AsyncS3Error) as error:
+        run(client, lambda: client.get_object(f"{bucket}/object"))
+
+    assert error.value.status_code == 502
+    assert failed == ["GET"] * 3
+
+
+def test_does_not_retry_client_errors(client, bucket, monkeypatch):
+    failed = flaky_send(monkeypatch, failures=10, status_code=403)
+
+    with pytest.raises(AsyncS3Error) as error:
+        run(client, lambda: client.object_stat(f"{bucket}/object"))
+
+    assert error.value.code == "AccessDenied"
+    assert failed == ["HEAD"]
+
+
+@pytest.mark.parametrize("rows", [1000, 1_500_000])
+def test_save_table_round_trip(client, s3, bucket, rows):
+    # The larger table is encoded into several parts and uploaded in parts
+    rng = np.random.default_rng(0)
+    table = pa.table({
+        "id": np.arange(rows),
+        "value": rng.normal(size=rows),
+        "label": pa.array(rng.choice(["a", "b", "c"], rows)).dictionary_encode(),
+    })
+    client.part_size = PART_SIZE
+
+    result = run(client, lambda: client.save_table(
+        table, bucket, "result", ParquetEncoding(compression="none")
+    ))
+
+    assert result.object_name == "result.parquet"
+    assert result.etag == etag_of(s3, bucket, "result.parquet")
+    body = body_of(s3, bucket, "result.parquet")
+    assert pq.read_table(io.BytesIO(body)).equals(table)
+    assert s3.list_multipart_uploads(Bucket=bucket).get("Uploads", []) == []
+
+
+def test_copy_object(client, s3, bucket):
+    s3.put_object(Bucket=bucket, Key="source/a b.bin", Body=b"content")
+    target = f"test-{uuid.uuid4().hex[:12]}"
+
+    source = f"{bucket}/source/a b.bin"
+    path = run(client, lambda: client.copy_object(source, target, "copy"))
+
+    assert path == f"{target}/copy"
+    assert body_of(s3, target, "copy") == b"content"
+
+
+def test_copy_missing_object(client, bucket):
+    with pytest.raises(AsyncS3Error, match="Error copying in MinIO") as error:
+        run(client, lambda: client.copy_object(f"{bucket}/missing", bucket, "copy"))
+    assert error.value.code == "NoSuchKey"
@@ -0,0 +1,84 @@
+import re
+
+import pytest
+
+from app.services.batch import BatchService
+
+PARTITIONED = [
+    "bkt/raw/sales/year=2025/month=12/part-0.parquet",
+    "bkt/raw/sales/year=2026/month=01/part-0.parquet",
+    "bkt/raw/sales/year=2026/month=01/part-1.csv",
+]
+
+
+@pytest.fixture
+def service() -> BatchService:
+    return BatchService()
+
+
+def test_keeps_the_layout_below_the_common_directory(service):
+    prefix, objects = service._output_objects(PARTITIONED, "out/results/2026/")
+
+    assert prefix == "out/results/2026"
+    assert objects == [
+        ("out", "results/2026/year=2025/month=12/part-0.parquet"),
+        ("out", "results/2026/year=2026/month=01/part-0.parquet"),
+        ("out", "results/2026/year=2026/month=01/part-1.parquet"),
+    ]
+
+
+def test_default_prefix_is_next_to_the_inputs(service):
+    prefix, objects = service._output_objects(PARTITIONED, None)
+
+    assert re.fullmatch(r"bkt/raw/sales/processed/batch_\d+_[0-9a-f]{8}", prefix)
+    relative = prefix.split("/", 1)[1]
+    assert objects[1] == ("bkt", f"{relative}/year=2026/month=01/part-0.parquet")
+
+
+def test_datasets_at_different_depths(service):
+    paths = ["bkt/raw/a.csv", "bkt/raw/2026/01/b.json", "bkt/raw/2026/c.xlsx"]
+
+    _, objects = service._output_objects(paths, "out/x")
+
+    assert [name for _, name in objects] == [
+        "x/a.parquet", "x/2026/01/b.parquet", "x/2026/c.parquet"
+    ]
+
+
+def test_directories_sharing_a_name_prefix_are_not_merged(service):
+    paths = ["bkt/raw/ab/a.csv", "bkt/raw/abc/a.csv"]
+
+    _, objects = service._output_objects(paths, "out/x")
+
+    assert [name for _, name in objects] == ["x/ab/a.parquet", "x/abc/a.parquet"]
+
+
+def test_bucket_only_prefix(service):
+    prefix, objects = service._output_objects(["bkt/a/b/c.csv"], "out")
+
+    assert prefix == "out"
+    assert objects == [("out", "c.parquet")]
+
+
+def test_datasets_in_several_buckets(service):
+    paths = ["one/data/a.csv", "two/data/a.csv"]
+
+    prefix, objects = service._output_objects(paths, None)
+
+    # Without a common directory, the bucket names become part of the layout
+    assert prefix.startswith("one/processed/batch_")
+    assert [name.split("/", 2)[2] for _, name in objects] == [
+        "one/data/a.parquet", "two/data/a.parquet"
+    ]
+
+
+def test_datasets_saved_to_the_same_file(service):
+    paths = ["bkt/raw/a.csv", "bkt/raw/a.parquet"]
+
+    with pytest.raises(ValueError, match="1 datasets would be saved"):
+        service._output_objects(paths, "out/x")
+
+
+def test_invalid_output_prefix(service):
+    with pytest.raises(ValueError, match="Invalid output prefix"):
+        service._output_objects(["bkt/a.csv"], "/")
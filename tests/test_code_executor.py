@@ -0,0 +1,108 @@
+from typing import List, Optional
+
+import pyarrow as pa
+import pytest
+
+from app.services.code_executor import partition_table
+
+
+def partitions(
+    table: pa.Table, count: int, partition_by: Optional[List[str]] = None
+) -> List[pa.Table]:
+    return [
+        partition_table(table, index, count, partition_by) for index in range(count)
+    ]
+
+
+def keys_of(table: pa.Table, column: str = "key") -> List:
+    return table.column(column).to_pylist()
+
+
+def test_splits_rows_into_contiguous_slices():
+    table = pa.table({"value": list(range(10))})
+
+    parts = partitions(table, 3)
+
+    assert [part.num_rows for part in parts] == [3, 3, 4]
+    assert pa.concat_tables(parts).equals(table)
+
+
+def test_more_partitions_than_rows_leaves_some_empty():
+    table = pa.table({"value": [1, 2]})
+
+    parts = partitions(table, 4)
+
+    assert [part.num_rows for part in parts] == [0, 1, 0, 1]
+    assert pa.concat_tables(parts).equals(table)
+
+
+@pytest.mark.parametrize("partition_by", [None, ["key"]])
+def test_empty_table_gives_empty_partitions(partition_by):
+    table = pa.table({
+        "key": pa.array([], pa.string()),
+        "value": pa.array([], pa.int64()),
+    })
+
+    parts = partitions(table, 3, partition_by)
+
+    assert all(part.num_rows == 0 for part in parts)
+    assert all(part.schema == table.schema for part in parts)
+
+
+def test_keys_stay_in_one_partition_in_order_of_first_appearance():
+    table = pa.table({
+        "key": ["b", "a", "b", "c", "a", "d", "c", "d"],
+        "value": list(range(8)),
+    })
+
+    parts = partitions(table, 2, ["key"])
+
+    assert [sorted(set(keys_of(part))) for part in parts] == [["a", "b"], ["c", "d"]]
+    merged = pa.concat_tables(parts)
+    # Each partition keeps the order of its rows
+    assert keys_of(merged) == ["b", "a", "b", "a", "c", "d", "c", "d"]
+    assert sorted(keys_of(merged, "value")) == list(range(8))
+
+
+def test_skewed_key_is_not_split():
+    # One key holds 90 of the 100 rows; the others share what is left
+    keys = ["big"] * 90 + [f"small{i}" for i in range(10)]
+    table = pa.table({"key": keys, "value": list(range(100))})
+
+    parts = partitions(table, 4, ["key"])
+
+    # The big key goes whole to the partition its middle row falls into, and the
+    # partitions whose share it swallowed stay empty
+    assert [part.num_rows for part in parts] == [0, 90, 0, 10]
+    assert set(keys_of(parts[1])) == {"big"}
+    assert pa.concat_tables(parts).equals(table)
+
+
+def test_null_keys_form_one_group():
+    table = pa.table({"key": ["a", None, "b", None, "a", "b"], "value": list(range(6))})
+
+    parts = partitions(table, 3, ["key"])
+
+    holding_null = [part for part in parts if None in keys_of(part)]
+    assert len(holding_null) == 1
+    assert keys_of(holding_null[0]).count(None) == 2
+
+
+def test_multi_column_keys():
+    table = pa.table({
+        "key": ["a", "a", "b", "b"],
+        "day": [1, 2, 1, 2],
+        "value": [1, 2, 3, 4],
+    })
+
+    parts = partitions(table, 4, ["key", "day"])
+
+    assert [part.num_rows for part in parts] == [1, 1, 1, 1]
+    assert pa.concat_tables(parts).equals(table)
+
+
+def test_unknown_partition_columns():
+    table = pa.table({"key": ["a"]})
+
+    with pytest.raises(ValueError, match="Unknown partition columns: nope"):
+        partition_table(table, 0, 2, ["key", "nope"])
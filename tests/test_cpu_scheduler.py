@@ -0,0 +1,218 @@
+import asyncio
+from typing import Dict, List, Optional
+
+import pytest
+
+from app.core.config import settings
+from app.services import cpu_scheduler as cpu_scheduler_module
+from app.services.cpu_scheduler import CpuScheduler
+
+CORES = 4
+
+
+@pytest.fixture
+def scheduler(monkeypatch: pytest.MonkeyPatch) -> CpuScheduler:
+    """Scheduler of a node with four cores, whose runs never starve by default."""
+    monkeypatch.setattr(
+        cpu_scheduler_module, "available_cores", lambda: list(range(CORES))
+    )
+    monkeypatch.setattr(settings, "CPU_SCHEDULER_ENABLED", True)
+    monkeypatch.setattr(settings, "CPU_FAIR_SHARE_HALF_LIFE", 60.0)
+    monkeypatch.setattr(settings, "CPU_STARVATION_SECONDS", 3600.0)
+    monkeypatch.setattr(settings, "DEFAULT_MAX_CPU", 1.0)
+    return CpuScheduler()
+
+
+async def settle() -> None:
+    """Let the runs woken by an allocation or a release take their cores."""
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+class Runs:
+    """Sandbox runs that hold their cores until they are released."""
+
+    def __init__(self, scheduler: CpuScheduler):
+        self.scheduler = scheduler
+        self.granted: List[str] = []
+        self.cores: Dict[str, List[int]] = {}
+        self._done: Dict[str, asyncio.Event] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self, name: str, max_cpu: float, tenant: Optional[str]) -> None:
+        done = self._done[name] = asyncio.Event()
+
+        async def run() -> None:
+            async with self.scheduler.allocate(max_cpu, tenant) as cores:
+                self.granted.append(name)
+                self.cores[name] = cores
+                await done.wait()
+
+        self._tasks.append(asyncio.create_task(run()))
+        await settle()
+
+    async def release(self, name: str) -> None:
+        self._done[name].set()
+        await settle()
+
+    async def release_all(self) -> None:
+        for done in self._done.values():
+            done.set()
+        await asyncio.gather(*self._tasks)
+
+
+def test_cores_for_rounds_up_to_whole_cores(scheduler):
+    assert scheduler.cores_for(0.25) == 1
+    assert scheduler.cores_for(1.0) == 1
+    assert scheduler.cores_for(1.5) == 2
+    assert scheduler.cores_for(2.01) == 3
+    assert scheduler.cores_for(None) == 1
+    # Never more than the node has
+    assert scheduler.cores_for(16) == CORES
+
+
+def test_allocates_distinct_cores_and_frees_them(scheduler):
+    async def main() -> None:
+        runs = Runs(scheduler)
+        await runs.start("a", 1.5, "x")
+        await runs.start("b", 0.5, "y")
+
+        assert runs.granted == ["a", "b"]
+        assert len(runs.cores["a"]) == 2 and len(runs.cores["b"]) == 1
+        assert not set(runs.cores["a"]) & set(runs.cores["b"])
+        assert scheduler.stats()["free"] == 1
+        await runs.release_all()
+
+    asyncio.run(main())
+    stats = scheduler.stats()
+    assert stats["free"] == CORES
+    assert stats["allocations"] == 2
+    assert all(usage["cores"] == 0 for usage in stats["tenants"].values())
+
+
+def test_serves_the_tenant_holding_fewer_cores_first(scheduler):
+    async def main() -> List[str]:
+        runs = Runs(scheduler)
+        await runs.start("a1", 3, "a")
+        await runs.start("b1", 1, "b")
+        # Both wait for a core; a's run arrived first but a holds three cores
+        await runs.start("a2", 1, "a")
+        await runs.start("b2", 1, "b")
+        assert runs.granted == ["a1", "b1"]
+
+        await runs.release("b1")
+        assert runs.granted == ["a1", "b1", "b2"]
+        await runs.release("b2")
+        assert runs.granted == ["a1", "b1", "b2", "a2"]
+        await runs.release_all()
+        return runs.granted
+
+    assert asyncio.run(main()) == ["a1", "b1", "b2", "a2"]
+
+
+def test_serves_the_tenant_with_less_recent_usage_first(scheduler):
+    async def main() -> List[str]:
+        runs = Runs(scheduler)
+        await runs.start("full", CORES, "c")
+        await runs.start("heavy", 1, "a")
+        await runs.start("light", 1, "b")
+        # Neither tenant holds cores, but a used 100 core-seconds lately
+        scheduler._usage.update({"a": 100.0, "b": 1.0})
+
+        await runs.release("full")
+        await runs.release_all()
+        return runs.granted
+
+    assert asyncio.run(main()) == ["full", "light", "heavy"]
+
+
+def test_serves_runs_of_a_tenant_in_arrival_order(scheduler):
+    async def main() -> List[str]:
+        runs = Runs(scheduler)
+        await runs.start("full", CORES, "a")
+        for name in ["first", "second", "third"]:
+            await runs.start(name, 1, "b")
+
+        await runs.release("full")
+        await runs.release_all()
+        return runs.granted
+
+    assert asyncio.run(main()) == ["full", "first", "second", "third"]
+
+
+def test_small_runs_backfill_past_a_large_waiting_run(scheduler):
+    async def main() -> None:
+        runs = Runs(scheduler)
+        await runs.start("batch", 3, "a")
+        await runs.start("large", CORES, "b")
+        await runs.start("small", 1, "c")
+
+        # The large run cannot start before the batch run ends; the small one can
+        assert runs.granted == ["batch", "small"]
+        assert scheduler.stats()["waiting"] == 1
+
+        await runs.release("batch")
+        assert runs.granted == ["batch", "small"]
+        await runs.release("small")
+        assert runs.granted == ["batch", "small", "large"]
+        await runs.release_all()
+
+    asyncio.run(main())
+
+
+def test_starving_run_is_not_overtaken(scheduler):
+    scheduler.starvation_seconds = 0.0
+
+    async def main() -> None:
+        runs = Runs(scheduler)
+        await runs.start("batch", 3, "a")
+        await runs.start("large", CORES, "b")
+        await runs.start("small", 1, "c")
+
+        # The large run has waited long enough: the free core stays free for it
+        assert runs.granted == ["batch"]
+        assert scheduler.stats()["free"] == 1
+
+        await runs.release("batch")
+        assert runs.granted == ["batch", "large"]
+        await runs.release("large")
+        assert runs.granted == ["batch", "large", "small"]
+        await runs.release_all()
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiting_run_gives_up_its_place(scheduler):
+    async def main() -> None:
+        runs = Runs(scheduler)
+        await runs.start("full", CORES, "a")
+
+        async def wait_for_core() -> None:
+            async with scheduler.allocate(1, "b"):
+                pytest.fail("The cancelled run got cores")
+
+        waiting = asyncio.create_task(wait_for_core())
+        await settle()
+        assert scheduler.stats()["waiting"] == 1
+        waiting.cancel()
+        await settle()
+        assert scheduler.stats()["waiting"] == 0
+
+        await runs.start("next", 1, "c")
+        await runs.release("full")
+        assert runs.granted == ["full", "next"]
+        await runs.release_all()
+
+    asyncio.run(main())
+    assert scheduler.stats()["free"] == CORES
+
+
+def test_disabled_scheduler_allocates_nothing(scheduler):
+    scheduler.enabled = False
+
+    async def main() -> Optional[List[int]]:
+        async with scheduler.allocate(2, "a") as cores:
+            return cores
+
+    assert asyncio.run(main()) is None
+    assert scheduler.stats()["allocations"] == 0
@@ -0,0 +1,107 @@
+import os
+from typing import List, Optional
+
+import pyarrow as pa
+import pytest
+
+from app.services.dataset_cache import CachedDataset, DatasetCache
+from app.services.shared_tables import shared_table_store
+
+
+def table() -> pa.Table:
+    """The table of every test dataset, so that their shared files have one size."""
+    return pa.table({"id": list(range(1000)), "value": [0.5] * 1000})
+
+
+def store(cache: DatasetCache, name: str) -> CachedDataset:
+    entry = cache.store(f"bkt/{name}.parquet", "etag", table(), "parquet", {})
+    cache.release(entry)
+    return entry
+
+
+def lookup(cache: DatasetCache, name: str) -> Optional[CachedDataset]:
+    entry, _ = cache.lookup(f"bkt/{name}.parquet", etag="etag")
+    cache.release(entry)
+    return entry
+
+
+def cached(cache: DatasetCache) -> List[str]:
+    return [os.path.basename(key[0]).split(".")[0] for key in cache._entries]
+
+
+@pytest.fixture
+def entry_bytes() -> int:
+    """Size of the shared file of one of the test tables."""
+    cache = DatasetCache()
+    entry = store(cache, "probe")
+    cache.clear()
+    assert not os.path.exists(entry.path)
+    return entry.nbytes
+
+
+@pytest.fixture
+def cache(entry_bytes: int):
+    cache = DatasetCache()
+    yield cache
+    cache.clear()
+    shared_table_store.cleanup()
+
+
+def test_fills_the_budget_exactly_before_evicting(cache, entry_bytes):
+    cache.max_bytes = 2 * entry_bytes
+    a, b = store(cache, "a"), store(cache, "b")
+
+    assert cached(cache) == ["a", "b"]
+    assert cache.size_bytes == cache.max_bytes
+    assert cache.evictions == 0
+
+    store(cache, "c")
+    assert cached(cache) == ["b", "c"]
+    assert cache.size_bytes == cache.max_bytes
+    assert cache.evictions == 1
+    assert not os.path.exists(a.path)
+    assert os.path.exists(b.path)
+
+
+def test_one_byte_short_of_the_budget_evicts(cache, entry_bytes):
+    cache.max_bytes = 2 * entry_bytes - 1
+    store(cache, "a")
+    store(cache, "b")
+
+    assert cached(cache) == ["b"]
+    assert cache.size_bytes == entry_bytes
+
+
+def test_lookup_makes_an_entry_most_recently_used(cache, entry_bytes):
+    cache.max_bytes = 2 * entry_bytes
+    store(cache, "a")
+    store(cache, "b")
+    assert lookup(cache, "a") is not None
+
+    store(cache, "c")
+    assert cached(cache) == ["a", "c"]
+    assert lookup(cache, "b") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_dataset_larger_than_the_budget_is_not_cached(cache, entry_bytes):
+    cache.max_bytes = entry_bytes - 1
+    entry = cache.store("bkt/a.parquet", "etag", table(), "parquet", {})
+
+    assert cached(cache) == []
+    assert cache.size_bytes == 0
+    # The job still reads it from shared memory until it releases it
+    assert os.path.exists(entry.path)
+    cache.release(entry)
+    assert not os.path.exists(entry.path)
+
+
+def test_evicted_dataset_in_use_is_unlinked_on_release(cache, entry_bytes):
+    cache.max_bytes = entry_bytes
+    in_use = cache.store("bkt/a.parquet", "etag", table(), "parquet", {})
+    store(cache, "b")
+
+    assert cached(cache) == ["b"]
+    assert os.path.exists(in_use.path)
+    cache.release(in_use)
+    assert not os.path.exists(in_use.path)
@@ -0,0 +1,78 @@
+from typing import Any, Dict, Optional
+
+import pytest
+
+from app.services.job_store import JobStore, MemoryJobStore, SQLiteJobStore
+
+CUTOFF = 1_000_000.0
+
+
+def job(
+    job_id: str, status: str, finished_at: Optional[float] = None
+) -> Dict[str, Any]:
+    return {
+        "job_id": job_id,
+        "status": status,
+        "owner": "alice",
+        "request": {"dataset_path": "bkt/a.parquet", "code": "..."},
+        "created_at": CUTOFF - 100,
+        "started_at": CUTOFF - 90 if status != "queued" else None,
+        "finished_at": finished_at,
+        "stage": None,
+        "timings": None,
+        "result": None,
+        "error": None,
+    }
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path) -> JobStore:
+    if request.param == "memory":
+        return MemoryJobStore()
+    return SQLiteJobStore(str(tmp_path / "jobs.db"))
+
+
+def test_purges_finished_jobs_before_the_cutoff(store):
+    store.create(job("old-succeeded", "succeeded", CUTOFF - 1))
+    store.create(job("old-failed", "failed", CUTOFF - 0.001))
+    store.create(job("old-cancelled", "cancelled", CUTOFF - 50))
+    store.create(job("at-cutoff", "succeeded", CUTOFF))
+    store.create(job("recent", "failed", CUTOFF + 1))
+
+    assert store.purge(CUTOFF) == 3
+
+    for job_id in ["old-succeeded", "old-failed", "old-cancelled"]:
+        assert store.get(job_id) is None
+    # The cutoff is exclusive
+    assert store.get("at-cutoff") is not None
+    assert store.get("recent") is not None
+    assert store.purge(CUTOFF) == 0
+
+
+def test_never_purges_unfinished_jobs(store):
+    store.create(job("queued", "queued"))
+    store.create(job("running", "running"))
+
+    assert store.purge(CUTOFF + 10**9) == 0
+    assert {record["job_id"] for record in store.unfinished()} == {"queued", "running"}
+
+
+def test_job_finishing_after_the_cutoff_is_kept(store):
+    store.create(job("a", "running"))
+    store.update("a", status="succeeded", finished_at=CUTOFF + 1, result={"rows": 3})
+
+    assert store.purge(CUTOFF) == 0
+    record = store.get("a")
+    assert record["status"] == "succeeded"
+    assert record["result"] == {"rows": 3}
+    assert store.unfinished() == []
+
+
+def test_sqlite_jobs_survive_reopening(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    SQLiteJobStore(path).create(job("a", "succeeded", CUTOFF - 1))
+
+    reopened = SQLiteJobStore(path)
+    assert reopened.get("a") == job("a", "succeeded", CUTOFF - 1)
+    assert reopened.purge(CUTOFF) == 1
+    assert SQLiteJobStore(path).get("a") is None